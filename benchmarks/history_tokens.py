@@ -0,0 +1,108 @@
+"""
+Prompt tokens of the conversation history per turn, full vs compacted.
+
+Conversations are simulated turn by turn: each turn adds a user question and
+an assistant answer of typical research lengths. The compacted history goes
+through HistoryCompactor with an in-memory summary store and a stub
+summarizer returning a summary of the full budget, so no model or Supabase is
+needed. Tokens are estimated as characters / 4, like the compactor does.
+
+    python -m benchmarks.history_tokens --turns 10 50 200
+"""
+
+import argparse
+import asyncio
+
+from pydantic_ai.messages import ModelRequest, ModelResponse, TextPart, UserPromptPart
+
+from core.history_compactor import (
+    CHARS_PER_TOKEN,
+    HistoryCompactor,
+    estimate_tokens,
+)
+from core.models.chat_models import ConversationSummary
+
+
+class MemorySummaryStore:
+    def __init__(self):
+        self.summaries = {}
+
+    def load(self, conversation_id):
+        return self.summaries.get(conversation_id, ConversationSummary())
+
+    def save(self, conversation_id, summary):
+        self.summaries[conversation_id] = summary
+
+
+class StubSummarizer:
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+
+    async def __call__(self, previous_summary, messages, token_budget):
+        self.calls += 1
+        self.input_tokens += len(previous_summary) // CHARS_PER_TOKEN
+        self.input_tokens += estimate_tokens(messages)
+        return "x" * (token_budget * CHARS_PER_TOKEN)
+
+
+async def simulate(turns: int, args):
+    store = MemorySummaryStore()
+    summarizer = StubSummarizer()
+    compactor = HistoryCompactor(
+        load_summary=store.load,
+        save_summary=store.save,
+        summarize=summarizer,
+        keep_turns=args.keep_turns,
+        token_budget=args.token_budget,
+        summary_token_budget=args.summary_token_budget,
+        min_turns_to_summarize=args.min_turns,
+    )
+    history = []
+    full, compacted = [], []
+    for turn in range(turns):
+        full.append(estimate_tokens(history))
+        compacted.append(estimate_tokens(compactor.compact("conversation", history)))
+        # The summary update runs while the agent answers.
+        await compactor.drain()
+        history.append(
+            ModelRequest(parts=[UserPromptPart(content="q" * args.question_chars)])
+        )
+        history.append(ModelResponse(parts=[TextPart(content="a" * args.answer_chars)]))
+    return full, compacted, summarizer
+
+
+def main(args):
+    print(
+        f"keep_turns={args.keep_turns} token_budget={args.token_budget} "
+        f"summary_token_budget={args.summary_token_budget} "
+        f"question={args.question_chars} chars answer={args.answer_chars} chars\n"
+    )
+    print(
+        f"{'turns':>6} {'last full':>10} {'last compact':>13} {'mean full':>10} "
+        f"{'mean compact':>13} {'total saved':>12} {'summaries':>10} {'summary in':>11}"
+    )
+    for turns in args.turns:
+        full, compacted, summarizer = asyncio.run(simulate(turns, args))
+        saved = sum(full) - sum(compacted) - summarizer.input_tokens
+        print(
+            f"{turns:>6} {full[-1]:>10} {compacted[-1]:>13} {sum(full) / turns:>10.0f} "
+            f"{sum(compacted) / turns:>13.0f} {saved:>12} {summarizer.calls:>10} "
+            f"{summarizer.input_tokens:>11}"
+        )
+    print(
+        "\nTokens are the history sent before each turn's user prompt. "
+        "'total saved' is net of the tokens sent to the summarizer."
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--keep-turns", type=int, default=6)
+    parser.add_argument("--token-budget", type=int, default=8000)
+    parser.add_argument("--summary-token-budget", type=int, default=800)
+    parser.add_argument("--min-turns", type=int, default=4)
+    parser.add_argument("--question-chars", type=int, default=300)
+    parser.add_argument("--answer-chars", type=int, default=4000)
+    main(parser.parse_args())
@@ -0,0 +1,94 @@
+"""
+Load test for the job queue and worker pool, without Supabase or the LLM.
+
+Enqueues jobs into a SQLiteJobQueue and drains them with a WorkerPool whose
+handler sleeps for a simulated run time and fails a fraction of attempts.
+
+    python -m benchmarks.job_queue_load --jobs 500 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from core.job_queue import SQLiteJobQueue
+from core.models.job_models import Job
+from core.worker import WorkerPool
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run(args):
+    path = ":memory:" if args.memory else os.path.join(tempfile.mkdtemp(), "jobs.sqlite")
+    queue = SQLiteJobQueue(path)
+    attempts = {"ok": 0, "failed": 0}
+
+    async def handler(job: Job):
+        await asyncio.sleep(random.uniform(args.min_run, args.max_run))
+        if random.random() < args.failure_rate:
+            attempts["failed"] += 1
+            raise RuntimeError("simulated failure")
+        attempts["ok"] += 1
+
+    pool = WorkerPool(
+        queue,
+        handler,
+        concurrency=args.concurrency,
+        visibility_timeout=args.visibility_timeout,
+        poll_interval=0.05,
+        retry_delay=0.01,
+    )
+    pool.start()
+
+    enqueue_latencies = []
+    job_ids = []
+    started = time.perf_counter()
+    for i in range(args.jobs):
+        t0 = time.perf_counter()
+        job = queue.enqueue(f"conversation-{i % 50}", f"question {i}", f"message-{i}")
+        enqueue_latencies.append((time.perf_counter() - t0) * 1000)
+        job_ids.append(job.id)
+        pool.notify()
+    enqueued = time.perf_counter()
+
+    while True:
+        jobs = [queue.get(job_id) for job_id in job_ids]
+        if all(job.status in ("done", "failed") for job in jobs):
+            break
+        await asyncio.sleep(0.05)
+    drained = time.perf_counter()
+    await pool.stop()
+
+    done = sum(job.status == "done" for job in jobs)
+    print(f"queue:              {path}")
+    print(f"jobs:               {args.jobs} (concurrency={args.concurrency})")
+    print(
+        f"enqueue latency:    p50={statistics.median(enqueue_latencies):.3f}ms "
+        f"p99={percentile(enqueue_latencies, 99):.3f}ms"
+    )
+    print(f"enqueue total:      {enqueued - started:.3f}s")
+    print(f"drain total:        {drained - started:.3f}s")
+    print(f"throughput:         {args.jobs / (drained - started):.1f} jobs/s")
+    print(f"done / failed:      {done} / {args.jobs - done}")
+    print(f"failed attempts:    {attempts['failed']} (retried)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--min-run", type=float, default=0.01)
+    parser.add_argument("--max-run", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    parser.add_argument("--visibility-timeout", type=float, default=5)
+    parser.add_argument("--memory", action="store_true", help="Use an in-memory queue")
+    logging.basicConfig(level=logging.ERROR)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,89 @@
+"""
+Counts `messages` writes per streamed run, naive vs MessageWriteBuffer.
+
+A run is simulated with a virtual clock: `tokens` text deltas of ~4 characters
+arrive at `rate` tokens per second, then the final response is saved. Writes go
+to a local stand-in that only counts them, so no Supabase is needed.
+
+    python -m benchmarks.message_writes --rate 50
+"""
+
+import argparse
+
+from core.services.messages import MessageWriteBuffer
+
+
+class CountingWriter:
+    def __init__(self):
+        self.writes = 0
+        self.bytes = 0
+
+    def __call__(self, conversation_id, content, is_loading, id):
+        self.writes += 1
+        self.bytes += len(content.encode("utf-8"))
+
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def simulate(tokens: int, rate: float, buffered: bool, args):
+    writer = CountingWriter()
+    clock = VirtualClock()
+    buffer = MessageWriteBuffer(
+        flush_interval=args.flush_interval,
+        flush_growth=args.flush_growth,
+        max_partial_writes=args.max_partial_writes,
+        writer=writer,
+        clock=clock,
+        background=False,
+    )
+    content = ""
+    for i in range(tokens):
+        clock.now = i / rate
+        content += "tok "
+        if buffered:
+            buffer.update("conversation", content, "message")
+            # Stands for the flusher thread, woken at every due write.
+            buffer.flush_due()
+        else:
+            writer("conversation", content, True, "message")
+    if buffered:
+        buffer.finish("conversation", content, "message")
+    else:
+        writer("conversation", content, False, "message")
+    return writer
+
+
+def main(args):
+    print(
+        f"flush_interval={args.flush_interval}s flush_growth={args.flush_growth} "
+        f"max_partial_writes={args.max_partial_writes} "
+        f"rate={args.rate} tokens/s\n"
+    )
+    print(
+        f"{'tokens':>8} {'naive writes':>13} {'naive MB':>9} {'buffered writes':>16} {'buffered MB':>12}"
+    )
+    for tokens in args.tokens:
+        naive = simulate(tokens, args.rate, False, args)
+        buffered = simulate(tokens, args.rate, True, args)
+        print(
+            f"{tokens:>8} {naive.writes:>13} {naive.bytes / 1e6:>9.2f} "
+            f"{buffered.writes:>16} {buffered.bytes / 1e6:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--tokens", type=int, nargs="+", default=[100, 1000, 10000, 50000]
+    )
+    parser.add_argument("--rate", type=float, default=50)
+    parser.add_argument("--flush-interval", type=float, default=0.5)
+    parser.add_argument("--flush-growth", type=float, default=0.25)
+    parser.add_argument("--max-partial-writes", type=int, default=40)
+    main(parser.parse_args())
@@ -0,0 +1,118 @@
+-- Query plans and timings of the history and steps reads, without and with
+-- messages_conversation_idx and steps_message_idx (see sql_model.sql).
+--
+-- Seeds a scratch `bench` schema of a local Postgres (not Supabase) with
+-- :conversations conversations of :per_conversation messages each (1.2M by
+-- default) and one step per assistant message, then runs EXPLAIN ANALYZE on:
+--   1. the first history page of a conversation (core.services.conversations)
+--   2. a later keyset page, resumed after the last row of the previous one
+--   3. the messages created since a high-water mark (history cache hit)
+--   4. the steps of a message
+-- before the indexes, then after creating them. An existing `bench` schema is
+-- replaced, and the schema is dropped at the end.
+--
+--     psql "$DATABASE_URL" -f benchmarks/messages_indexes.sql
+--     psql "$DATABASE_URL" -v conversations=20000 -v per_conversation=100 -f benchmarks/messages_indexes.sql
+
+\set ON_ERROR_STOP on
+\if :{?conversations}
+\else
+    \set conversations 10000
+\endif
+\if :{?per_conversation}
+\else
+    \set per_conversation 120
+\endif
+\if :{?page_size}
+\else
+    \set page_size 500
+\endif
+
+DROP SCHEMA IF EXISTS bench CASCADE;
+CREATE SCHEMA bench;
+SET search_path = bench;
+
+CREATE TABLE conversations (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE TABLE messages (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    conversation_id UUID NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    is_loading BOOLEAN DEFAULT false,
+    transcript JSONB,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE TABLE steps (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    message_id UUID NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
+    description TEXT NOT NULL,
+    details JSONB,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+\echo Seeding :conversations conversations x :per_conversation messages...
+INSERT INTO conversations (created_at)
+SELECT now() - make_interval(days => 30) FROM generate_series(1, :conversations);
+
+-- Conversations are interleaved in time, as in production: a conversation's
+-- rows are spread over the whole table.
+INSERT INTO messages (conversation_id, role, content, created_at)
+SELECT c.id,
+       CASE WHEN i % 2 = 0 THEN 'user' ELSE 'assistant' END,
+       repeat('x', 300),
+       now() - make_interval(days => 30) + make_interval(secs => i * 60 + random() * 50)
+  FROM conversations c, generate_series(0, :per_conversation - 1) AS i;
+
+INSERT INTO steps (message_id, description, details)
+SELECT id, 'We need to find the answer', '{"type": "search", "sources": []}'
+  FROM messages WHERE role = 'assistant';
+
+VACUUM ANALYZE conversations, messages, steps;
+
+SELECT count(*) AS messages, pg_size_pretty(pg_total_relation_size('messages')) AS size FROM messages;
+
+-- The conversation read, a keyset mark in the middle of it and a message with steps.
+SELECT id AS conversation_id FROM conversations ORDER BY id LIMIT 1 \gset
+SELECT created_at AS mark_created_at, id AS mark_id FROM messages
+ WHERE conversation_id = :'conversation_id'
+ ORDER BY created_at, id OFFSET (:per_conversation / 2) LIMIT 1 \gset
+SELECT id AS message_id FROM messages
+ WHERE conversation_id = :'conversation_id' AND role = 'assistant' LIMIT 1 \gset
+
+\set history 'EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) SELECT id, conversation_id, role, content, is_loading, created_at FROM messages WHERE conversation_id = ' :'conversation_id'
+
+\echo
+\echo ======== Without indexes ========
+\echo -- 1. First history page
+:history ORDER BY created_at, id LIMIT :page_size;
+\echo -- 2. Keyset page
+:history AND created_at >= :'mark_created_at' AND (created_at > :'mark_created_at' OR id > :'mark_id') ORDER BY created_at, id LIMIT :page_size;
+\echo -- 3. Messages since a high-water mark
+:history AND created_at >= :'mark_created_at' ORDER BY created_at, id LIMIT :page_size;
+\echo -- 4. Steps of a message
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) SELECT * FROM steps WHERE message_id = :'message_id';
+
+\echo
+\echo Creating the indexes...
+\timing on
+CREATE INDEX messages_conversation_idx ON messages (conversation_id, created_at, id);
+CREATE INDEX steps_message_idx ON steps (message_id);
+\timing off
+ANALYZE messages, steps;
+
+\echo
+\echo ======== With indexes ========
+\echo -- 1. First history page
+:history ORDER BY created_at, id LIMIT :page_size;
+\echo -- 2. Keyset page
+:history AND created_at >= :'mark_created_at' AND (created_at > :'mark_created_at' OR id > :'mark_id') ORDER BY created_at, id LIMIT :page_size;
+\echo -- 3. Messages since a high-water mark
+:history AND created_at >= :'mark_created_at' ORDER BY created_at, id LIMIT :page_size;
+\echo -- 4. Steps of a message
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) SELECT * FROM steps WHERE message_id = :'message_id';
+
+RESET search_path;
+DROP SCHEMA bench CASCADE;
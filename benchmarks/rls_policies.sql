@@ -0,0 +1,161 @@
+-- Read latency of the messages and steps of a long conversation under row level
+-- security: policies with EXISTS subqueries on conversations (before) vs
+-- policies comparing the denormalized user_id (after, see sql_model.sql).
+--
+-- Seeds a scratch `bench` schema of a local Postgres (not Supabase) with
+-- :conversations conversations of :per_conversation messages (1.2M by default),
+-- one step per assistant message, and one conversation of :long_conversation
+-- messages with :steps_per_message steps each. The reads run as a role
+-- without BYPASSRLS, through bench.uid(), which reads the JWT subject like
+-- Supabase's auth.uid(). The indexes of sql_model.sql exist in both runs.
+-- An existing `bench` schema is replaced, and the schema and the bench_reader
+-- role are dropped at the end. Needs a role allowed to create roles.
+--
+--     psql "$DATABASE_URL" -f benchmarks/rls_policies.sql
+
+\set ON_ERROR_STOP on
+\if :{?conversations}
+\else
+    \set conversations 10000
+\endif
+\if :{?per_conversation}
+\else
+    \set per_conversation 120
+\endif
+\if :{?long_conversation}
+\else
+    \set long_conversation 2000
+\endif
+\if :{?steps_per_message}
+\else
+    \set steps_per_message 4
+\endif
+
+DROP SCHEMA IF EXISTS bench CASCADE;
+DROP ROLE IF EXISTS bench_reader;
+CREATE SCHEMA bench;
+CREATE ROLE bench_reader;
+GRANT USAGE ON SCHEMA bench TO bench_reader;
+SET search_path = bench;
+
+CREATE FUNCTION uid() RETURNS UUID
+LANGUAGE sql STABLE
+AS $$ SELECT nullif(current_setting('request.jwt.claim.sub', true), '')::uuid $$;
+
+CREATE TABLE conversations (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE TABLE messages (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    conversation_id UUID NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    is_loading BOOLEAN DEFAULT false,
+    transcript JSONB,
+    user_id UUID,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE TABLE steps (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    message_id UUID NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
+    description TEXT NOT NULL,
+    details JSONB,
+    user_id UUID,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+\echo Seeding...
+-- Ten conversations per user.
+INSERT INTO conversations (user_id, created_at)
+SELECT md5('user' || (i % (:conversations / 10)))::uuid, now() - make_interval(days => 30)
+  FROM generate_series(1, :conversations) AS i;
+
+INSERT INTO messages (conversation_id, role, content, user_id, created_at)
+SELECT c.id,
+       CASE WHEN i % 2 = 0 THEN 'user' ELSE 'assistant' END,
+       repeat('x', 300),
+       c.user_id,
+       now() - make_interval(days => 30) + make_interval(secs => i * 60 + random() * 50)
+  FROM conversations c, generate_series(0, :per_conversation - 1) AS i;
+
+-- The long conversation read, owned by the first user.
+INSERT INTO conversations (user_id)
+SELECT user_id FROM conversations ORDER BY id LIMIT 1
+RETURNING id AS conversation_id, user_id AS owner_id \gset
+INSERT INTO messages (conversation_id, role, content, user_id, created_at)
+SELECT :'conversation_id',
+       CASE WHEN i % 2 = 0 THEN 'user' ELSE 'assistant' END,
+       repeat('x', 300),
+       :'owner_id',
+       now() - make_interval(days => 30) + make_interval(secs => i * 60)
+  FROM generate_series(0, :long_conversation - 1) AS i;
+
+INSERT INTO steps (message_id, description, details, user_id)
+SELECT id, 'We need to find the answer', '{"type": "search", "sources": []}', user_id
+  FROM messages WHERE role = 'assistant' AND conversation_id <> :'conversation_id';
+INSERT INTO steps (message_id, description, details, user_id)
+SELECT m.id, 'We need to find the answer', '{"type": "search", "sources": []}', m.user_id
+  FROM messages m, generate_series(1, :steps_per_message)
+ WHERE m.conversation_id = :'conversation_id' AND m.role = 'assistant';
+
+CREATE INDEX messages_conversation_idx ON messages (conversation_id, created_at, id);
+CREATE INDEX steps_message_idx ON steps (message_id);
+VACUUM ANALYZE conversations, messages, steps;
+
+SELECT (SELECT count(*) FROM messages) AS messages, (SELECT count(*) FROM steps) AS steps;
+
+ALTER TABLE conversations ENABLE ROW LEVEL SECURITY;
+ALTER TABLE messages ENABLE ROW LEVEL SECURITY;
+ALTER TABLE steps ENABLE ROW LEVEL SECURITY;
+GRANT SELECT ON conversations, messages, steps TO bench_reader;
+CREATE POLICY conversations_select ON conversations FOR SELECT USING (uid() = user_id);
+
+\set read_messages 'EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) SELECT id, conversation_id, role, content, is_loading, created_at FROM messages WHERE conversation_id = ' :'conversation_id' ' ORDER BY created_at, id'
+\set read_steps 'EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) SELECT s.* FROM steps s JOIN messages m ON m.id = s.message_id WHERE m.conversation_id = ' :'conversation_id'
+
+\echo
+\echo ======== Before: EXISTS policies ========
+CREATE POLICY messages_select ON messages FOR SELECT USING (
+    EXISTS (
+        SELECT 1 FROM conversations
+        WHERE conversations.id = messages.conversation_id
+          AND conversations.user_id = uid()
+    )
+);
+CREATE POLICY steps_select ON steps FOR SELECT USING (
+    EXISTS (
+        SELECT 1 FROM messages
+        JOIN conversations ON messages.conversation_id = conversations.id
+        WHERE messages.id = steps.message_id
+          AND conversations.user_id = uid()
+    )
+);
+SET ROLE bench_reader;
+SELECT set_config('request.jwt.claim.sub', :'owner_id', false);
+\echo -- Messages of the conversation
+:read_messages;
+\echo -- Steps of the conversation
+:read_steps;
+RESET ROLE;
+
+\echo
+\echo ======== After: user_id policies ========
+DROP POLICY messages_select ON messages;
+DROP POLICY steps_select ON steps;
+CREATE INDEX messages_user_idx ON messages (user_id);
+CREATE INDEX steps_user_idx ON steps (user_id);
+ANALYZE messages, steps;
+CREATE POLICY messages_select ON messages FOR SELECT USING ((SELECT uid()) = user_id);
+CREATE POLICY steps_select ON steps FOR SELECT USING ((SELECT uid()) = user_id);
+SET ROLE bench_reader;
+\echo -- Messages of the conversation
+:read_messages;
+\echo -- Steps of the conversation
+:read_steps;
+RESET ROLE;
+
+RESET search_path;
+DROP SCHEMA bench CASCADE;
+DROP ROLE bench_reader;
@@ -0,0 +1,200 @@
+"""
+Time before the agent starts, and bytes sent back by Supabase, for the writes
+of one run: before (placeholder inserted with return=representation to learn
+its server-assigned id, then the history fetched) vs after (client-generated
+id, return=minimal, placeholder insert awaited on the async client and
+overlapped with the history fetch, as core.runner does).
+
+Supabase is a local stand-in answering every request after `--latency`
+seconds, with the stored row when asked for a representation. The run also
+writes `--steps` steps (insert + update each) and its final message.
+
+    python -m benchmarks.run_start --latency 0.08 --steps 6 --history 20
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+import uuid
+
+import core.database
+from core.agent_utils import prepare_messages_for_agent
+from core.blocking import get_event_loop, run_blocking, run_coroutine
+from core.services import steps
+from core.services.messages import acreate_message, asave_message
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.row = None
+        self.returning = None
+
+    def insert(self, row, returning="representation", **kwargs):
+        self.row, self.returning = row, returning
+        return self
+
+    update = upsert = insert
+
+    def select(self, *args, **kwargs):
+        self.returning = "select"
+        return self
+
+    def __getattr__(self, name):
+        # eq, gte, order...
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        time.sleep(self.client.latency)
+        return self.respond()
+
+    def respond(self):
+        if self.returning == "select":
+            data = self.client.history if self.table == "messages" else []
+        elif self.returning == "minimal":
+            data = []
+        else:
+            rows = self.row if isinstance(self.row, list) else [self.row]
+            data = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "created_at": "2025-01-01T00:00:00+00:00",
+                    **row,
+                }
+                for row in rows
+            ]
+        with self.client.lock:
+            self.client.requests += 1
+            if self.returning != "select":
+                self.client.response_bytes += len(json.dumps(data))
+        return FakeResponse(data)
+
+
+class FakeAsyncQuery(FakeQuery):
+    async def execute(self):
+        await asyncio.sleep(self.client.latency)
+        return self.respond()
+
+
+class FakeSupabase:
+    def __init__(self, latency: float, history: list):
+        self.latency = latency
+        self.history = history
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.response_bytes = 0
+        # Async client of core.database, counted with the sync one.
+        self.aio = FakeAsyncClient(self)
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+class FakeAsyncClient:
+    def __init__(self, client: FakeSupabase):
+        self.client = client
+
+    def table(self, name):
+        return FakeAsyncQuery(self.client, name)
+
+
+def history_rows(conversation_id: str, count: int) -> list:
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "conversation_id": conversation_id,
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": "x" * 400,
+            "is_loading": False,
+            "created_at": f"2025-01-01T00:00:{i:02d}+00:00",
+        }
+        for i in range(count)
+    ]
+
+
+def step_data(message_id: str, is_loading: bool) -> dict:
+    return {
+        "message_id": message_id,
+        "description": "We need to find the answer",
+        "agent_id": "research_agent",
+        "details": {"type": "search", "sources": ["https://example.com"] * 5},
+        "is_loading": is_loading,
+    }
+
+
+async def before(client, conversation_id: str, args) -> float:
+    start = time.perf_counter()
+    placeholder = await run_blocking(
+        lambda: client.table("messages")
+        .insert(
+            {"conversation_id": conversation_id, "content": "", "role": "assistant"}
+        )
+        .execute()
+        .data[0]
+    )
+    await run_blocking(prepare_messages_for_agent, conversation_id)
+    started = time.perf_counter() - start
+    for _ in range(args.steps):
+        step = (
+            client.table("steps").insert(step_data(placeholder["id"], True)).execute()
+        )
+        client.table("steps").update(step_data(placeholder["id"], False)).eq(
+            "id", step.data[0]["id"]
+        ).execute()
+    client.table("messages").update({"content": "answer" * 200}).eq(
+        "id", placeholder["id"]
+    ).execute()
+    return started
+
+
+async def after(client, conversation_id: str, args) -> float:
+    start = time.perf_counter()
+    message_id = str(uuid.uuid4())
+    await asyncio.gather(
+        acreate_message(conversation_id, content="", is_loading=True, id=message_id),
+        run_blocking(prepare_messages_for_agent, conversation_id),
+    )
+    started = time.perf_counter() - start
+    for _ in range(args.steps):
+        step = await steps.asave_step(step_data(message_id, True))
+        await steps.asave_step(step_data(message_id, False), step["id"])
+    await asave_message(
+        conversation_id, "answer" * 200, is_loading=False, id=message_id
+    )
+    return started
+
+
+def main(args):
+    print(
+        f"latency {args.latency * 1000:.0f}ms, {args.history} history messages, "
+        f"{args.steps} steps\n"
+    )
+    print(f"{'':<8} {'ms to agent start':>18} {'requests':>9} {'response KB':>12}")
+    for name, run in (("before", before), ("after", after)):
+        conversation_id = str(uuid.uuid4())
+        client = FakeSupabase(args.latency, history_rows(conversation_id, args.history))
+        core.database._supabase_client = client
+        core.database._async_client = client.aio
+        core.database._async_client_loop = get_event_loop()
+        # On the shared loop, as core.runner runs.
+        started = run_coroutine(run(client, conversation_id, args))
+        print(
+            f"{name:<8} {started * 1000:>18.0f} {client.requests:>9} "
+            f"{client.response_bytes / 1e3:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.08)
+    parser.add_argument("--steps", type=int, default=6)
+    parser.add_argument("--history", type=int, default=20)
+    main(parser.parse_args())
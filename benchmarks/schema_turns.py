@@ -0,0 +1,135 @@
+"""
+LLM turns and step writes per database question, by way of getting the schema:
+
+- explore:  list_database_tables, then get_table_schema per table (previous workflow)
+- describe: a single describe_database call
+- prompt:   schema catalog injected in the agent instructions
+
+By default the research agent runs against a scripted model that follows each
+workflow and then answers with one run_sql_query, so the counts reflect the
+tool protocol only. With --live, the configured Gemini model is used instead for
+the describe and prompt modes (requires GEMINI_API_KEY / GOOGLE_API_KEY).
+
+Step writes go to a local counter, so no Supabase is needed. The questions run
+against `--db`, an existing Pokédex database. Without it, a synthetic database
+of `--rows` rows is generated by benchmarks.sqlite_queries in a temporary
+directory; nothing is written to the repository.
+
+    python -m benchmarks.schema_turns
+    python -m benchmarks.schema_turns --db data/pokedex.sqlite
+"""
+
+import argparse
+import os
+import tempfile
+import uuid
+from collections import Counter
+
+from pydantic_ai.messages import (
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+)
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+import core.research_agent as research
+from core import schema_catalog
+from core.models.agent_models import TransactionDeps
+from core.models.chat_models import StepDatabase
+from core.sqlite_registry import DatabaseRegistry
+from benchmarks.sqlite_queries import create_database
+
+QUESTIONS = [
+    ("Which fire pokemon have the highest attack?", ["pokemon", "pokemon_types"]),
+    ("How many legendary pokemon are there?", ["pokemon"]),
+    ("What is the average hp per type?", ["pokemon", "pokemon_types"]),
+]
+
+
+class StepCounter:
+    def __init__(self):
+        self.writes = 0
+
+    def __call__(self, message_id, description, agent_id, query, database_id, **kw):
+        self.writes += 1
+        return StepDatabase(
+            id=kw.get("id") or str(uuid.uuid4()),
+            message_id=message_id,
+            agent_id=agent_id,
+            description=description,
+            query=query,
+            database_id=database_id,
+        )
+
+
+def scripted_model(mode: str, tables: list) -> FunctionModel:
+    """A model that gets the schema the way `mode` allows, then runs one query and answers."""
+
+    def respond(messages, info: AgentInfo) -> ModelResponse:
+        returned = Counter(
+            part.tool_name
+            for message in messages
+            for part in message.parts
+            if isinstance(part, ToolReturnPart)
+        )
+        if mode == "explore" and not returned["list_database_tables"]:
+            call = ToolCallPart("list_database_tables", {})
+        elif mode == "explore" and returned["get_table_schema"] < len(tables):
+            table = tables[returned["get_table_schema"]]
+            call = ToolCallPart("get_table_schema", {"table_name": table})
+        elif mode == "describe" and not returned["describe_database"]:
+            call = ToolCallPart("describe_database", {})
+        elif not returned["run_sql_query"]:
+            call = ToolCallPart(
+                "run_sql_query", {"query": "SELECT COUNT(*) FROM pokemon"}
+            )
+        else:
+            return ModelResponse(parts=[TextPart("Answer.")])
+        return ModelResponse(parts=[call])
+
+    return FunctionModel(respond)
+
+
+def run_question(question: str, tables: list, mode: str, live: bool):
+    schema_catalog.SCHEMA_IN_PROMPT = mode == "prompt"
+    deps = TransactionDeps(message_id=str(uuid.uuid4()))
+    if live:
+        result = research.research_agent.run_sync(question, deps=deps)
+    else:
+        with research.research_agent.override(model=scripted_model(mode, tables)):
+            result = research.research_agent.run_sync(question, deps=deps)
+    return result.usage().requests
+
+
+def main(args):
+    if args.db is None:
+        args.db = os.path.join(tempfile.mkdtemp(), "pokedex.sqlite")
+        print(f"Generating {args.rows} rows in {args.db}")
+        create_database(args.db, args.rows)
+    elif not os.path.exists(args.db):
+        raise SystemExit(f"{args.db} not found")
+    research.databases = DatabaseRegistry(None, {"pokedex": {"path": args.db}})
+    steps = StepCounter()
+    research.save_database_step = steps
+
+    modes = ["describe", "prompt"] if args.live else ["explore", "describe", "prompt"]
+    print(f"\n{'mode':<10} {'turns/question':>15} {'step writes/question':>21}")
+    for mode in modes:
+        steps.writes = 0
+        turns = sum(
+            run_question(question, tables, mode, args.live)
+            for question, tables in QUESTIONS
+        )
+        print(
+            f"{mode:<10} {turns / len(QUESTIONS):>15.2f} "
+            f"{steps.writes / len(QUESTIONS):>21.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default=None)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--live", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,68 @@
+"""
+Tokens given to the model by search_the_web: the full text of the results
+(str(result), previous behaviour) vs the passages kept by
+compact_search_results, and the time the compaction takes.
+
+Each search returns `--results` synthetic pages of `--page-chars` characters,
+a few paragraphs of which mention the query terms.
+
+    python -m benchmarks.search_tokens --results 5 --page-chars 20000 --budget 3000
+"""
+
+import argparse
+import random
+import time
+
+from core.history_compactor import CHARS_PER_TOKEN
+from core.search_passages import compact_search_results
+
+QUERY = "pikachu evolution thunder stone"
+FILLER = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua ut enim ad minim veniam quis "
+    "nostrud exercitation ullamco laboris nisi aliquip ex ea commodo consequat"
+).split()
+
+
+def page(rng: random.Random, chars: int) -> str:
+    paragraphs = []
+    size = 0
+    while size < chars:
+        words = rng.choices(FILLER, k=rng.randint(40, 120))
+        if rng.random() < 0.05:
+            words[rng.randrange(len(words)) :] = rng.sample(QUERY.split(), 2)
+        paragraph = " ".join(words).capitalize() + "."
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def main(args):
+    rng = random.Random(0)
+    documents = [
+        {
+            "url": f"https://example.com/{i}",
+            "title": f"Page {i}",
+            "text": page(rng, args.page_chars),
+        }
+        for i in range(args.results)
+    ]
+    raw = "\n\n".join(
+        f"Title: {d['title']}\nURL: {d['url']}\nText: {d['text']}" for d in documents
+    )
+    start = time.perf_counter()
+    compacted = compact_search_results(QUERY, documents, token_budget=args.budget)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'':<12} {'tokens':>8}")
+    print(f"{'full text':<12} {len(raw) // CHARS_PER_TOKEN:>8}")
+    print(f"{'compacted':<12} {len(compacted) // CHARS_PER_TOKEN:>8}")
+    print(f"\ncompaction time: {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--results", type=int, default=5)
+    parser.add_argument("--page-chars", type=int, default=20000)
+    parser.add_argument("--budget", type=int, default=3000)
+    main(parser.parse_args())
@@ -0,0 +1,66 @@
+"""
+Peak Python memory and output size of run_sql_query result formatting:
+fetchall + string concatenation (previous behaviour) vs format_query_results.
+
+Each size runs `SELECT * FROM rows LIMIT n` on an in-memory table of ~100-byte
+rows, measured with tracemalloc.
+
+    python -m benchmarks.sql_result_memory --rows 1000 100000 1000000
+"""
+
+import argparse
+import sqlite3
+import time
+import tracemalloc
+
+from core.sql_results import format_query_results
+
+
+def naive(cursor):
+    columns = [description[0] for description in cursor.description]
+    results = cursor.fetchall()
+    formatted_results = f"Query Results ({len(results)} rows):\n"
+    formatted_results += ", ".join(columns) + "\n"
+    for row in results:
+        formatted_results += ", ".join(map(str, row)) + "\n"
+    return formatted_results
+
+
+def streamed(cursor):
+    return format_query_results(cursor).text
+
+
+def measure(conn, rows, formatter):
+    tracemalloc.start()
+    start = time.perf_counter()
+    text = formatter(conn.execute(f"SELECT * FROM rows LIMIT {rows}"))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, len(text.encode("utf-8")), elapsed
+
+
+def main(args):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE rows (id INTEGER, name TEXT, payload TEXT)")
+    conn.executemany(
+        "INSERT INTO rows VALUES (?, ?, ?)",
+        ((i, f"name-{i}", "x" * 80) for i in range(max(args.rows))),
+    )
+    print(
+        f"{'rows':>9} {'naive peak MB':>14} {'naive out MB':>13} {'naive s':>8} "
+        f"{'stream peak MB':>15} {'stream out KB':>14} {'stream s':>9}"
+    )
+    for rows in args.rows:
+        n_peak, n_out, n_s = measure(conn, rows, naive)
+        s_peak, s_out, s_s = measure(conn, rows, streamed)
+        print(
+            f"{rows:>9} {n_peak / 1e6:>14.1f} {n_out / 1e6:>13.1f} {n_s:>8.2f} "
+            f"{s_peak / 1e6:>15.2f} {s_out / 1e3:>14.1f} {s_s:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100000, 1000000])
+    main(parser.parse_args())
@@ -0,0 +1,123 @@
+"""
+Per-query latency of the research agent database tools: a new connection per
+call (the previous behaviour) vs the read-only connection pool.
+
+Runs the three tool queries (table list, table schema, a filtered join)
+against `--db`, an existing Pokédex database. Without it, a synthetic
+Pokédex-like database of `--rows` rows is generated in a temporary directory;
+nothing is written to the repository.
+
+    python -m benchmarks.sqlite_queries --iterations 2000 --threads 1 8
+    python -m benchmarks.sqlite_queries --db data/pokedex.sqlite
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.sqlite_pool import SQLiteConnectionPool
+
+QUERIES = {
+    "list_tables": "SELECT name FROM sqlite_master WHERE type='table';",
+    "table_schema": "PRAGMA table_info(pokemon);",
+    "filtered_join": (
+        "SELECT p.name, p.hp, p.attack FROM pokemon p "
+        "JOIN pokemon_types t ON t.pokemon_id = p.id "
+        "WHERE t.type = 'fire' AND p.attack > 80 ORDER BY p.attack DESC LIMIT 20;"
+    ),
+}
+
+
+def create_database(path: str, rows: int) -> None:
+    rng = random.Random(0)
+    types = ["fire", "water", "grass", "electric", "psychic", "rock", "ghost"]
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE pokemon (id INTEGER PRIMARY KEY, name TEXT, hp INTEGER, "
+            "attack INTEGER, defense INTEGER, legendary INTEGER)"
+        )
+        conn.execute("CREATE TABLE pokemon_types (pokemon_id INTEGER, type TEXT)")
+        conn.executemany(
+            "INSERT INTO pokemon VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    i,
+                    f"pokemon-{i}",
+                    rng.randint(20, 150),
+                    rng.randint(20, 150),
+                    rng.randint(20, 150),
+                    int(rng.random() < 0.05),
+                )
+                for i in range(rows)
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO pokemon_types VALUES (?, ?)",
+            ((i, rng.choice(types)) for i in range(rows)),
+        )
+        conn.execute("CREATE INDEX pokemon_types_type ON pokemon_types (type)")
+    conn.close()
+
+
+def query_with_new_connection(path: str, query: str):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(query).fetchall()
+
+
+def query_with_pool(pool: SQLiteConnectionPool, query: str):
+    with pool.connection() as conn:
+        return conn.execute(query).fetchall()
+
+
+def measure(run, iterations: int, threads: int):
+    def timed(_):
+        start = time.perf_counter()
+        run()
+        return (time.perf_counter() - start) * 1e6
+
+    with ThreadPoolExecutor(threads) as executor:
+        latencies = sorted(executor.map(timed, range(iterations)))
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+def main(args):
+    if args.db is None:
+        args.db = os.path.join(tempfile.mkdtemp(), "pokedex.sqlite")
+        print(f"Generating {args.rows} rows in {args.db}")
+        create_database(args.db, args.rows)
+    elif not os.path.exists(args.db):
+        raise SystemExit(f"{args.db} not found")
+    pool = SQLiteConnectionPool(args.db, size=max(args.threads))
+
+    print(
+        f"\n{'query':<14} {'threads':>7} {'connect p50':>12} {'p99':>8} {'pool p50':>9} {'p99':>8}  (µs)"
+    )
+    for name, query in QUERIES.items():
+        for threads in args.threads:
+            naive = measure(
+                lambda: query_with_new_connection(args.db, query),
+                args.iterations,
+                threads,
+            )
+            pooled = measure(
+                lambda: query_with_pool(pool, query), args.iterations, threads
+            )
+            print(
+                f"{name:<14} {threads:>7} {naive[0]:>12.0f} {naive[1]:>8.0f} "
+                f"{pooled[0]:>9.0f} {pooled[1]:>8.0f}"
+            )
+    pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default=None)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    main(parser.parse_args())
@@ -0,0 +1,191 @@
+"""
+Cold-start benchmark for the Cloud Function entry point.
+
+Each measurement runs in a fresh interpreter:
+- per-module import cost of `main`, parsed from `python -X importtime`
+- time to first request: functions-framework app built and a valid turn served,
+  against a local stand-in for Supabase and a stub model answering right away,
+  so it includes the construction of the async Supabase client but neither the
+  model's latency nor the Gemini client
+- first-use construction cost of the lazily built Supabase, Exa and Gemini
+  clients, reported separately
+
+Exits with status 1 when the import or first-request time exceeds its threshold
+or the first request is not answered 200,
+so it can run as a regression check in CI.
+
+    python -m benchmarks.startup --max-import-ms 1500 --max-first-request-ms 2500
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Placeholder credentials: clients are constructed, but no request is ever sent.
+DUMMY_ENV = {
+    "SUPABASE_URL": "http://localhost:54321",
+    "SUPABASE_KEY": "eyJhbGciOiJIUzI1NiJ9.e30.benchmark",
+    "EXA_API_KEY": "benchmark",
+    "GOOGLE_API_KEY": "benchmark",
+    "MODEL_NAME": "gemini-2.5-flash",
+}
+
+FIRST_REQUEST_SCRIPT = """
+import asyncio, json, threading, time
+
+# Stubbed backends, started before the clock: Supabase is a local HTTP server
+# answering every request with the history of a one-message conversation.
+ROW = {"id": "00000000-0000-0000-0000-000000000001", "role": "user", "content": "hi",
+       "conversation_id": "00000000-0000-0000-0000-000000000002", "is_loading": False,
+       "created_at": "2025-01-01T00:00:00+00:00"}
+BODY = json.dumps([ROW]).encode()
+
+async def handle(reader, writer):
+    try:
+        while True:
+            head = await reader.readuntil(b"\\r\\n\\r\\n")
+            length = 0
+            for line in head.split(b"\\r\\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            await reader.readexactly(length)
+            writer.write(b"HTTP/1.1 200 OK\\r\\nContent-Type: application/json\\r\\n"
+                         + f"Content-Length: {len(BODY)}\\r\\n\\r\\n".encode() + BODY)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        writer.close()
+
+loop = asyncio.new_event_loop()
+server = loop.run_until_complete(asyncio.start_server(handle, "127.0.0.1", 0))
+threading.Thread(target=loop.run_forever, daemon=True).start()
+import os
+os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+t0 = time.perf_counter()
+import functions_framework
+app = functions_framework.create_app(target="new_message_request", source="main.py")
+t_app = time.perf_counter()
+
+# The model is stubbed once main is imported (not timed): Gemini answers right away.
+from pydantic_ai.models.function import FunctionModel
+from pydantic_ai.messages import ModelResponse, TextPart
+from core.llm import model
+model._wrapped = FunctionModel(lambda messages, info: ModelResponse(parts=[TextPart("ok")]))
+t_stubbed = time.perf_counter()
+
+body = {"user_input": "hi", "conversation_id": ROW["conversation_id"]}
+response = app.test_client().post("/", json=body)
+t_first = time.perf_counter()
+
+from core.database import get_supabase_client
+from core.research_agent import get_exa_client
+from core.llm import _build_model
+
+clients = {}
+for name, build in (
+    ("supabase", get_supabase_client),
+    ("exa", get_exa_client),
+    ("gemini", _build_model),
+):
+    t = time.perf_counter()
+    build()
+    clients[name] = (time.perf_counter() - t) * 1000
+
+print(json.dumps({
+    "app_ms": (t_app - t0) * 1000,
+    "first_request_ms": (t_app - t0 + t_first - t_stubbed) * 1000,
+    "status": response.status_code,
+    "clients_ms": clients,
+}))
+"""
+
+
+def child_env():
+    env = dict(os.environ)
+    for key, value in DUMMY_ENV.items():
+        env.setdefault(key, value)
+    return env
+
+
+def import_times(module: str):
+    """Returns (total_us, [(module, self_us, cumulative_us), ...]) for importing `module`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=child_env(),
+        check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    total = next(cumulative for name, _, cumulative in rows if name == module)
+    return total, rows
+
+
+def first_request():
+    proc = subprocess.run(
+        [sys.executable, "-c", FIRST_REQUEST_SCRIPT],
+        capture_output=True,
+        text=True,
+        env=child_env(),
+        check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(args):
+    totals, rows = [], None
+    for _ in range(args.runs):
+        total, rows = import_times(args.module)
+        totals.append(total / 1000)
+    import_ms = statistics.median(totals)
+
+    print(f"import {args.module}: median {import_ms:.0f}ms over {args.runs} runs")
+    print(f"\nTop {args.top} modules by cumulative import time (last run):")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: -r[2])[: args.top]:
+        print(
+            f"  {cumulative_us / 1000:8.1f}ms  (self {self_us / 1000:6.1f}ms)  {name}"
+        )
+
+    runs = [first_request() for _ in range(args.runs)]
+    first_ms = statistics.median(run["first_request_ms"] for run in runs)
+    app_ms = statistics.median(run["app_ms"] for run in runs)
+    print(
+        f"\nTime to first request: median {first_ms:.0f}ms over {args.runs} runs "
+        f"(app built in {app_ms:.0f}ms)"
+    )
+    print("First-use client construction (last run):")
+    for name, ms in runs[-1]["clients_ms"].items():
+        print(f"  {name:10s} {ms:8.1f}ms")
+
+    failed = False
+    statuses = sorted({run["status"] for run in runs})
+    if statuses != [200]:
+        print(f"\nFAIL: first request answered {statuses}, expected 200")
+        failed = True
+    if import_ms > args.max_import_ms:
+        print(f"\nFAIL: import time {import_ms:.0f}ms > {args.max_import_ms}ms")
+        failed = True
+    if first_ms > args.max_first_request_ms:
+        print(
+            f"\nFAIL: time to first request {first_ms:.0f}ms > {args.max_first_request_ms}ms"
+        )
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--max-import-ms", type=float, default=1500)
+    parser.add_argument("--max-first-request-ms", type=float, default=2500)
+    sys.exit(main(parser.parse_args()))
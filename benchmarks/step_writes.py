@@ -0,0 +1,92 @@
+"""
+Time the tool calls of a run spend writing their steps, and the number of
+Supabase requests made: direct insert + update per step vs StepRecorder.
+
+`--tools` tool calls run `--parallel` at a time. Each one starts its step, works
+for `--work` seconds and finishes it. Every Supabase request is a local
+stand-in taking `--latency` seconds, so no Supabase is needed. With the
+recorder, the run ends with drain(), whose time is counted as well.
+
+    python -m benchmarks.step_writes --tools 12 --parallel 4 --latency 0.15
+"""
+
+import argparse
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from core.services.steps import StepRecorder
+
+
+class SlowWriter:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests = 0
+        self.rows = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, rows):
+        time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            self.rows += len(rows)
+
+
+def direct_tool(writer: SlowWriter, work: float) -> float:
+    start = time.perf_counter()
+    writer([{"id": str(uuid.uuid4()), "is_loading": True}])
+    time.sleep(work)
+    writer([{"id": str(uuid.uuid4()), "is_loading": False}])
+    return time.perf_counter() - start - work
+
+
+def recorded_tool(recorder: StepRecorder, work: float) -> float:
+    start = time.perf_counter()
+    row = recorder.start({"message_id": "message", "is_loading": True})
+    time.sleep(work)
+    recorder.finish(row["id"], {"message_id": "message", "is_loading": False})
+    return time.perf_counter() - start - work
+
+
+def run(args, recorded: bool):
+    writer = SlowWriter(args.latency)
+    recorder = StepRecorder(flush_interval=args.flush_interval, writer=writer)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.parallel) as pool:
+        if recorded:
+            overheads = list(
+                pool.map(
+                    lambda _: recorded_tool(recorder, args.work), range(args.tools)
+                )
+            )
+        else:
+            overheads = list(
+                pool.map(lambda _: direct_tool(writer, args.work), range(args.tools))
+            )
+    recorder.drain("message")
+    return sum(overheads) / len(overheads), time.perf_counter() - start, writer
+
+
+def main(args):
+    print(
+        f"{args.tools} tool calls, {args.parallel} in parallel, {args.work}s of work, "
+        f"{args.latency}s per Supabase request\n"
+    )
+    print(f"{'':<10} {'step ms/tool':>13} {'run s':>7} {'requests':>9} {'rows':>6}")
+    for name, recorded in (("direct", False), ("recorder", True)):
+        overhead, elapsed, writer = run(args, recorded)
+        print(
+            f"{name:<10} {overhead * 1000:>13.1f} {elapsed:>7.2f} "
+            f"{writer.requests:>9} {writer.rows:>6}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tools", type=int, default=12)
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--work", type=float, default=0.3)
+    parser.add_argument("--latency", type=float, default=0.15)
+    parser.add_argument("--flush-interval", type=float, default=0.25)
+    main(parser.parse_args())
@@ -0,0 +1,146 @@
+"""
+Wall time and blocking-pool threads used by `--reads` concurrent Supabase
+reads (the history fetch of a turn): sync PostgREST client called through
+run_blocking vs the async client of core.database, awaited on the shared
+event loop.
+
+Supabase is a local HTTP server answering every request after `--latency`
+seconds with `--history` messages, so real httpx connection pools are used
+and no Supabase is needed.
+
+    python -m benchmarks.supabase_concurrency --reads 200 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+
+import core.database
+from core.blocking import get_event_loop, run_blocking, run_coroutine
+from core.services.conversations import aget_all_messages_by_conversation_id
+
+
+def history_body(count: int) -> bytes:
+    conversation_id = str(uuid.uuid4())
+    return json.dumps(
+        [
+            {
+                "id": str(uuid.uuid4()),
+                "conversation_id": conversation_id,
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": "x" * 400,
+                "is_loading": False,
+                "created_at": f"2025-01-01T00:00:{i:02d}+00:00",
+            }
+            for i in range(count)
+        ]
+    ).encode()
+
+
+def start_server(latency: float, body: bytes) -> int:
+    """Serves `body` to every request after `latency` seconds, in its own thread. Returns the port."""
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":")[1])
+                await reader.readexactly(length)
+                await asyncio.sleep(latency)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(asyncio.start_server(handle, "127.0.0.1", 0))
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return server.sockets[0].getsockname()[1]
+
+
+def sync_read(client, conversation_id: str) -> list:
+    return (
+        client.table("messages")
+        .select("*")
+        .eq("conversation_id", conversation_id)
+        .order("created_at", desc=False)
+        .execute()
+        .data
+    )
+
+
+async def before(client, reads: int) -> None:
+    await asyncio.gather(
+        *(run_blocking(sync_read, client, str(uuid.uuid4())) for _ in range(reads))
+    )
+
+
+async def after(reads: int) -> None:
+    await asyncio.gather(
+        *(aget_all_messages_by_conversation_id(str(uuid.uuid4())) for _ in range(reads))
+    )
+
+
+def blocking_threads() -> int:
+    return sum(t.name.startswith("atlas-blocking") for t in threading.enumerate())
+
+
+def timed(coro) -> tuple:
+    peak = blocking_threads()
+    done = threading.Event()
+
+    def watch():
+        nonlocal peak
+        while not done.is_set():
+            peak = max(peak, blocking_threads())
+            time.sleep(0.005)
+
+    threading.Thread(target=watch, daemon=True).start()
+    start = time.perf_counter()
+    run_coroutine(coro)
+    elapsed = time.perf_counter() - start
+    done.set()
+    return elapsed, peak
+
+
+def main(args):
+    from postgrest import SyncPostgrestClient
+
+    port = start_server(args.latency, history_body(args.history))
+    os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{port}"
+    os.environ.setdefault("SUPABASE_KEY", "key")
+    sync_client = SyncPostgrestClient(f"http://127.0.0.1:{port}/rest/v1")
+    core.database._async_client = None
+    get_event_loop()
+
+    print(
+        f"{args.reads} concurrent history reads, {args.latency * 1000:.0f}ms per request, "
+        f"{args.history} messages each\n"
+    )
+    print(f"{'':<8} {'wall s':>7} {'blocking threads':>17}")
+    # The async client first: the pool threads started by the sync one stay alive.
+    for name, run in (
+        ("after", lambda: after(args.reads)),
+        ("before", lambda: before(sync_client, args.reads)),
+    ):
+        elapsed, peak = timed(run())
+        print(f"{name:<8} {elapsed:>7.2f} {peak:>17}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--history", type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,127 @@
+"""
+Wall time of agent runs whose tools and persistence block for `--delay` seconds.
+
+1. One model response with `--calls` parallel tool calls, the tools being
+   - sync functions (run in worker threads by pydantic-ai, as our tools are)
+   - async functions that block the event loop (what a sync call made directly
+     on the loop amounts to)
+2. `--runs` concurrent conversation turns through core.runner.run_agent, with
+   every Supabase read and write stubbed to take `--delay` seconds, the
+   blocking calls going through run_blocking or made inline on the event loop.
+
+A scripted model and local stubs are used: no Gemini, Supabase or Exa calls.
+
+    python -m benchmarks.tool_concurrency --calls 4 --runs 8 --delay 0.5
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelResponse, TextPart, ToolCallPart, ToolReturnPart
+from pydantic_ai.models.function import FunctionModel
+
+from core import agent_utils, runner
+from core.models.chat_models import Message
+
+
+def parallel_calls_model(tool_name: str, calls: int) -> FunctionModel:
+    def respond(messages, info) -> ModelResponse:
+        if any(isinstance(part, ToolReturnPart) for m in messages for part in m.parts):
+            return ModelResponse(parts=[TextPart("Done.")])
+        return ModelResponse(
+            parts=[ToolCallPart(tool_name, {"i": i}) for i in range(calls)]
+        )
+
+    return FunctionModel(respond)
+
+
+def tool_agents(delay: float, calls: int):
+    threaded = Agent(parallel_calls_model("lookup", calls))
+
+    @threaded.tool_plain
+    def lookup(i: int) -> str:
+        time.sleep(delay)
+        return "ok"
+
+    on_loop = Agent(parallel_calls_model("lookup", calls))
+
+    @on_loop.tool_plain
+    async def lookup(i: int) -> str:  # noqa: F811
+        time.sleep(delay)
+        return "ok"
+
+    return threaded, on_loop
+
+
+async def inline(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+def stub_persistence(delay: float) -> None:
+    def save_message(conversation_id, content, role_name="assistant", **kwargs):
+        time.sleep(delay)
+        return Message(
+            id=kwargs.get("id") or str(uuid.uuid4()),
+            conversation_id=conversation_id,
+            role=role_name,
+            content=content,
+        )
+
+    async def create_message(conversation_id, content, role_name="assistant", **kwargs):
+        await asyncio.sleep(delay)
+        return Message(
+            id=kwargs.get("id") or str(uuid.uuid4()),
+            conversation_id=conversation_id,
+            role=role_name,
+            content=content,
+        )
+
+    def fetch_all(conversation_id):
+        time.sleep(delay)
+        return []
+
+    runner.save_message = save_message
+    runner.acreate_message = create_message
+    runner.save_message_transcript = lambda id, transcript: time.sleep(delay)
+    runner.message_write_buffer.writer = save_message
+    agent_utils.history_cache.fetch_all = fetch_all
+
+
+async def concurrent_runs(runs: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(runner.run_agent(str(uuid.uuid4()), "question") for _ in range(runs))
+    )
+    return time.perf_counter() - start
+
+
+def main(args):
+    threaded, on_loop = tool_agents(args.delay, args.calls)
+    print(f"{args.calls} parallel tool calls of {args.delay}s in one response:")
+    for name, agent in (("sync tools", threaded), ("blocking on loop", on_loop)):
+        start = time.perf_counter()
+        agent.run_sync("go")
+        print(f"  {name:<18} {time.perf_counter() - start:6.2f}s")
+
+    stub_persistence(args.delay)
+    runner.agent = threaded
+    offloaded = runner.run_blocking
+    print(
+        f"\n{args.runs} concurrent turns, Supabase calls and tools taking {args.delay}s each:"
+    )
+    for name, run_blocking in (("run_blocking", offloaded), ("inline", inline)):
+        runner.run_blocking = run_blocking
+        elapsed = asyncio.run(concurrent_runs(args.runs))
+        print(f"  {name:<18} {elapsed:6.2f}s")
+    runner.run_blocking = offloaded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=0.5)
+    main(parser.parse_args())
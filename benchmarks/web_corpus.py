@@ -0,0 +1,95 @@
+"""
+Size, index build time and hit rate of the local web corpus.
+
+`--pages` synthetic pages about half of `--topics` topics are indexed in
+batches of 5 (one search each) and the FTS5 index is then rebuilt from
+scratch. `--queries` searches drawn from all the topics (Zipf-like: a few
+topics are asked about often) are then looked up in the corpus; a miss stands
+for an Exa call and indexes 5 new pages about its topic.
+
+    python -m benchmarks.web_corpus --pages 5000 --topics 500 --queries 2000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from core.web_corpus import WebCorpus
+
+WORDS = [f"word{i}" for i in range(5000)]
+TOPIC_WORDS = [f"topic{i}" for i in range(5000)]
+
+
+def topic_terms(rng: random.Random, topics: int):
+    return [rng.sample(TOPIC_WORDS, 3) for _ in range(topics)]
+
+
+def page(rng: random.Random, terms, chars: int) -> str:
+    words = rng.choices(WORDS, k=chars // 8)
+    for term in terms:
+        for _ in range(3):
+            words.insert(rng.randrange(len(words)), term)
+    return " ".join(words)
+
+
+def fetch(rng: random.Random, first: int, terms, chars: int):
+    return [
+        {
+            "url": f"https://example.com/{i}",
+            "title": f"Page {i}",
+            "text": page(rng, terms, chars),
+        }
+        for i in range(first, first + 5)
+    ]
+
+
+def main(args):
+    rng = random.Random(0)
+    topics = topic_terms(rng, args.topics)
+    path = os.path.join(tempfile.mkdtemp(), "corpus.sqlite")
+    corpus = WebCorpus(path=path, min_pages=3)
+
+    start = time.perf_counter()
+    for batch in range(0, args.pages, 5):
+        terms = topics[(batch // 5) % (args.topics // 2)]
+        corpus.add(fetch(rng, batch, terms, args.page_chars))
+    indexed = time.perf_counter() - start
+    rebuilt = corpus.rebuild()
+
+    weights = [1 / (rank + 1) for rank in range(args.topics)]
+    rng.shuffle(weights)
+    fetched = args.pages
+    lookup = 0.0
+    for terms in rng.choices(topics, weights=weights, k=args.queries):
+        start = time.perf_counter()
+        documents = corpus.search(" ".join(terms))
+        lookup += time.perf_counter() - start
+        if documents is None:
+            corpus.add(fetch(rng, fetched, terms, args.page_chars))
+            fetched += 5
+    lookup /= args.queries
+    size = corpus.size()
+
+    print(f"pages:              {size['pages']}")
+    print(f"text:               {size['bytes'] / 1e6:.1f} MB")
+    print(f"file:               {os.path.getsize(path) / 1e6:.1f} MB")
+    print(
+        f"incremental index:  {indexed:.2f}s ({indexed / args.pages * 1000:.2f} ms/page)"
+    )
+    print(f"full rebuild:       {rebuilt:.2f}s")
+    print(f"lookup:             {lookup * 1000:.2f} ms")
+    print(
+        f"hit rate:           {corpus.hit_rate:.1%} "
+        f"({corpus.stats['misses']} Exa calls for {args.queries} searches)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=5000)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--page-chars", type=int, default=10000)
+    main(parser.parse_args())
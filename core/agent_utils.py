@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from typing import Any, AsyncGenerator, List
 from datetime import datetime, timezone
 
@@ -15,22 +16,139 @@ from pydantic_ai.messages import (
     SystemPromptPart,
     UserPromptPart,
     RetryPromptPart,
+    PartStartEvent,
+    PartDeltaEvent,
+    TextPartDelta,
+    ThinkingPartDelta,
+    FunctionToolCallEvent,
+    FunctionToolResultEvent,
 )
 from core.models.agent_models import TransactionDeps
-from core.services.conversations import get_all_messages_by_conversation_id
+from core.history_cache import HistoryCache
+from core.history_compactor import HISTORY_COMPACTION, HistoryCompactor
+from core.models.chat_models import Message
+from core.services.conversations import (
+    get_all_messages_by_conversation_id,
+    get_conversation_summary,
+    get_messages_by_conversation_id_since,
+    update_conversation_summary,
+)
+from core.summary_agent import summarize_history
+from core.transcripts import (
+    TRANSCRIPT_REPLAY,
+    TRANSCRIPT_REPLAY_TOOL_RETURN_CHARS,
+    prune_tool_returns,
+    strip_tool_messages,
+    transcript_messages,
+)
+
+
+def _part_to_message_data(part: Any) -> dict[str, Any]:
+    """Converts a pydantic-ai message part to an event dict. Its "content" is empty for parts with nothing to show."""
+    message_data = {
+        "role": "model",
+        "timestamp": datetime.now(tz=timezone.utc).isoformat(),
+        "message_type": "agent_internal",
+    }
+
+    # Check for different part types using isinstance
+    if isinstance(part, TextPart):
+        if part.content:  # Only include if content is not empty
+            message_data.update({"content": part.content, "part_type": "text"})
+    elif isinstance(part, ToolCallPart):
+        message_data.update(
+            {
+                "message_type": "agent_tool_call",
+                "content": f"{part.tool_name}",
+                "part_type": "tool_call",
+                "tool_name": part.tool_name,
+                "tool_args": part.args,
+            }
+        )
+    elif isinstance(part, ToolReturnPart):
+        if part.content:  # Only include if content is not empty
+            message_data.update(
+                {
+                    "message_type": "agent_tool_result",
+                    "content": f"{part.content}",
+                    "part_type": "tool_return",
+                }
+            )
+    elif isinstance(part, ThinkingPart):
+        if part.content:  # Only include if content is not empty
+            message_data.update(
+                {
+                    "message_type": "agent_thinking",
+                    "content": f"{part.content}",
+                    "part_type": "thinking",
+                }
+            )
+    elif isinstance(part, SystemPromptPart):
+        if part.content:  # Only include if content is not empty
+            message_data.update(
+                {
+                    "message_type": "agent_system_prompt",
+                    "content": f"{part.content}",
+                    "part_type": "system_prompt",
+                }
+            )
+    elif isinstance(part, UserPromptPart):
+        if hasattr(part, "content") and part.content:
+            content = part.content
+            # Handle both string and sequence content
+            if isinstance(content, str):
+                message_data.update({"content": content, "part_type": "user_prompt"})
+            else:
+                # Handle sequence of UserContent
+                message_data.update(
+                    {
+                        "content": str(content),
+                        "part_type": "user_prompt",
+                    }
+                )
+    elif isinstance(part, RetryPromptPart):
+        # RetryPromptPart has a model_response() method for content
+        try:
+            retry_content = part.model_response()
+            if retry_content:
+                message_data.update(
+                    {
+                        "content": f"🔄 Retry: {retry_content}",
+                        "part_type": "retry_prompt",
+                    }
+                )
+        except Exception:
+            # Fallback to content attribute if model_response() fails
+            if hasattr(part, "content") and part.content:
+                message_data.update(
+                    {
+                        "content": f"🔄 Retry: {part.content}",
+                        "part_type": "retry_prompt",
+                    }
+                )
+    else:
+        # Handle unknown parts
+        message_data.update({"content": str(part), "part_type": "unknown"})
+
+    return message_data
 
 
-# Non-streaming chat processor (removed streaming feature, now fully synchronous)
 async def process_chat_with_full_details(
     user_prompt: str,
     agent: Agent,
     transaction: TransactionDeps,
     message_history: List[ModelMessage],
+    stream: bool = False,
 ) -> AsyncGenerator[dict[str, Any], None]:
     """Process chat and yield all messages including thinking, tools, and processing steps.
 
+    By default the agent run completes before its messages are yielded. With
+    stream=True, events are yielded while the run progresses: "text_delta" and
+    "agent_thinking_delta" for each generated chunk, then tool calls and tool
+    results as they happen. Both modes end with "final_response" (or "error"),
+    which also carries the run's pydantic-ai messages under "new_messages".
+
     IMPROVEMENTS MADE:
-    - Removed streaming feature for simplicity and determinism
     - Replaced hasattr() checks with proper isinstance() checks for type safety
     - Added proper pydantic-ai message type imports
     - Improved content validation to handle empty content
@@ -40,7 +158,7 @@ async def process_chat_with_full_details(
     - Better error handling for different content types
     - Proper handling of UserPromptPart content (string vs sequence)
     - Proper handling of RetryPromptPart using model_response() method
-    - Now fully synchronous (no async/await)
+    - Opt-in streaming built on Agent.iter()
     """
 
     # Yield user message first
@@ -52,7 +170,14 @@ async def process_chat_with_full_details(
     }
 
     try:
-        # Run the agent without streaming (synchronous)
+        if stream:
+            async for message_data in _stream_agent_run(
+                user_prompt, agent, transaction, message_history
+            ):
+                yield message_data
+            return
+
+        # Run the agent without streaming
         complete_result = await agent.run(
             user_prompt, message_history=message_history, deps=transaction
         )
@@ -64,96 +189,7 @@ async def process_chat_with_full_details(
             # Handle ModelRequest and ModelResponse messages
             if isinstance(msg, (ModelRequest, ModelResponse)):
                 for part in msg.parts:
-                    message_data = {
-                        "role": "model",
-                        "timestamp": datetime.now(tz=timezone.utc).isoformat(),
-                        "message_type": "agent_internal",
-                    }
-
-                    # Check for different part types using isinstance
-                    if isinstance(part, TextPart):
-                        if part.content:  # Only include if content is not empty
-                            message_data.update(
-                                {"content": part.content, "part_type": "text"}
-                            )
-                    elif isinstance(part, ToolCallPart):
-                        message_data.update(
-                            {
-                                "message_type": "agent_tool_call",
-                                "content": f"{part.tool_name}",
-                                "part_type": "tool_call",
-                                "tool_name": part.tool_name,
-                                "tool_args": part.args,
-                            }
-                        )
-                    elif isinstance(part, ToolReturnPart):
-                        if part.content:  # Only include if content is not empty
-                            message_data.update(
-                                {
-                                    "message_type": "agent_tool_result",
-                                    "content": f"{part.content}",
-                                    "part_type": "tool_return",
-                                }
-                            )
-                    elif isinstance(part, ThinkingPart):
-                        if part.content:  # Only include if content is not empty
-                            message_data.update(
-                                {
-                                    "message_type": "agent_thinking",
-                                    "content": f"{part.content}",
-                                    "part_type": "thinking",
-                                }
-                            )
-                    elif isinstance(part, SystemPromptPart):
-                        if part.content:  # Only include if content is not empty
-                            message_data.update(
-                                {
-                                    "message_type": "agent_system_prompt",
-                                    "content": f"{part.content}",
-                                    "part_type": "system_prompt",
-                                }
-                            )
-                    elif isinstance(part, UserPromptPart):
-                        if hasattr(part, "content") and part.content:
-                            content = part.content
-                            # Handle both string and sequence content
-                            if isinstance(content, str):
-                                message_data.update(
-                                    {"content": content, "part_type": "user_prompt"}
-                                )
-                            else:
-                                # Handle sequence of UserContent
-                                message_data.update(
-                                    {
-                                        "content": str(content),
-                                        "part_type": "user_prompt",
-                                    }
-                                )
-                    elif isinstance(part, RetryPromptPart):
-                        # RetryPromptPart has a model_response() method for content
-                        try:
-                            retry_content = part.model_response()
-                            if retry_content:
-                                message_data.update(
-                                    {
-                                        "content": f"🔄 Retry: {retry_content}",
-                                        "part_type": "retry_prompt",
-                                    }
-                                )
-                        except Exception:
-                            # Fallback to content attribute if model_response() fails
-                            if hasattr(part, "content") and part.content:
-                                message_data.update(
-                                    {
-                                        "content": f"🔄 Retry: {part.content}",
-                                        "part_type": "retry_prompt",
-                                    }
-                                )
-                    else:
-                        # Handle unknown parts
-                        message_data.update(
-                            {"content": str(part), "part_type": "unknown"}
-                        )
+                    message_data = _part_to_message_data(part)
 
                     # Only yield if there's actual content
                     if message_data.get("content"):
@@ -174,6 +210,7 @@ async def process_chat_with_full_details(
             "timestamp": datetime.now(tz=timezone.utc).isoformat(),
             "content": final_content,
             "message_type": "final_response",
+            "new_messages": new_messages,
         }
 
     except Exception as e:
@@ -186,27 +223,147 @@ async def process_chat_with_full_details(
         }
 
 
+def _delta_message_data(
+    message_type: str, part_type: str, content: str
+) -> dict[str, Any]:
+    return {
+        "role": "model",
+        "timestamp": datetime.now(tz=timezone.utc).isoformat(),
+        "message_type": message_type,
+        "content": content,
+        "part_type": part_type,
+    }
+
+
+async def _stream_agent_run(
+    user_prompt: str,
+    agent: Agent,
+    transaction: TransactionDeps,
+    message_history: List[ModelMessage],
+) -> AsyncGenerator[dict[str, Any], None]:
+    """Yields events while the agent runs, then the final response."""
+    async with agent.iter(
+        user_prompt, message_history=message_history, deps=transaction
+    ) as run:
+        async for node in run:
+            if Agent.is_model_request_node(node):
+                # Text and thinking are streamed chunk by chunk; tool calls are
+                # reported once complete, by the call tools node below.
+                async with node.stream(run.ctx) as request_stream:
+                    async for event in request_stream:
+                        if isinstance(event, PartStartEvent):
+                            if isinstance(event.part, TextPart) and event.part.content:
+                                yield _delta_message_data(
+                                    "text_delta", "text", event.part.content
+                                )
+                            elif (
+                                isinstance(event.part, ThinkingPart)
+                                and event.part.content
+                            ):
+                                yield _delta_message_data(
+                                    "agent_thinking_delta",
+                                    "thinking",
+                                    event.part.content,
+                                )
+                        elif isinstance(event, PartDeltaEvent):
+                            if (
+                                isinstance(event.delta, TextPartDelta)
+                                and event.delta.content_delta
+                            ):
+                                yield _delta_message_data(
+                                    "text_delta", "text", event.delta.content_delta
+                                )
+                            elif (
+                                isinstance(event.delta, ThinkingPartDelta)
+                                and event.delta.content_delta
+                            ):
+                                yield _delta_message_data(
+                                    "agent_thinking_delta",
+                                    "thinking",
+                                    event.delta.content_delta,
+                                )
+            elif Agent.is_call_tools_node(node):
+                async with node.stream(run.ctx) as handle_stream:
+                    async for event in handle_stream:
+                        if isinstance(event, FunctionToolCallEvent):
+                            message_data = _part_to_message_data(event.part)
+                        elif isinstance(event, FunctionToolResultEvent):
+                            message_data = _part_to_message_data(event.result)
+                        else:
+                            continue
+                        if message_data.get("content"):
+                            yield message_data
+
+    yield {
+        "role": "model",
+        "timestamp": datetime.now(tz=timezone.utc).isoformat(),
+        "content": run.result.output,
+        "message_type": "final_response",
+        "new_messages": run.result.new_messages(),
+    }
+
+
 ## We need to define a function that will take all the messages from a conversation and prepare them for the agent to use.
 
 
-def prepare_messages_for_agent(conversation_id: str) -> list[ModelMessage]:
+def _to_model_messages(msg: Message) -> list[ModelMessage]:
+    # We don't want to include messages that are still loading
+    # or assistant messages that are just placeholders for tool calls without final content.
+    if msg.is_loading or (msg.role == "assistant" and not msg.content):
+        return []
+
+    if msg.role == "user":
+        prompt = UserPromptPart(content=msg.content)
+        if msg.created_at:
+            # Identifies the turn for the rolling summary (see core.history_compactor).
+            prompt.timestamp = datetime.fromisoformat(msg.created_at)
+        return [ModelRequest(parts=[prompt])]
+    elif msg.role == "assistant":
+        # The full run (tool calls and results included) when it was recorded.
+        transcript = transcript_messages(msg.transcript)
+        if transcript:
+            return transcript
+        return [ModelResponse(parts=[TextPart(content=msg.content)])]
+    return []
+
+
+history_cache = HistoryCache(
+    fetch_all=get_all_messages_by_conversation_id,
+    fetch_since=get_messages_by_conversation_id_since,
+    to_model_messages=_to_model_messages,
+)
+
+history_compactor = HistoryCompactor(
+    load_summary=get_conversation_summary,
+    save_summary=update_conversation_summary,
+    summarize=summarize_history,
+)
+
+
+def prepare_messages_for_agent(
+    conversation_id: str, loop: asyncio.AbstractEventLoop | None = None
+) -> list[ModelMessage]:
     """
     Retrieves all messages from a conversation and prepares them for the agent.
     It transforms the messages from the database into a list of ModelRequest and ModelResponse objects.
-    """
-    db_messages = get_all_messages_by_conversation_id(conversation_id)
-
-    agent_messages: list[ModelMessage] = []
 
-    for msg in db_messages:
-        # We don't want to include messages that are still loading
-        # or assistant messages that are just placeholders for tool calls without final content.
-        if msg.is_loading or (msg.role == "assistant" and not msg.content):
-            continue
+    Built histories are cached per conversation (see core.history_cache), so
+    later turns only fetch and convert the messages added since.
 
-        if msg.role == "user":
-            agent_messages.append(ModelRequest(parts=[UserPromptPart(content=msg.content)]))
-        elif msg.role == "assistant":
-            agent_messages.append(ModelResponse(parts=[TextPart(content=msg.content)]))
+    Earlier tool calls and results are replayed (with large results cut) when
+    ATLAS_TRANSCRIPT_REPLAY is "true"; otherwise only the final answers are sent.
 
-    return agent_messages
+    Long histories are then windowed to the last turns plus a rolling summary
+    of the older ones (see core.history_compactor), unless
+    ATLAS_HISTORY_COMPACTION is "false". Summary updates are scheduled on
+    `loop`, which defaults to the running loop; pass it when calling from a
+    worker thread.
+    """
+    history = history_cache.get_history(conversation_id)
+    if TRANSCRIPT_REPLAY:
+        history = prune_tool_returns(history, TRANSCRIPT_REPLAY_TOOL_RETURN_CHARS)
+    else:
+        history = strip_tool_messages(history)
+    if not HISTORY_COMPACTION:
+        return history
+    return history_compactor.compact(conversation_id, history, loop=loop)
@@ -0,0 +1,108 @@
+"""
+Bounded offloading of blocking calls from the event loop.
+
+The Supabase reads and writes made around an agent run go through
+run_blocking, so a slow request holds one of BLOCKING_THREADS threads instead
+of the event loop shared by every conversation of the process.
+
+pydantic-ai already runs sync tools (web search, SQL, step writes) in anyio
+worker threads, so the parallel tool calls of one model response run at the
+same time; limit_tool_threads bounds that pool.
+
+The process-wide event loop lives here too: sync code (the Cloud Function
+entry point, worker threads) runs coroutines on it with run_coroutine.
+"""
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Coroutine, Optional, TypeVar
+
+import anyio.to_thread
+
+BLOCKING_THREADS = int(os.environ.get("ATLAS_BLOCKING_THREADS", "16"))
+TOOL_THREADS = int(os.environ.get("ATLAS_TOOL_THREADS", "32"))
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=BLOCKING_THREADS, thread_name_prefix="atlas-blocking"
+                )
+    return _executor
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Runs a blocking call in the shared bounded pool and awaits its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+def limit_tool_threads(tokens: int = TOOL_THREADS) -> None:
+    """Bounds the worker threads pydantic-ai uses for sync tools on the running event loop."""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    if limiter.total_tokens != tokens:
+        limiter.total_tokens = tokens
+
+
+## One event loop per process, shared by every request handled by this instance.
+## Keeping it alive lets the Gemini/Exa/Supabase HTTP clients reuse their connections.
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Returns the process-wide event loop, starting its thread on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=loop.run_forever, name="atlas-event-loop", daemon=True
+            )
+            thread.start()
+            _loop = loop
+        return _loop
+
+
+def use_running_loop() -> None:
+    """Makes the caller's running loop the shared one (used by the ASGI server)."""
+    global _loop
+    with _loop_lock:
+        _loop = asyncio.get_running_loop()
+
+
+def submit(coro: Coroutine[Any, Any, Any]) -> Future:
+    """Schedules a coroutine on the shared event loop from any thread."""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+
+
+def run_coroutine(coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None):
+    """Runs a coroutine on the shared event loop and blocks until it completes."""
+    loop = get_event_loop()
+    if _loop_thread_running(loop):
+        coro.close()
+        raise RuntimeError(
+            "run_coroutine called from the shared event loop, await the coroutine instead"
+        )
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+
+def _loop_thread_running(loop: asyncio.AbstractEventLoop) -> bool:
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
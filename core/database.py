@@ -1,6 +1,109 @@
+import asyncio
 import os
-from supabase import create_client
+import threading
+from typing import Any, Optional
 
-supabase_client = create_client(
-    os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY")
-)
+# Prefer header value (postgrest ReturnMethod.minimal) for writes whose row is
+# not needed back: the ids are generated client-side and the rows built locally.
+RETURN_MINIMAL = "minimal"
+
+# HTTP connection pool of the async client, shared by every run of the process.
+SUPABASE_MAX_CONNECTIONS = int(os.environ.get("ATLAS_SUPABASE_MAX_CONNECTIONS", "20"))
+SUPABASE_MAX_KEEPALIVE = int(os.environ.get("ATLAS_SUPABASE_MAX_KEEPALIVE", "10"))
+SUPABASE_HTTP2 = os.environ.get("ATLAS_SUPABASE_HTTP2", "true").lower() == "true"
+# Default timeout (seconds) of one request, overridable per call.
+SUPABASE_TIMEOUT = float(os.environ.get("ATLAS_SUPABASE_TIMEOUT", "10"))
+
+_supabase_client = None
+_lock = threading.Lock()
+
+_async_client = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_request_slots: Optional[asyncio.Semaphore] = None
+_request_slots_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_supabase_client():
+    """Returns the process-wide Supabase client, created on first use.
+
+    supabase is imported here rather than at module level to keep it out of the cold start.
+    """
+    global _supabase_client
+    if _supabase_client is None:
+        with _lock:
+            if _supabase_client is None:
+                from supabase import create_client
+
+                _supabase_client = create_client(
+                    os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY")
+                )
+    return _supabase_client
+
+
+def get_async_supabase_client():
+    """Returns the async PostgREST client of the running event loop, created on first use.
+
+    Its HTTP/2 connection pool is bounded by ATLAS_SUPABASE_MAX_CONNECTIONS and
+    kept alive between runs. A client is tied to the loop it was created on, so
+    a new one is made if the loop changes (e.g. a script calling asyncio.run twice),
+    and the previous one is closed on its own loop.
+    """
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        if _async_client is not None:
+            _close_async_client(_async_client, _async_client_loop)
+        import httpx
+        from postgrest import AsyncPostgrestClient
+
+        key = os.environ.get("SUPABASE_KEY")
+        _async_client = AsyncPostgrestClient(
+            f"{os.environ.get('SUPABASE_URL')}/rest/v1",
+            headers={"apikey": key, "Authorization": f"Bearer {key}"},
+            http_client=httpx.AsyncClient(
+                http2=SUPABASE_HTTP2,
+                limits=httpx.Limits(
+                    max_connections=SUPABASE_MAX_CONNECTIONS,
+                    max_keepalive_connections=SUPABASE_MAX_KEEPALIVE,
+                ),
+                timeout=SUPABASE_TIMEOUT,
+                follow_redirects=True,
+            ),
+        )
+        _async_client_loop = loop
+    return _async_client
+
+
+def _close_async_client(client, loop: asyncio.AbstractEventLoop) -> None:
+    """Closes the connections of a replaced client, which can only be done on its loop."""
+    if loop.is_running() and not loop.is_closed():
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+    # A stopped loop took its connections' transports with it: nothing to await.
+
+
+def _get_request_slots() -> asyncio.Semaphore:
+    global _request_slots, _request_slots_loop
+    loop = asyncio.get_running_loop()
+    if _request_slots is None or _request_slots_loop is not loop:
+        _request_slots = asyncio.Semaphore(SUPABASE_MAX_CONNECTIONS)
+        _request_slots_loop = loop
+    return _request_slots
+
+
+async def _execute(query) -> Any:
+    # Requests beyond the pool size wait here rather than in the httpx pool,
+    # whose wait queue gets slow when hundreds of requests pile up.
+    async with _get_request_slots():
+        return await query.execute()
+
+
+async def execute(query, timeout: Optional[float] = None) -> Any:
+    """Awaits an async PostgREST query, failing with TimeoutError after `timeout` seconds."""
+    return await asyncio.wait_for(_execute(query), timeout or SUPABASE_TIMEOUT)
+
+
+def __getattr__(name):
+    # Keeps `from core.database import supabase_client` working for scripts and notebooks.
+    if name == "supabase_client":
+        return get_supabase_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,102 @@
+"""
+TTL + LRU store of text values in a SQLite file, shared by the workers of one
+host. Used by the SQL result cache (core.sql_cache) and the Exa search cache
+(core.search_cache).
+
+Entries expire at the time given when they are stored. Past `max_bytes`, the
+least recently used entries are evicted. A file that cannot be opened or
+written only turns lookups into misses.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCache:
+    """Key/value store in a SQLite file, with expiry and a size cap. No file is used when path is empty."""
+
+    def __init__(
+        self,
+        path: Optional[str],
+        max_bytes: int,
+        name: str = "Cache",
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.name = name
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the value stored for key if it has not expired, and marks it used."""
+        now = self.clock()
+        try:
+            with self._lock:
+                conn = self._connection()
+                if conn is None:
+                    return None
+                row = conn.execute(
+                    "SELECT value FROM results WHERE key = ? AND expires_at > ?",
+                    (key, now),
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE results SET last_used = ? WHERE key = ?", (now, key)
+                    )
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            logger.warning(f"{self.name} file unavailable: {e}")
+            return None
+
+    def put(self, key: str, value: str, expires_at: float) -> int:
+        """Stores value until expires_at. Returns the number of entries evicted to make room."""
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return 0
+        now = self.clock()
+        try:
+            with self._lock:
+                conn = self._connection()
+                if conn is None:
+                    return 0
+                conn.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, expires_at, now),
+                )
+                conn.execute("DELETE FROM results WHERE expires_at <= ?", (now,))
+                # Keeps the most recently used entries that fit in max_bytes.
+                return conn.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM (SELECT key, "
+                    "SUM(size) OVER (ORDER BY last_used DESC, key) AS kept FROM results) "
+                    "WHERE kept > ?)",
+                    (self.max_bytes,),
+                ).rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"{self.name} file unavailable: {e}")
+            return 0
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if not self.path:
+            return None
+        if self._conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=5, check_same_thread=False, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)"
+            )
+            self._conn = conn
+        return self._conn
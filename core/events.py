@@ -0,0 +1,48 @@
+"""
+Wire encoding of the event dicts yielded by process_chat_with_full_details.
+
+Events are sent as compact JSON (no whitespace, no null fields, no timestamps
+on deltas). Tool results are cut to a preview: the full result is persisted in
+the steps table, the client only needs to show progress.
+"""
+
+import json
+import os
+from typing import Any, Dict
+
+TOOL_RESULT_PREVIEW_CHARS = int(
+    os.environ.get("ATLAS_TOOL_RESULT_PREVIEW_CHARS", "500")
+)
+
+# Keys sent for each event, in order. "role" and "part_type" are implied by the type.
+_EVENT_KEYS = ("message_type", "content", "tool_name", "tool_args", "message_id")
+_DELTA_TYPES = {"text_delta", "agent_thinking_delta"}
+
+
+def compact_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Keeps only the fields a client needs to render the event."""
+    compact = {key: event[key] for key in _EVENT_KEYS if event.get(key) is not None}
+    if event.get("message_type") not in _DELTA_TYPES and "timestamp" in event:
+        compact["ts"] = event["timestamp"]
+    if event.get("message_type") == "agent_tool_result":
+        content = compact.get("content", "")
+        if len(content) > TOOL_RESULT_PREVIEW_CHARS:
+            compact["content"] = content[:TOOL_RESULT_PREVIEW_CHARS]
+            compact["truncated"] = len(content)
+    return compact
+
+
+def _dumps(event: Dict[str, Any]) -> str:
+    return json.dumps(
+        compact_event(event), separators=(",", ":"), ensure_ascii=False, default=str
+    )
+
+
+def encode_ndjson(event: Dict[str, Any]) -> bytes:
+    return (_dumps(event) + "\n").encode("utf-8")
+
+
+def encode_sse(event: Dict[str, Any]) -> bytes:
+    return f"event: {event.get('message_type', 'message')}\ndata: {_dumps(event)}\n\n".encode(
+        "utf-8"
+    )
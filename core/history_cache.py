@@ -0,0 +1,154 @@
+"""
+Per-conversation cache of the agent message history.
+
+Messages are append-only and an assistant message is final once it stops
+loading, so the history of a conversation only grows at its end. Each entry
+keeps the built ModelMessage list and a high-water mark: the created_at of the
+last row folded into it, plus the ids of the rows sharing that timestamp. Later
+turns only fetch rows created at or after the mark.
+
+Rows are folded into an entry up to the first message that is still loading.
+That message and everything after it are rebuilt on every call until it
+completes, so a placeholder is never cached as "skipped".
+"""
+
+import json
+import os
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Set, Tuple
+
+from pydantic_ai.messages import ModelMessage
+
+from core.models.chat_models import Message
+
+HISTORY_CACHE_MAX_BYTES = int(
+    os.environ.get("ATLAS_HISTORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+HISTORY_CACHE_MAX_CONVERSATIONS = int(
+    os.environ.get("ATLAS_HISTORY_CACHE_MAX_CONVERSATIONS", "1000")
+)
+# Rough per-message overhead of the pydantic-ai objects, on top of the content.
+_MESSAGE_OVERHEAD_BYTES = 400
+
+
+@dataclass
+class _Entry:
+    messages: List[ModelMessage] = field(default_factory=list)
+    high_water: Optional[str] = None
+    ids_at_high_water: Set[str] = field(default_factory=set)
+    size: int = 0
+
+
+class HistoryCache:
+    """LRU cache of conversation histories, bounded in entries and approximate bytes."""
+
+    def __init__(
+        self,
+        fetch_all: Callable[[str], List[Message]],
+        fetch_since: Callable[[str, str], List[Message]],
+        to_model_messages: Callable[[Message], List[ModelMessage]],
+        max_bytes: int = HISTORY_CACHE_MAX_BYTES,
+        max_conversations: int = HISTORY_CACHE_MAX_CONVERSATIONS,
+    ):
+        self.fetch_all = fetch_all
+        self.fetch_since = fetch_since
+        self.to_model_messages = to_model_messages
+        self.max_bytes = max_bytes
+        self.max_conversations = max_conversations
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._size = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_history(self, conversation_id: str) -> List[ModelMessage]:
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is not None:
+                self._entries.move_to_end(conversation_id)
+                high_water, known_ids = entry.high_water, set(entry.ids_at_high_water)
+
+        if entry is None or high_water is None:
+            self.stats["misses"] += 1
+            rows = self.fetch_all(conversation_id)
+            base = _Entry()
+        else:
+            self.stats["hits"] += 1
+            rows = [
+                row
+                for row in self.fetch_since(conversation_id, high_water)
+                if not (row.created_at == high_water and row.id in known_ids)
+            ]
+            base = entry
+        self.stats["rows_fetched"] += len(rows)
+
+        committed, tail = self._split(rows)
+        new_messages = [m for row in committed for m in self.to_model_messages(row)]
+        tail_messages = [m for row in tail for m in self.to_model_messages(row)]
+
+        with self._lock:
+            current = self._entries.get(conversation_id)
+            if current is entry:
+                updated = self._extend(base, committed, new_messages)
+                self._store(conversation_id, updated, replaces=current)
+                history = updated.messages
+            else:
+                # Another run updated the entry meanwhile; return our view without storing it.
+                history = base.messages + new_messages
+        return history + tail_messages
+
+    def invalidate(self, conversation_id: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(conversation_id, None)
+            if entry is not None:
+                self._size -= entry.size
+
+    @staticmethod
+    def _split(rows: List[Message]) -> Tuple[List[Message], List[Message]]:
+        for index, row in enumerate(rows):
+            if row.is_loading:
+                return rows[:index], rows[index:]
+        return rows, []
+
+    @staticmethod
+    def _extend(
+        base: _Entry, committed: List[Message], new_messages: List[ModelMessage]
+    ) -> _Entry:
+        entry = _Entry(
+            messages=base.messages + new_messages,
+            high_water=base.high_water,
+            ids_at_high_water=set(base.ids_at_high_water),
+            size=base.size,
+        )
+        for row in committed:
+            if row.created_at != entry.high_water:
+                entry.high_water = row.created_at
+                entry.ids_at_high_water = set()
+            entry.ids_at_high_water.add(row.id)
+            entry.size += len(row.content.encode("utf-8")) + _MESSAGE_OVERHEAD_BYTES
+            if row.transcript:
+                entry.size += len(json.dumps(row.transcript))
+        return entry
+
+    def _store(
+        self, conversation_id: str, entry: _Entry, replaces: Optional[_Entry]
+    ) -> None:
+        if replaces is not None:
+            self._size -= replaces.size
+        self._entries[conversation_id] = entry
+        self._entries.move_to_end(conversation_id)
+        self._size += entry.size
+        while self._entries and (
+            self._size > self.max_bytes or len(self._entries) > self.max_conversations
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted.size
+            self.stats["evictions"] += 1
@@ -0,0 +1,303 @@
+"""
+Token-budgeted windowing of the agent message history.
+
+The last HISTORY_KEEP_TURNS turns (a user message and what follows it) are
+sent verbatim. Older turns are replaced by a rolling summary stored on the
+conversations row, with the created_at of the user message opening the last
+turn it covers (the timestamp of its UserPromptPart). Anchoring on a message
+row rather than a position keeps the summary right whatever the shape of the
+built history (tool messages replayed or stripped, transcripts pruned). Turns
+that left the window but are not summarized yet stay verbatim while they fit
+in the token budget.
+
+The summary is refreshed in a background task once HISTORY_SUMMARY_MIN_TURNS
+turns are waiting to be folded into it, so it never delays a run.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional, Set
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    SystemPromptPart,
+    ToolCallPart,
+    UserPromptPart,
+)
+
+from core.models.chat_models import ConversationSummary
+
+logger = logging.getLogger(__name__)
+
+HISTORY_COMPACTION = (
+    os.environ.get("ATLAS_HISTORY_COMPACTION", "true").lower() == "true"
+)
+HISTORY_KEEP_TURNS = int(os.environ.get("ATLAS_HISTORY_KEEP_TURNS", "6"))
+# Budget for the whole history sent to the model, summary included.
+HISTORY_TOKEN_BUDGET = int(os.environ.get("ATLAS_HISTORY_TOKEN_BUDGET", "8000"))
+SUMMARY_TOKEN_BUDGET = int(os.environ.get("ATLAS_SUMMARY_TOKEN_BUDGET", "800"))
+HISTORY_SUMMARY_MIN_TURNS = int(os.environ.get("ATLAS_HISTORY_SUMMARY_MIN_TURNS", "4"))
+_SUMMARY_CACHE_MAX_CONVERSATIONS = 1000
+
+# Rough estimate for Gemini on English and French text.
+CHARS_PER_TOKEN = 4
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(messages: List[ModelMessage]) -> int:
+    tokens = 0
+    for message in messages:
+        tokens += _MESSAGE_OVERHEAD_TOKENS
+        for part in message.parts:
+            if isinstance(part, ToolCallPart):
+                text = part.tool_name + part.args_as_json_str()
+            else:
+                text = str(getattr(part, "content", "") or "")
+            tokens += len(text) // CHARS_PER_TOKEN
+    return tokens
+
+
+def turn_starts(messages: List[ModelMessage]) -> List[int]:
+    """Indexes of the messages that start a turn, i.e. carry a user prompt."""
+    starts = [
+        index
+        for index, message in enumerate(messages)
+        if isinstance(message, ModelRequest)
+        and any(isinstance(part, UserPromptPart) for part in message.parts)
+    ]
+    if messages and (not starts or starts[0] != 0):
+        starts.insert(0, 0)
+    return starts
+
+
+def prompt_time(message: ModelMessage) -> Optional[datetime]:
+    """Timestamp of the user prompt of a message (its row's created_at), if any."""
+    if isinstance(message, ModelRequest):
+        for part in message.parts:
+            if isinstance(part, UserPromptPart):
+                return part.timestamp
+    return None
+
+
+def summarized_end(
+    history: List[ModelMessage], starts: List[int], until: datetime
+) -> int:
+    """Index of the first turn opened after `until`, len(history) if there is none."""
+    for start in starts:
+        started_at = prompt_time(history[start])
+        if started_at is not None and started_at > until:
+            return start
+    return len(history)
+
+
+def summary_message(summary: str) -> ModelRequest:
+    return ModelRequest(
+        parts=[
+            SystemPromptPart(
+                content=f"Summary of the earlier part of this conversation:\n{summary}"
+            )
+        ]
+    )
+
+
+class HistoryCompactor:
+    """Windows conversation histories and keeps their rolling summaries up to date."""
+
+    def __init__(
+        self,
+        load_summary: Callable[[str], ConversationSummary],
+        save_summary: Callable[[str, ConversationSummary], None],
+        summarize: Callable[[str, List[ModelMessage], int], Awaitable[str]],
+        keep_turns: int = HISTORY_KEEP_TURNS,
+        token_budget: int = HISTORY_TOKEN_BUDGET,
+        summary_token_budget: int = SUMMARY_TOKEN_BUDGET,
+        min_turns_to_summarize: int = HISTORY_SUMMARY_MIN_TURNS,
+    ):
+        self.load_summary = load_summary
+        self.save_summary = save_summary
+        self.summarize = summarize
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.summary_token_budget = summary_token_budget
+        self.min_turns_to_summarize = min_turns_to_summarize
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+        self._summaries: "OrderedDict[str, ConversationSummary]" = OrderedDict()
+        self._updating: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def compact(
+        self,
+        conversation_id: str,
+        history: List[ModelMessage],
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ) -> List[ModelMessage]:
+        """
+        Returns the history to send to the model, and schedules a summary
+        update when enough turns have left the window. The update runs on
+        `loop`, by default the running loop; compact can be called from
+        another thread when the loop is given.
+        """
+        starts = turn_starts(history)
+        if len(starts) <= self.keep_turns and (
+            estimate_tokens(history) <= self.token_budget
+        ):
+            return history
+
+        if self.keep_turns > 0:
+            window_start = starts[max(0, len(starts) - self.keep_turns)]
+        else:
+            window_start = len(history)
+        state = self._get_summary(conversation_id)
+        covered = 0
+        if state.summary and state.summarized_until is not None:
+            covered = summarized_end(history, starts, state.summarized_until)
+
+        prefix: List[ModelMessage] = []
+        if covered:
+            prefix = [summary_message(state.summary)]
+        verbatim_starts = [start for start in starts if start >= covered]
+        if not verbatim_starts or verbatim_starts[0] != covered:
+            verbatim_starts.insert(0, covered)
+
+        # Drop the oldest verbatim turns until the history fits, keeping the last one.
+        budget = self.token_budget - estimate_tokens(prefix)
+        first = 0
+        while (
+            first < len(verbatim_starts) - 1
+            and estimate_tokens(history[verbatim_starts[first] :]) > budget
+        ):
+            first += 1
+        if first:
+            self.stats["turns_dropped"] += first
+        compacted = prefix + history[verbatim_starts[first] :]
+
+        self.stats["compactions"] += 1
+        self.stats["tokens_saved"] += estimate_tokens(history) - estimate_tokens(
+            compacted
+        )
+
+        pending = [start for start in starts if covered <= start < window_start]
+        until = max(
+            filter(None, (prompt_time(history[start]) for start in pending)),
+            default=None,
+        )
+        if len(pending) >= self.min_turns_to_summarize and until is not None:
+            self._schedule_update(
+                conversation_id,
+                state.summary if covered else "",
+                history[covered:window_start],
+                until,
+                loop,
+            )
+        return compacted
+
+    async def update_summary(
+        self,
+        conversation_id: str,
+        previous_summary: str,
+        new_messages: List[ModelMessage],
+        summarized_until: datetime,
+    ) -> None:
+        """Folds new_messages into the summary, which then covers the turns opened up to summarized_until, and stores it."""
+        summary = await self.summarize(
+            previous_summary or "", new_messages, self.summary_token_budget
+        )
+        # The budget is also given to the summarizer; this is only a safety net.
+        summary = summary.strip()[: self.summary_token_budget * CHARS_PER_TOKEN]
+        state = ConversationSummary(summary=summary, summarized_until=summarized_until)
+        await asyncio.to_thread(self.save_summary, conversation_id, state)
+        self._remember(conversation_id, state)
+        self.stats["summaries_updated"] += 1
+        logger.info(
+            f"Summary of conversation {conversation_id} now covers the turns up to {summarized_until.isoformat()}"
+        )
+
+    async def drain(self) -> None:
+        """Waits for the summary updates in progress."""
+        while self._updating or self._tasks:
+            if self._tasks:
+                await asyncio.gather(*list(self._tasks), return_exceptions=True)
+            else:
+                await asyncio.sleep(0)  # Scheduled, not started yet
+
+    def invalidate(self, conversation_id: str) -> None:
+        with self._lock:
+            self._summaries.pop(conversation_id, None)
+
+    def _get_summary(self, conversation_id: str) -> ConversationSummary:
+        with self._lock:
+            state = self._summaries.get(conversation_id)
+            if state is not None:
+                self._summaries.move_to_end(conversation_id)
+                return state
+        try:
+            state = self.load_summary(conversation_id)
+        except Exception as e:
+            logger.warning(
+                f"Could not load summary of conversation {conversation_id}: {e}"
+            )
+            return ConversationSummary()
+        self._remember(conversation_id, state)
+        return state
+
+    def _remember(self, conversation_id: str, state: ConversationSummary) -> None:
+        with self._lock:
+            current = self._summaries.get(conversation_id)
+            if (
+                current
+                and current.summarized_until is not None
+                and (
+                    state.summarized_until is None
+                    or current.summarized_until > state.summarized_until
+                )
+            ):
+                return
+            self._summaries[conversation_id] = state
+            self._summaries.move_to_end(conversation_id)
+            while len(self._summaries) > _SUMMARY_CACHE_MAX_CONVERSATIONS:
+                self._summaries.popitem(last=False)
+
+    def _schedule_update(
+        self,
+        conversation_id: str,
+        previous_summary: str,
+        new_messages: List[ModelMessage],
+        summarized_until: datetime,
+        loop: Optional[asyncio.AbstractEventLoop],
+    ) -> None:
+        if loop is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return  # No event loop to run it off the critical path; a later turn will.
+        with self._lock:
+            if conversation_id in self._updating:
+                return
+            self._updating.add(conversation_id)
+
+        def start() -> None:
+            task = loop.create_task(
+                self.update_summary(
+                    conversation_id, previous_summary, new_messages, summarized_until
+                )
+            )
+            self._tasks.add(task)
+            task.add_done_callback(lambda t: self._update_done(conversation_id, t))
+
+        loop.call_soon_threadsafe(start)
+
+    def _update_done(self, conversation_id: str, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        with self._lock:
+            self._updating.discard(conversation_id)
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["summary_failures"] += 1
+            logger.warning(
+                f"Summary update failed for conversation {conversation_id}: {task.exception()}"
+            )
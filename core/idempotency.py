@@ -0,0 +1,145 @@
+"""
+Duplicate-trigger suppression for agent runs.
+
+The Supabase webhook can deliver the same message twice and users double-submit.
+Runs are keyed on the conversation and the source message (its id when the
+caller sends one, otherwise a hash of its content). While a run is in flight,
+duplicates wait for it; once it has completed, duplicates get its stored result
+for `ttl` seconds. Failed runs (and runs without a result) are not stored, so a
+retry runs again.
+
+A content hash cannot tell a double submit from a user sending the same short
+message again ("continue", "yes"), so those keys only deduplicate within
+`content_window` seconds of the first run's start.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEDUP_TTL = float(os.environ.get("ATLAS_DEDUP_TTL", "600"))
+DEDUP_MAX_ENTRIES = int(os.environ.get("ATLAS_DEDUP_MAX_ENTRIES", "1024"))
+DEDUP_CONTENT_WINDOW = float(os.environ.get("ATLAS_DEDUP_CONTENT_WINDOW", "10"))
+
+_CONTENT_KEY = ":sha256:"
+
+
+def make_run_key(
+    conversation_id: str,
+    source_message_id: Optional[str] = None,
+    user_input: Optional[str] = None,
+) -> str:
+    """Builds the idempotency key of a run from its source message id, or from its content."""
+    if source_message_id:
+        return f"{conversation_id}:id:{source_message_id}"
+    normalized = " ".join((user_input or "").split()).lower()
+    digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    return f"{conversation_id}{_CONTENT_KEY}{digest}"
+
+
+class RunDeduplicator:
+    """Coalesces runs sharing a key. Usable from the event loop and from plain threads."""
+
+    def __init__(
+        self,
+        ttl: float = DEDUP_TTL,
+        max_entries: int = DEDUP_MAX_ENTRIES,
+        content_window: float = DEDUP_CONTENT_WINDOW,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.content_window = content_window
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+        # Future of each in-flight run and when it started.
+        self._in_flight: Dict[str, Tuple[float, Future]] = {}
+        self._completed: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def _begin(self, key: str) -> Tuple[Future, bool, float]:
+        """Returns the future of the run for `key`, whether the caller must run it and when it started."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._completed.get(key)
+            if cached is not None:
+                expires_at, result = cached
+                if expires_at > now:
+                    self.stats["deduplicated_completed"] += 1
+                    logger.info(f"Duplicate run {key} answered from stored result")
+                    future: Future = Future()
+                    future.set_result(result)
+                    return future, False, now
+                del self._completed[key]
+
+            in_flight = self._in_flight.get(key)
+            if in_flight is not None:
+                started_at, future = in_flight
+                if _CONTENT_KEY not in key or now - started_at < self.content_window:
+                    self.stats["deduplicated_in_flight"] += 1
+                    logger.info(f"Duplicate run {key} attached to the in-flight run")
+                    return future, False, started_at
+
+            # A same-content run after the window replaces the in-flight entry.
+            future = Future()
+            self._in_flight[key] = (now, future)
+            self.stats["runs_started"] += 1
+            return future, True, now
+
+    def _finish(
+        self, key: str, future: Future, started_at: float, result: Any = None, error: Optional[BaseException] = None
+    ) -> None:
+        with self._lock:
+            in_flight = self._in_flight.get(key)
+            if in_flight is not None and in_flight[1] is future:
+                del self._in_flight[key]
+            if error is not None:
+                self.stats["runs_failed"] += 1
+            elif result is not None:
+                if _CONTENT_KEY in key:
+                    expires_at = started_at + self.content_window
+                else:
+                    expires_at = time.monotonic() + self.ttl
+                self._completed[key] = (expires_at, result)
+                self._completed.move_to_end(key)
+                while len(self._completed) > self.max_entries:
+                    self._completed.popitem(last=False)
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Awaits factory() unless a run with the same key is in flight or recently completed."""
+        future, is_owner, started_at = self._begin(key)
+        if not is_owner:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await factory()
+        except BaseException as e:
+            self._finish(key, future, started_at, error=e)
+            raise
+        self._finish(key, future, started_at, result=result)
+        return result
+
+    def run_sync(self, key: str, factory: Callable[[], Any]) -> Any:
+        """Blocking counterpart of run() for thread-based callers."""
+        future, is_owner, started_at = self._begin(key)
+        if not is_owner:
+            return future.result()
+        try:
+            result = factory()
+        except BaseException as e:
+            self._finish(key, future, started_at, error=e)
+            raise
+        self._finish(key, future, started_at, result=result)
+        return result
+
+
+run_deduplicator = RunDeduplicator()
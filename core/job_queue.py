@@ -0,0 +1,210 @@
+"""
+Durable job queue for agent runs.
+
+A job is claimed with a visibility timeout: while it runs nobody else can claim
+it, and if the worker dies the job becomes claimable again once the timeout
+expires. Jobs that exhaust max_attempts are marked failed.
+
+SupabaseJobQueue is the production backend (see the `jobs` table and the
+`claim_job` function in sql_model.sql). SQLiteJobQueue has the same semantics
+and is used locally and for load tests.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from core.models.job_models import Job
+from core.services import jobs as job_service
+
+JOB_QUEUE_BACKEND = os.environ.get("ATLAS_JOB_QUEUE", "supabase")
+JOB_QUEUE_PATH = os.environ.get("ATLAS_JOB_QUEUE_PATH", "data/jobs.sqlite")
+JOB_MAX_ATTEMPTS = int(os.environ.get("ATLAS_JOB_MAX_ATTEMPTS", "3"))
+
+
+class JobQueue(ABC):
+    """Interface shared by the queue backends. All methods are blocking."""
+
+    @abstractmethod
+    def enqueue(
+        self,
+        conversation_id: str,
+        user_input: str,
+        message_id: str,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+    ) -> Job: ...
+
+    @abstractmethod
+    def claim(self, visibility_timeout: float) -> Optional[Job]:
+        """Claims the oldest visible job, hiding it for visibility_timeout seconds."""
+
+    @abstractmethod
+    def complete(self, job_id: str) -> None: ...
+
+    @abstractmethod
+    def fail(self, job_id: str, error: str, retry_delay: float = 0) -> Job:
+        """Records a failed attempt. The job is retried after retry_delay unless it is out of attempts."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]: ...
+
+
+class SQLiteJobQueue(JobQueue):
+    """SQLite-backed queue. Use ":memory:" for an in-process queue."""
+
+    def __init__(self, path: str = ":memory:"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                conversation_id TEXT NOT NULL,
+                user_input TEXT NOT NULL,
+                message_id TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 3,
+                last_error TEXT,
+                visible_at REAL NOT NULL,
+                created_at REAL NOT NULL
+            );
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_claim_idx ON jobs (status, visible_at);"
+        )
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> Job:
+        return Job(**{key: row[key] for key in Job.model_fields})
+
+    def enqueue(
+        self,
+        conversation_id: str,
+        user_input: str,
+        message_id: str,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+    ) -> Job:
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, conversation_id, user_input, message_id, max_attempts, visible_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?);",
+                (job_id, conversation_id, user_input, message_id, max_attempts, now, now),
+            )
+        return Job(
+            id=job_id,
+            conversation_id=conversation_id,
+            user_input=user_input,
+            message_id=message_id,
+            max_attempts=max_attempts,
+        )
+
+    def claim(self, visibility_timeout: float) -> Optional[Job]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE;")
+            try:
+                # Leases that expired on their last attempt will never succeed.
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', last_error = COALESCE(last_error, 'Visibility timeout expired') "
+                    "WHERE status = 'running' AND visible_at <= ? AND attempts >= max_attempts;",
+                    (now,),
+                )
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status IN ('queued', 'running') AND visible_at <= ? "
+                    "ORDER BY created_at LIMIT 1;",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT;")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, visible_at = ? WHERE id = ?;",
+                    (now + visibility_timeout, row["id"]),
+                )
+                claimed = self._conn.execute(
+                    "SELECT * FROM jobs WHERE id = ?;", (row["id"],)
+                ).fetchone()
+                self._conn.execute("COMMIT;")
+            except Exception:
+                self._conn.execute("ROLLBACK;")
+                raise
+        return self._to_job(claimed)
+
+    def complete(self, job_id: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'done', last_error = NULL WHERE id = ?;",
+                (job_id,),
+            )
+
+    def fail(self, job_id: str, error: str, retry_delay: float = 0) -> Job:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+                "last_error = ?, visible_at = ? WHERE id = ?;",
+                (error, time.time() + retry_delay, job_id),
+            )
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE id = ?;", (job_id,)
+            ).fetchone()
+        return self._to_job(row)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE id = ?;", (job_id,)
+            ).fetchone()
+        return self._to_job(row) if row else None
+
+
+class SupabaseJobQueue(JobQueue):
+    """Queue backed by the `jobs` table. Claims go through the claim_job RPC (FOR UPDATE SKIP LOCKED)."""
+
+    def enqueue(
+        self,
+        conversation_id: str,
+        user_input: str,
+        message_id: str,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+    ) -> Job:
+        return job_service.insert_job(conversation_id, user_input, message_id, max_attempts)
+
+    def claim(self, visibility_timeout: float) -> Optional[Job]:
+        return job_service.claim_job(visibility_timeout)
+
+    def complete(self, job_id: str) -> None:
+        job_service.update_job(job_id, status="done", last_error=None)
+
+    def fail(self, job_id: str, error: str, retry_delay: float = 0) -> Job:
+        return job_service.fail_job(job_id, error, retry_delay)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return job_service.get_job(job_id)
+
+
+_default_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """Returns the process-wide queue selected by ATLAS_JOB_QUEUE (supabase, sqlite or memory)."""
+    global _default_queue
+    if _default_queue is None:
+        if JOB_QUEUE_BACKEND == "sqlite":
+            os.makedirs(os.path.dirname(JOB_QUEUE_PATH) or ".", exist_ok=True)
+            _default_queue = SQLiteJobQueue(JOB_QUEUE_PATH)
+        elif JOB_QUEUE_BACKEND == "memory":
+            _default_queue = SQLiteJobQueue(":memory:")
+        else:
+            _default_queue = SupabaseJobQueue()
+    return _default_queue
@@ -1,12 +1,65 @@
-from pydantic_ai.models.google import GoogleModel, GoogleModelSettings
+from __future__ import annotations
+
 import os
+import threading
+from functools import cached_property
+from typing import TYPE_CHECKING, Callable, Optional
+
 from dotenv import load_dotenv
+from pydantic_ai.models import Model
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.profiles import ModelProfile
+from pydantic_ai.profiles.google import google_model_profile
+
+if TYPE_CHECKING:
+    from pydantic_ai.models.google import GoogleModelSettings
 
 load_dotenv()
 
 MODEL_NAME = os.environ.get("MODEL_NAME")
 API_KEY = os.environ.get("GEMINI_API_KEY")
 
-# provider = GoogleProvider(api_key=API_KEY)
-settings = GoogleModelSettings(google_thinking_config={"include_thoughts": True})
-model = GoogleModel(MODEL_NAME)
+
+class LazyModel(WrapperModel):
+    """Wraps a model that is only built on first use.
+
+    Building GoogleModel imports google-genai and creates its HTTP client, which
+    is the largest part of our cold start. Agents can hold a LazyModel from
+    import time and the real model is built by the first request.
+
+    Agent() reads the model profile at construction, so pass it explicitly
+    to keep the model unbuilt until then.
+    """
+
+    def __init__(
+        self, factory: Callable[[], Model], profile: Optional[ModelProfile] = None
+    ):
+        Model.__init__(self, profile=profile)
+        self._factory = factory
+        self._wrapped: Model | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def wrapped(self) -> Model:  # type: ignore[override]
+        if self._wrapped is None:
+            with self._lock:
+                if self._wrapped is None:
+                    self._wrapped = self._factory()
+        return self._wrapped
+
+    @cached_property
+    def profile(self) -> ModelProfile:
+        if self._profile is not None:
+            return self._profile
+        return self.wrapped.profile
+
+
+def _build_model() -> Model:
+    from pydantic_ai.models.google import GoogleModel
+
+    # provider = GoogleProvider(api_key=API_KEY)
+    return GoogleModel(MODEL_NAME)
+
+
+settings: GoogleModelSettings = {"google_thinking_config": {"include_thoughts": True}}
+model = LazyModel(_build_model, profile=google_model_profile(MODEL_NAME))
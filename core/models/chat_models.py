@@ -1,5 +1,7 @@
+from datetime import datetime
+
 from pydantic import BaseModel, Field
-from typing import List, Literal, Union
+from typing import List, Literal, Optional, Union
 
 
 class Step(BaseModel):
@@ -60,6 +62,13 @@ class Message(BaseModel):
     is_loading: bool = Field(
         default=False, description="Whether the message is loading or not"
     )
+    created_at: Optional[str] = Field(
+        default=None, description="When the message was created (ISO 8601)"
+    )
+    transcript: Optional[List[dict]] = Field(
+        default=None,
+        description="Serialized agent messages of the run that produced this message",
+    )
 
 
 class Conversation(BaseModel):
@@ -71,3 +80,15 @@ class Conversation(BaseModel):
         ..., description="List of messages in the conversation"
     )
     title: str = Field(..., description="The title of the conversation")
+
+
+class ConversationSummary(BaseModel):
+    """Rolling summary of the oldest part of a conversation history."""
+
+    summary: Optional[str] = Field(
+        default=None, description="Summary of the turns up to summarized_until"
+    )
+    summarized_until: Optional[datetime] = Field(
+        default=None,
+        description="created_at of the user message opening the last summarized turn",
+    )
@@ -0,0 +1,28 @@
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
+
+
+JobStatus = Literal["queued", "running", "done", "failed"]
+
+
+class Job(BaseModel):
+    """Represents a queued agent run for one conversation turn."""
+
+    id: str = Field(..., description="The unique identifier for the job")
+    conversation_id: str = Field(
+        ..., description="The ID of the conversation the run belongs to"
+    )
+    user_input: str = Field(..., description="The user input to run the agent on")
+    message_id: str = Field(
+        ..., description="The ID of the placeholder assistant message to fill"
+    )
+    status: JobStatus = Field(default="queued", description="The status of the job")
+    attempts: int = Field(
+        default=0, description="How many times the job has been claimed"
+    )
+    max_attempts: int = Field(
+        default=3, description="How many claims are allowed before the job fails"
+    )
+    last_error: Optional[str] = Field(
+        default=None, description="The error of the last failed attempt"
+    )
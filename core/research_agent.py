@@ -2,14 +2,45 @@ from pydantic_ai import Agent, RunContext
 from core.models.agent_models import TransactionDeps
 from core.services.steps import save_search_step, save_database_step
 from core.llm import model, settings
-from exa_py import Exa
+from core.schema_catalog import schema_prompt
+from core.sql_results import format_query_results
+from core.sql_cache import SQL_CACHE
+from core.sqlite_registry import Database, UnknownDatabase, attached, databases
+from core.search_cache import (
+    EXA_CACHE,
+    EXA_OFFLINE,
+    SearchResult,
+    StubExaClient,
+    search_cache,
+)
+from core.search_passages import (
+    SEARCH_COMPACTION,
+    compact_search_results,
+    expand_text,
+    source_store,
+)
+from core.web_corpus import WEB_CORPUS, web_corpus
+from core.sql_guard import (
+    SQL_PLAN_GUARD,
+    QueryRejected,
+    QueryTimeout,
+    check_query_plan,
+    query_deadline,
+)
+from functools import lru_cache
+from typing import List, Optional
 import os
-import sqlite3
-from rich.console import Console
 
-console = Console()
 
-exa = Exa(api_key=os.environ.get("EXA_API_KEY"))
+@lru_cache(maxsize=None)
+def get_exa_client():
+    """Returns the Exa client, created on first use (exa_py is slow to import)."""
+    if EXA_OFFLINE:
+        return StubExaClient()
+    from exa_py import Exa
+
+    return Exa(api_key=os.environ.get("EXA_API_KEY"))
+
 
 AGENT_ID = "research_agent"
 RESEARCH_SYSTEM_PROMPT = """<role>
@@ -18,14 +49,14 @@ You are a world-class Research and Synthesis Agent. Your purpose is to provide d
 
 <data_sources>
 You have access to two primary data sources:
-1.  **Internal Database (`pokedex.sqlite`):** This database contains structured information, primarily about Pokémon. Use this for queries that seem to involve specific data points, lists, or relationships within the Pokémon universe (e.g., "list all legendary pokemon", "what are the stats of Pikachu", "pokemon of type fire").
+1.  **Internal Databases (SQLite):** Structured datasets, listed by `database_id` with their schema in your instructions. The default one, `pokedex`, contains structured information about Pokémon. Use this for queries that seem to involve specific data points, lists, or relationships within the Pokémon universe (e.g., "list all legendary pokemon", "what are the stats of Pikachu", "pokemon of type fire").
 2.  **Web Search (Exa):** Use this for general knowledge queries, current events, or any information not found within the internal database.
 </data_sources>
 
 <core_workflow>
 1.  **Interpret and Plan:** Analyze the query to determine the best source(s) of information.
-    - If the query is about structured data likely found in the `pokedex.sqlite` database, your plan should prioritize using `list_database_tables()`, `get_table_schema(table_name)`, and `run_sql_query(query)`.
-    - If the query is general, requires current information, or is outside the scope of the Pokémon database, your plan should be to use `search_the_web(query)`.
+    - If the query is about structured data likely found in an internal database, your plan should prioritize using `run_sql_query(query, database_id=...)`, written from the database schema given in your instructions. If no schema is given, get it first with a single `describe_database(database_id=...)` call. To combine databases in one query, pass the others in `attach` and prefix their tables with their id (`other_id.table`).
+    - If the query is general, requires current information, or is outside the scope of the Pokémon database, your plan should be to use `search_the_web(query)`. It returns the passages of each page most relevant to the query; call `expand_source(url)` only when a source's passages are not enough.
     - For complex queries, you may combine both sources, using the database for structured data and web search for supplementary context or broader understanding.
 2.  **Gather Information:** Execute your plan by calling the appropriate tool(s). Use them as many times as necessary to gather sufficient, high-quality information.
 3.  **Synthesize and Write with Authority:** Critically evaluate all gathered information. Discard irrelevant details. Synthesize the findings into a coherent, well-written, and comprehensive answer.
@@ -51,12 +82,18 @@ research_agent = Agent(
     deps_type=TransactionDeps,
 )
 
-DB_PATH = "data/pokedex.sqlite"
+
+@research_agent.instructions
+def database_schema() -> str:
+    """Gives the agent the database schemas, so it can query without exploring them first."""
+    return schema_prompt(databases.all())
 
 
 @research_agent.tool
-def search_the_web(ctx: RunContext[str], query: str, description: str) -> str:
-    """Searches the web for a given query using Exa and returns the results. Must provide a description to explain the goal of the search in the style of "We need to ..." """
+def search_the_web(
+    ctx: RunContext[str], query: str, description: str, fresh: bool = False
+) -> str:
+    """Searches the web for a given query using Exa and returns the results. Pages fetched recently for similar searches may answer from the local corpus; set fresh=True for current events or when those results are not enough. Must provide a description to explain the goal of the search in the style of "We need to ..." """
 
     new_step = save_search_step(
         message_id=ctx.deps.message_id,
@@ -66,36 +103,131 @@ def search_the_web(ctx: RunContext[str], query: str, description: str) -> str:
         is_loading=True,
     )
 
-    result = exa.search_and_contents(query, num_results=5, text=True)
+    documents = web_corpus.search(query) if WEB_CORPUS and not fresh else None
+    if documents is not None:
+        result = SearchResult.from_documents(documents)
+    else:
+        if EXA_CACHE and not fresh:
+            result = search_cache.search(
+                get_exa_client(), query, num_results=5, text=True
+            )
+        else:
+            result = SearchResult.from_response(
+                get_exa_client().search_and_contents(query, num_results=5, text=True)
+            )
+        if WEB_CORPUS:
+            web_corpus.add(result.documents)
 
     save_search_step(
         message_id=ctx.deps.message_id,
         description=description,
         agent_id=AGENT_ID,
-        sources=[source.url for source in result.results],
+        sources=result.urls,
         id=new_step.id,
         is_loading=False,
     )
-    return str(result)
+    for document in result.documents:
+        source_store.put(document["url"], document.get("title"), document["text"])
+    if not SEARCH_COMPACTION or not result.documents:
+        return result.text
+    return compact_search_results(query, result.documents)
+
+
+@research_agent.tool
+def expand_source(
+    ctx: RunContext[str], url: str, description: str, offset: int = 0
+) -> str:
+    """Returns the full text of a source returned by search_the_web, by url, when its passages are not enough. Long pages are cut: call again with the given offset for the rest. Must provide a description in the style of "We need to ..." to explain the goal of the search."""
+
+    new_step = save_search_step(
+        message_id=ctx.deps.message_id,
+        description=description,
+        agent_id=AGENT_ID,
+        sources=[url],
+        is_loading=True,
+    )
+    entry = source_store.get(url)
+    if entry is None:
+        response = get_exa_client().get_contents([url], text=True)
+        for result in response.results:
+            source_store.put(result.url, result.title, result.text or "")
+        entry = source_store.get(url)
+
+    save_search_step(
+        message_id=ctx.deps.message_id,
+        description=description,
+        agent_id=AGENT_ID,
+        sources=[url],
+        id=new_step.id,
+        is_loading=False,
+    )
+    if entry is None:
+        return f"Error: No content found for {url}."
+    title, text = entry
+    return expand_text(url, title, text, offset)
+
+
+@research_agent.tool
+def describe_database(
+    ctx: RunContext[str],
+    description: str = "Describe the tables, columns, foreign keys and row counts of the internal database",
+    database_id: Optional[str] = None,
+) -> str:
+    """Returns the full schema of an internal SQLite database (the default one when database_id is not given) in one call: every table with its row count, columns, types and foreign keys. Must provide a description in the style of "We need to ..." to explain the goal of the search."""
+
+    try:
+        database = databases.get(database_id)
+    except UnknownDatabase as e:
+        return f"Error: {e}"
+    new_step = save_database_step(
+        message_id=ctx.deps.message_id,
+        description=description,
+        agent_id=AGENT_ID,
+        query="-- schema catalog",
+        database_id=database.id,
+        is_loading=True,
+    )
+    try:
+        catalog = database.catalog()
+        result = f"Success: {catalog.render()}"
+        save_database_step(
+            message_id=ctx.deps.message_id,
+            description=description,
+            agent_id=AGENT_ID,
+            query="-- schema catalog",
+            database_id=database.id,
+            results=",".join(catalog.tables),
+            id=new_step.id,
+            is_loading=False,
+            result_type="list",
+        )
+        return result
+    except Exception as e:
+        return f"Error: Could not describe the database. Reason: {e}"
 
 
 @research_agent.tool
 def list_database_tables(
     ctx: RunContext[str],
     description: str = "List all tables available in the internal SQLite database",
+    database_id: Optional[str] = None,
 ) -> str:
-    """Lists all tables available in the internal SQLite database. Must provide a description  in the style of "We need to ..." to explain the goal of the search."""
+    """Lists all tables available in an internal SQLite database (the default one when database_id is not given). Must provide a description  in the style of "We need to ..." to explain the goal of the search."""
 
+    try:
+        database = databases.get(database_id)
+    except UnknownDatabase as e:
+        return f"Error: {e}"
     new_step = save_database_step(
         message_id=ctx.deps.message_id,
         description=description,
         agent_id=AGENT_ID,
         query="SELECT name FROM sqlite_master WHERE type='table';",
-        database_id=DB_PATH,
+        database_id=database.id,
         is_loading=True,
     )
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with database.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
             tables = [row[0] for row in cursor.fetchall()]
@@ -111,7 +243,7 @@ def list_database_tables(
                 description=description,
                 agent_id=AGENT_ID,
                 query="SELECT name FROM sqlite_master WHERE type='table';",
-                database_id=DB_PATH,
+                database_id=database.id,
                 results=",".join(tables),
                 id=new_step.id,
                 is_loading=False,
@@ -127,20 +259,25 @@ def get_table_schema(
     ctx: RunContext[str],
     table_name: str,
     description: str = "Get the schema for a specific table in the database",
+    database_id: Optional[str] = None,
 ) -> str:
-    """Returns the schema (columns and their types) for a specific table in the database. Must provide a description  in the style of "We need to ..." to explain the goal of the search."""
+    """Returns the schema (columns and their types) for a specific table in an internal database (the default one when database_id is not given). Must provide a description  in the style of "We need to ..." to explain the goal of the search."""
 
+    try:
+        database = databases.get(database_id)
+    except UnknownDatabase as e:
+        return f"Error: {e}"
     new_step = save_database_step(
         message_id=ctx.deps.message_id,
         description=description,
         agent_id=AGENT_ID,
         query=f"PRAGMA table_info({table_name});",
-        database_id=DB_PATH,
+        database_id=database.id,
         is_loading=True,
     )
 
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with database.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute(f"PRAGMA table_info({table_name});")
             schema = cursor.fetchall()
@@ -157,7 +294,7 @@ def get_table_schema(
                 description=description,
                 agent_id=AGENT_ID,
                 query=f"PRAGMA table_info({table_name});",
-                database_id=DB_PATH,
+                database_id=database.id,
                 results=",".join(columns),
                 id=new_step.id,
                 is_loading=False,
@@ -168,52 +305,105 @@ def get_table_schema(
         return f"Error: Could not get schema for table {table_name}. Reason: {e}"
 
 
+def _execute_query(
+    database: Database, others: List[Database], query: str, offset: int
+) -> str:
+    with database.pool.connection() as conn, attached(conn, others):
+        if SQL_PLAN_GUARD:
+            # Tables of the queried database win over same-named attached ones.
+            row_counts = {}
+            for queried in reversed([database, *others]):
+                row_counts.update(
+                    (name, table.row_count)
+                    for name, table in queried.catalog().tables.items()
+                )
+            check_query_plan(conn, query, row_counts)
+        with query_deadline(conn):
+            cursor = conn.cursor()
+            cursor.execute(query)
+            # Streamed with fetchmany and capped in rows and bytes (see core.sql_results)
+            formatted = format_query_results(cursor, offset=offset)
+
+    if formatted is None:
+        return "Success: The query executed successfully but returned no results."
+    return formatted.text
+
+
 @research_agent.tool
 def run_sql_query(
     ctx: RunContext[str],
     query: str,
     description: str = "Run a SQL query against the internal database",
+    offset: int = 0,
+    database_id: Optional[str] = None,
+    attach: Optional[List[str]] = None,
 ) -> str:
-    """Executes a SQL query against the internal database. Must provide a description  in the style of "We need to ..." to explain the goal of the query."""
+    """Executes a SQL query against an internal database (the default one when database_id is not given). Must provide a description  in the style of "We need to ..." to explain the goal of the query. Large results are truncated: pass the offset given in the truncation note to get the next rows. To join with other internal databases, list their ids in `attach` and prefix their tables with the id (`other_id.table`)."""
 
+    try:
+        database = databases.get(database_id)
+        others = [
+            databases.get(other)
+            for other in dict.fromkeys(attach or [])
+            if other != database.id
+        ]
+    except UnknownDatabase as e:
+        return f"Error: {e}"
     new_step = save_database_step(
         message_id=ctx.deps.message_id,
         description=description,
         agent_id=AGENT_ID,
         query=query,
-        database_id=DB_PATH,
+        database_id=database.id,
         is_loading=True,
     )
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.execute(query)
-
-            columns = [description[0] for description in cursor.description]
-            results = cursor.fetchall()
-
-            if not results:
-                return (
-                    "Success: The query executed successfully but returned no results."
-                )
-
-            # Format results as a string
-            formatted_results = f"Query Results ({len(results)} rows):\n"
-            formatted_results += ", ".join(columns) + "\n"
-            for row in results:
-                formatted_results += ", ".join(map(str, row)) + "\n"
-
-            save_database_step(
-                message_id=ctx.deps.message_id,
-                description=description,
-                agent_id=AGENT_ID,
-                query=query,
-                database_id=DB_PATH,
-                results=formatted_results,
-                id=new_step.id,
-                is_loading=False,
-                result_type="text",
+        key = None
+        formatted_results = None
+        if SQL_CACHE:
+            queried = [database, *others]
+            key = database.cache.key(
+                query,
+                "+".join(d.id for d in queried),
+                tuple(d.pool.fingerprint() for d in queried),
+                offset,
             )
-            return formatted_results
+            formatted_results = database.cache.get(key)
+        cache_hit = formatted_results is not None
+        if not cache_hit:
+            formatted_results = _execute_query(database, others, query, offset)
+            if key is not None:
+                database.cache.put(key, formatted_results)
+
+        save_database_step(
+            message_id=ctx.deps.message_id,
+            description=description,
+            agent_id=AGENT_ID,
+            query=query,
+            database_id=database.id,
+            results=formatted_results,
+            id=new_step.id,
+            is_loading=False,
+            result_type="text",
+            cache=database.cache.summary(cache_hit) if SQL_CACHE else None,
+        )
+        return formatted_results
+    except QueryRejected as e:
+        error = f"Error: The SQL query was rejected before running. Reason: {e}"
+    except QueryTimeout as e:
+        error = f"Error: The SQL query took too long. Reason: {e}"
     except Exception as e:
-        return f"Error: The SQL query failed. Reason: {e}"
+        error = f"Error: The SQL query failed. Reason: {e}"
+    # A failed query still ends its step, which would otherwise stay loading.
+    save_database_step(
+        message_id=ctx.deps.message_id,
+        description=description,
+        agent_id=AGENT_ID,
+        query=query,
+        database_id=database.id,
+        results=error,
+        id=new_step.id,
+        is_loading=False,
+        result_type="text",
+    )
+    return error
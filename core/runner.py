@@ -0,0 +1,332 @@
+import asyncio
+import logging
+import os
+import uuid
+from typing import (
+    Any,
+    AsyncGenerator,
+    Callable,
+    Dict,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from core.research_agent import research_agent as agent
+from core.models.agent_models import TransactionDeps
+from core.agent_utils import (
+    history_cache,
+    process_chat_with_full_details,
+    prepare_messages_for_agent,
+)
+from core.models.job_models import Job
+from core.services.messages import (
+    acreate_message,
+    asave_message,
+    message_write_buffer,
+    save_message,
+    save_message_transcript,
+)
+from core.services.steps import step_recorder
+from core.transcripts import dump_transcript, record_tool_calls
+from core.idempotency import make_run_key, run_deduplicator
+from core.blocking import (
+    get_event_loop,
+    limit_tool_threads,
+    run_blocking,
+    run_coroutine,
+    use_running_loop,
+)
+from core.job_queue import get_job_queue
+from core.worker import get_worker_pool
+
+logger = logging.getLogger(__name__)
+
+# "sync" runs the agent inside the request, "enqueue" returns 202 and lets the worker pool run it.
+RUN_MODE = os.environ.get("ATLAS_RUN_MODE", "sync")
+# Stream the answer into the placeholder message while the agent generates it.
+STREAMING = os.environ.get("ATLAS_STREAMING", "false").lower() == "true"
+# Content of a placeholder whose run failed before any text was written.
+RUN_FAILED_CONTENT = "Sorry, something went wrong while answering. Please try again."
+
+
+def parse_new_message_request(
+    request_json: Optional[Mapping[str, Any]],
+    request_args: Optional[Mapping[str, Any]],
+) -> Tuple[str, str, Optional[str]]:
+    """
+    Extracts (user_input, conversation_id, message_id) from a request body or query string.
+    message_id is the optional id of the source message, used to deduplicate runs.
+    Raises ValueError with a client-facing message if a required field is missing.
+    """
+    values = {}
+    for field in ("user_input", "conversation_id", "message_id"):
+        if request_json and field in request_json:
+            values[field] = request_json[field]
+            logger.info(f"{field} found in JSON: {values[field]}")
+        elif request_args and field in request_args:
+            values[field] = request_args[field]
+            logger.info(f"{field} found in args: {values[field]}")
+        elif field != "message_id":
+            logger.warning(f"No {field} provided")
+            raise ValueError(f"No {field} provided")
+
+    return values["user_input"], values["conversation_id"], values.get("message_id")
+
+
+class AgentRunError(Exception):
+    """The agent run ended with an error event."""
+
+
+async def run_agent(
+    conversation_id: str,
+    user_input: str,
+    message_id: Optional[str] = None,
+    stream: bool = STREAMING,
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    final_attempt: bool = True,
+) -> Optional[str]:
+    """
+    Runs one conversation turn: creates the assistant placeholder message
+    (unless message_id points to an existing one), runs the research agent
+    and saves its final response. Returns the final response content.
+    A failed run stops the placeholder loading and raises (AgentRunError for
+    the agent's own errors), so callers can retry it. With final_attempt=False
+    (a job that will be retried) the placeholder is left empty and loading
+    instead, for the retry to fill.
+
+    With stream=True the placeholder is updated with the partial answer as it
+    is generated, through the coalescing message_write_buffer.
+
+    on_event, if given, is called with every event of the run, starting with
+    a "run_started" event carrying the placeholder message_id.
+    """
+    # Message and step writes go through the async Supabase client of the shared
+    # loop; the remaining blocking calls run in the bounded pool.
+    limit_tool_threads()
+    placeholder = None
+    if message_id is None:
+        # The id is generated here, so the placeholder insert does not hold up the run.
+        message_id = str(uuid.uuid4())
+        logger.info(
+            f"Saving new message {message_id} for conversation_id={conversation_id}"
+        )
+        placeholder = acreate_message(
+            conversation_id, content="", is_loading=True, id=message_id
+        )
+    new_transaction = TransactionDeps(message_id=message_id)
+    logger.info(f"Created TransactionDeps with message_id={message_id}")
+    if on_event:
+        on_event({"message_type": "run_started", "message_id": message_id})
+
+    # Prepare historical messages for the agent, while the placeholder is
+    # inserted (being loading, it is not part of the history either way).
+    history = run_blocking(
+        prepare_messages_for_agent, conversation_id, asyncio.get_running_loop()
+    )
+    if placeholder is None:
+        message_history = await history
+    else:
+        _, message_history = await asyncio.gather(placeholder, history)
+        logger.info(f"New message saved with id={message_id}")
+    logger.info(f"Prepared {len(message_history)} messages for the agent.")
+
+    final_content = None
+    partial_content = ""
+    try:
+        async for message in process_chat_with_full_details(
+            user_prompt=user_input,
+            agent=agent,
+            transaction=new_transaction,
+            message_history=message_history,
+            stream=stream,
+        ):
+            if on_event:
+                on_event(message)
+            message_type = message.get("message_type")
+            if message_type == "text_delta":
+                partial_content += message.get("content")
+                # Only recorded: the buffer's flusher thread writes it behind.
+                message_write_buffer.update(
+                    conversation_id, partial_content, message_id
+                )
+                continue
+            logger.info(
+                f"Agent message: { {k: v for k, v in message.items() if k != 'new_messages'} }"
+            )
+            if message_type == "agent_tool_call":
+                # Text generated before a tool call is not part of the answer.
+                partial_content = ""
+            elif message_type == "final_response":
+                logger.info("Final response received, saving message content.")
+                final_content = message.get("content")
+                # Steps are written before the message stops loading.
+                await run_blocking(step_recorder.drain, message_id)
+                await run_blocking(
+                    _save_transcript,
+                    conversation_id,
+                    message_id,
+                    message.get("new_messages"),
+                    message_history,
+                )
+                await run_blocking(
+                    message_write_buffer.finish,
+                    conversation_id,
+                    final_content,
+                    message_id,
+                )
+            elif message_type == "error":
+                # Raised so the job is retried and the run is not stored as done.
+                raise AgentRunError(message.get("content"))
+    except Exception as e:
+        logger.error(f"Error during agent processing: {e}", exc_info=True)
+        await run_blocking(step_recorder.drain, message_id)
+        if final_attempt:
+            # Keep what was streamed so far and stop the loading state.
+            await run_blocking(
+                message_write_buffer.finish,
+                conversation_id,
+                partial_content or RUN_FAILED_CONTENT,
+                message_id,
+            )
+        else:
+            # Drop the partial answer; the retry writes into the same placeholder.
+            await run_blocking(
+                message_write_buffer.finish, conversation_id, "", message_id, True
+            )
+        raise
+    return final_content
+
+
+def _save_transcript(
+    conversation_id: str,
+    message_id: str,
+    new_messages: Optional[list],
+    history: Optional[list] = None,
+) -> None:
+    """Stores the run transcript before the message stops loading, so the next turn sees it."""
+    if not new_messages:
+        return
+    redundant = record_tool_calls(conversation_id, history or [], new_messages)
+    if redundant:
+        logger.info(
+            f"{redundant} tool call(s) repeated a call of an earlier turn of the conversation"
+        )
+    try:
+        save_message_transcript(message_id, dump_transcript(new_messages))
+    except Exception as e:
+        # The answer matters more than its transcript.
+        logger.warning(f"Could not save the transcript of message {message_id}: {e}")
+
+
+async def run_agent_once(
+    conversation_id: str, user_input: str, source_message_id: Optional[str] = None
+) -> Optional[str]:
+    """
+    run_agent behind the idempotency layer: a duplicate trigger attaches to the
+    in-flight run or gets its stored result instead of starting a new run.
+    """
+    key = make_run_key(conversation_id, source_message_id, user_input)
+    return await run_deduplicator.run(
+        key, lambda: run_agent(conversation_id, user_input)
+    )
+
+
+# Runs started by stream_agent_run keep going when the client disconnects.
+_background_runs: Set[asyncio.Task] = set()
+_RUN_DONE = object()
+
+
+def _forget_background_run(task: asyncio.Task) -> None:
+    _background_runs.discard(task)
+    if not task.cancelled():
+        task.exception()  # already logged by run_agent; marks it as retrieved
+
+
+async def stream_agent_run(
+    conversation_id: str, user_input: str, source_message_id: Optional[str] = None
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Runs a streamed turn in a background task and yields its events as they
+    are produced. Persistence happens in the task, so it completes even if the
+    consumer stops iterating. A duplicate trigger only gets the final response.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+    key = make_run_key(conversation_id, source_message_id, user_input)
+    task = asyncio.create_task(
+        run_deduplicator.run(
+            key,
+            lambda: run_agent(
+                conversation_id, user_input, stream=True, on_event=events.put_nowait
+            ),
+        )
+    )
+    _background_runs.add(task)
+    task.add_done_callback(_forget_background_run)
+    task.add_done_callback(lambda _: events.put_nowait(_RUN_DONE))
+
+    final_sent = error_sent = False
+    while (event := await events.get()) is not _RUN_DONE:
+        final_sent = final_sent or event.get("message_type") == "final_response"
+        error_sent = error_sent or event.get("message_type") == "error"
+        yield event
+
+    if task.cancelled():
+        if not error_sent:
+            yield {
+                "message_type": "error",
+                "content": "Error processing request: the run was cancelled",
+            }
+    elif task.exception() is not None:
+        if not error_sent:
+            yield {
+                "message_type": "error",
+                "content": f"Error processing request: {task.exception()}",
+            }
+    elif not final_sent:
+        yield {"message_type": "final_response", "content": task.result()}
+
+
+async def run_job(job: Job) -> None:
+    """
+    Worker pool handler: runs a queued turn into its placeholder message.
+    Only the last attempt leaves a failure message in the placeholder. A retry
+    first sets the placeholder loading again, in case an earlier attempt
+    finished it, and drops the cached history that holds it as final.
+    """
+    if job.attempts > 1:
+        await asave_message(
+            job.conversation_id, "", is_loading=True, id=job.message_id
+        )
+        history_cache.invalidate(job.conversation_id)
+    await run_agent(
+        job.conversation_id,
+        job.user_input,
+        message_id=job.message_id,
+        final_attempt=job.attempts >= job.max_attempts,
+    )
+
+
+def enqueue_agent_run(
+    conversation_id: str, user_input: str, source_message_id: Optional[str] = None
+) -> Job:
+    """
+    Creates the placeholder message and a durable job for it, then wakes the
+    local worker pool. Returns as soon as the job row is written.
+    A duplicate trigger gets the job of the original one.
+    """
+    key = make_run_key(conversation_id, source_message_id, user_input)
+    return run_deduplicator.run_sync(
+        key, lambda: _enqueue_agent_run(conversation_id, user_input)
+    )
+
+
+def _enqueue_agent_run(conversation_id: str, user_input: str) -> Job:
+    new_message = save_message(conversation_id, content="", is_loading=True)
+    job = get_job_queue().enqueue(conversation_id, user_input, new_message.id)
+    logger.info(f"Enqueued job {job.id} for message_id={new_message.id}")
+
+    loop = get_event_loop()
+    loop.call_soon_threadsafe(lambda: get_worker_pool().notify())
+    return job
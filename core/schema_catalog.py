@@ -0,0 +1,185 @@
+"""
+Schema catalog of the SQLite databases queried by the research agent.
+
+The catalog (tables, columns with their types, foreign keys and row counts) is
+read once per database file and kept until the file's mtime or size changes.
+The agent gets it either in its instructions (ATLAS_SCHEMA_IN_PROMPT) or with
+a single `describe_database` call, instead of one `list_database_tables` call
+followed by one `get_table_schema` call per table.
+
+With several databases registered (see core.sqlite_registry), the prompt holds
+the catalog of each while they fit in ATLAS_SCHEMA_PROMPT_MAX_CHARS; the
+others are only named, for describe_database.
+"""
+
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.sqlite_pool import SQLiteConnectionPool
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_IN_PROMPT = os.environ.get("ATLAS_SCHEMA_IN_PROMPT", "true").lower() == "true"
+# Larger catalogs are left to describe_database rather than sent with every request.
+SCHEMA_PROMPT_MAX_CHARS = int(os.environ.get("ATLAS_SCHEMA_PROMPT_MAX_CHARS", "8000"))
+SCHEMA_ROW_COUNTS = os.environ.get("ATLAS_SCHEMA_ROW_COUNTS", "true").lower() == "true"
+
+
+@dataclass
+class Column:
+    name: str
+    type: str
+    primary_key: bool = False
+    not_null: bool = False
+
+
+@dataclass
+class ForeignKey:
+    column: str
+    table: str
+    to_column: Optional[str]
+
+
+@dataclass
+class Table:
+    name: str
+    columns: List[Column] = field(default_factory=list)
+    foreign_keys: List[ForeignKey] = field(default_factory=list)
+    row_count: Optional[int] = None
+
+
+@dataclass
+class SchemaCatalog:
+    database_id: str
+    fingerprint: Tuple[int, int]
+    tables: Dict[str, Table] = field(default_factory=dict)
+
+    def render(self) -> str:
+        """Compact text description of the database, one block per table."""
+        lines = [f"Database `{self.database_id}` ({len(self.tables)} tables):"]
+        for table in self.tables.values():
+            rows = f", {table.row_count} rows" if table.row_count is not None else ""
+            lines.append(f"\nTable {table.name}{rows}")
+            for column in table.columns:
+                flags = "".join(
+                    [
+                        " PK" if column.primary_key else "",
+                        " NOT NULL" if column.not_null else "",
+                    ]
+                )
+                lines.append(f"  - {column.name} {column.type or 'ANY'}{flags}")
+            for fk in table.foreign_keys:
+                target = f"{fk.table}.{fk.to_column}" if fk.to_column else fk.table
+                lines.append(f"  - FK {fk.column} -> {target}")
+        return "\n".join(lines)
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def build_catalog(pool: SQLiteConnectionPool, database_id: str) -> SchemaCatalog:
+    with pool.connection() as conn:
+        fingerprint = pool.fingerprint()
+        catalog = SchemaCatalog(database_id=database_id, fingerprint=fingerprint)
+        names = [
+            row[0]
+            for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' "
+                "AND name NOT LIKE 'sqlite_%' ORDER BY name"
+            )
+        ]
+        for name in names:
+            table = Table(name=name)
+            for _, column, type_, not_null, _, pk in conn.execute(
+                f"PRAGMA table_info({_quote(name)})"
+            ):
+                table.columns.append(
+                    Column(column, type_, primary_key=bool(pk), not_null=bool(not_null))
+                )
+            for row in conn.execute(f"PRAGMA foreign_key_list({_quote(name)})"):
+                table.foreign_keys.append(
+                    ForeignKey(column=row[3], table=row[2], to_column=row[4])
+                )
+            if SCHEMA_ROW_COUNTS:
+                table.row_count = conn.execute(
+                    f"SELECT COUNT(*) FROM {_quote(name)}"
+                ).fetchone()[0]
+            catalog.tables[name] = table
+    logger.info(f"Built schema catalog of {database_id}: {len(names)} tables")
+    return catalog
+
+
+_catalogs: Dict[str, SchemaCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_schema_catalog(pool: SQLiteConnectionPool, database_id: str) -> SchemaCatalog:
+    """Returns the catalog of the database behind `pool`, rebuilt if the file changed."""
+    fingerprint = pool.fingerprint()
+    catalog = _catalogs.get(pool.path)
+    if (
+        catalog is not None
+        and catalog.fingerprint == fingerprint
+        and catalog.database_id == database_id
+    ):
+        return catalog
+    with _catalogs_lock:
+        catalog = _catalogs.get(pool.path)
+        if (
+            catalog is None
+            or catalog.fingerprint != fingerprint
+            or catalog.database_id != database_id
+        ):
+            catalog = build_catalog(pool, database_id)
+            _catalogs[pool.path] = catalog
+    return catalog
+
+
+def schema_prompt(databases: Iterable) -> str:
+    """
+    Schema instructions for the agent, or "" when disabled or unavailable.
+    `databases` are core.sqlite_registry.Database entries.
+    """
+    if not SCHEMA_IN_PROMPT:
+        return ""
+    rendered = []
+    omitted = []
+    size = 0
+    for database in databases:
+        try:
+            text = database.catalog().render()
+        except Exception as e:
+            logger.warning(f"Schema catalog unavailable for {database.id}: {e}")
+            continue
+        if database.description:
+            text = f"{database.description}\n{text}"
+        if size + len(text) > SCHEMA_PROMPT_MAX_CHARS:
+            omitted.append(database)
+            continue
+        rendered.append(text)
+        size += len(text)
+    if not rendered and not omitted:
+        return ""
+
+    prompt = ""
+    if rendered:
+        prompt = (
+            "<database_schema>\n" + "\n\n".join(rendered) + "\n</database_schema>\n"
+            "This schema is current: write `run_sql_query` queries from it directly, "
+            "without listing tables or fetching table schemas first."
+        )
+    if omitted:
+        listed = "\n".join(
+            f"- `{database.id}`"
+            + (f": {database.description}" if database.description else "")
+            for database in omitted
+        )
+        prompt += (
+            f"\nOther databases, too large to describe here: call "
+            f"`describe_database(database_id)` to get their schema.\n{listed}"
+        )
+    return prompt.strip()
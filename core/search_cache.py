@@ -0,0 +1,209 @@
+"""
+Cache of Exa search_and_contents results.
+
+Entries are keyed on the normalized query (case and whitespace folded) and the
+search options, stored in a SQLite file (ATLAS_EXA_CACHE_PATH, see
+core.disk_cache) shared by the workers of one host. They expire after ATLAS_EXA_CACHE_TTL seconds, and the
+least recently used entries are evicted past ATLAS_EXA_CACHE_MAX_BYTES.
+
+Concurrent lookups of the same key share one upstream call: the first caller
+runs the search, the others wait for its result (single flight).
+
+With ATLAS_EXA_OFFLINE=true, StubExaClient replaces Exa: searches return
+canned results and no network call is made.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from core.disk_cache import DiskCache
+
+EXA_CACHE = os.environ.get("ATLAS_EXA_CACHE", "true").lower() == "true"
+EXA_CACHE_PATH = os.environ.get(
+    "ATLAS_EXA_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "atlas_exa_cache.sqlite"),
+)
+EXA_CACHE_TTL = float(os.environ.get("ATLAS_EXA_CACHE_TTL", "86400"))
+EXA_CACHE_MAX_BYTES = int(
+    os.environ.get("ATLAS_EXA_CACHE_MAX_BYTES", str(128 * 1024 * 1024))
+)
+EXA_OFFLINE = os.environ.get("ATLAS_EXA_OFFLINE", "false").lower() == "true"
+
+
+def normalize_query(query: str) -> str:
+    """Canonical text of a search query: case and whitespace differences normalize the same."""
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+@dataclass
+class SearchResult:
+    """What search_the_web uses from a search: the source urls, the raw text and each page."""
+
+    urls: List[str]
+    text: str
+    # url, title, published_date and text of each result.
+    documents: List[dict] = field(default_factory=list)
+
+    @classmethod
+    def from_response(cls, response) -> "SearchResult":
+        return cls(
+            urls=[result.url for result in response.results],
+            text=str(response),
+            documents=[
+                {
+                    "url": result.url,
+                    "title": getattr(result, "title", None),
+                    "published_date": getattr(result, "published_date", None),
+                    "text": getattr(result, "text", None) or "",
+                }
+                for result in response.results
+            ],
+        )
+
+    @classmethod
+    def from_documents(cls, documents: List[dict]) -> "SearchResult":
+        return cls(
+            urls=[document["url"] for document in documents],
+            text="\n\n".join(
+                f"Title: {d.get('title') or ''}\nURL: {d['url']}\nText: {d['text']}"
+                for d in documents
+            ),
+            documents=documents,
+        )
+
+
+@dataclass
+class StubResult:
+    url: str
+    title: str
+    text: str
+
+
+@dataclass
+class StubResponse:
+    results: List[StubResult] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        return "\n\n".join(
+            f"Title: {r.title}\nURL: {r.url}\nText: {r.text}" for r in self.results
+        )
+
+
+class StubExaClient:
+    """Offline stand-in for exa_py.Exa: deterministic results, calls counted in `calls`."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def search_and_contents(self, query: str, num_results: int = 10, **kwargs):
+        with self._lock:
+            self.calls[query] += 1
+        if self.delay:
+            time.sleep(self.delay)
+        slug = re.sub(r"\W+", "-", normalize_query(query)).strip("-") or "query"
+        return StubResponse(
+            results=[
+                StubResult(
+                    url=f"https://example.com/{slug}/{i}",
+                    title=f"Result {i} for {query}",
+                    text=f"Offline result {i} for the query: {query}",
+                )
+                for i in range(num_results)
+            ]
+        )
+
+    def get_contents(self, urls: List[str], **kwargs):
+        return StubResponse(
+            results=[
+                StubResult(url=url, title=url, text=f"Offline contents of {url}")
+                for url in urls
+            ]
+        )
+
+
+class SearchCache:
+    """TTL + size-capped SQLite cache of search results with single-flight lookups."""
+
+    def __init__(
+        self,
+        path: Optional[str] = EXA_CACHE_PATH,
+        ttl: float = EXA_CACHE_TTL,
+        max_bytes: int = EXA_CACHE_MAX_BYTES,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.ttl = ttl
+        self.clock = clock
+        self.disk = DiskCache(path, max_bytes, "Exa cache", clock)
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+
+    @staticmethod
+    def key(query: str, **options) -> str:
+        raw = json.dumps([normalize_query(query), options], sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def search(
+        self, client, query: str, num_results: int = 5, text: bool = True
+    ) -> SearchResult:
+        """Returns the cached results of the search, running it on `client` on a miss."""
+        key = self.key(query, num_results=num_results, text=text)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            self.stats["shared"] += 1
+            return future.result()
+
+        try:
+            result = SearchResult.from_response(
+                client.search_and_contents(query, num_results=num_results, text=text)
+            )
+            self.put(key, result)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def get(self, key: str) -> Optional[SearchResult]:
+        value = self.disk.get(key)
+        if value is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return SearchResult(**json.loads(value))
+
+    def put(self, key: str, result: SearchResult) -> None:
+        value = json.dumps(
+            {"urls": result.urls, "text": result.text, "documents": result.documents}
+        )
+        self.stats["evictions"] += self.disk.put(key, value, self.clock() + self.ttl)
+
+
+search_cache = SearchCache()
@@ -0,0 +1,223 @@
+"""
+Compaction of web search results before they reach the model.
+
+The pages returned by a search are split into passages of about
+ATLAS_SEARCH_PASSAGE_CHARS characters, scored against the query with BM25 and
+the best ones kept, grouped by source, within ATLAS_SEARCH_TOKEN_BUDGET tokens.
+Scoring is local: no model or network call.
+
+The full text of each page stays in source_store, a byte-bounded LRU keyed by
+url, for the expand_source tool.
+"""
+
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from core.history_compactor import CHARS_PER_TOKEN
+
+SEARCH_COMPACTION = os.environ.get("ATLAS_SEARCH_COMPACTION", "true").lower() == "true"
+SEARCH_TOKEN_BUDGET = int(os.environ.get("ATLAS_SEARCH_TOKEN_BUDGET", "3000"))
+SEARCH_PASSAGE_CHARS = int(os.environ.get("ATLAS_SEARCH_PASSAGE_CHARS", "800"))
+SOURCE_STORE_MAX_BYTES = int(
+    os.environ.get("ATLAS_SOURCE_STORE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+EXPAND_SOURCE_MAX_CHARS = int(os.environ.get("ATLAS_EXPAND_SOURCE_MAX_CHARS", "12000"))
+
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+_WORD = re.compile(r"\w+")
+_STOPWORDS = set(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was were what when where which who why how with".split()
+)
+
+compaction_stats: Counter = Counter()
+
+
+@dataclass
+class Passage:
+    source: int  # Index of the document in the search results
+    position: int  # Index of the passage in its document
+    text: str
+
+
+def tokenize(text: str) -> List[str]:
+    return [w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS]
+
+
+def split_passages(text: str, max_chars: int = SEARCH_PASSAGE_CHARS) -> List[str]:
+    """Splits text on paragraph then sentence boundaries into chunks of at most max_chars."""
+    pieces: List[str] = []
+    for paragraph in re.split(r"\n\s*\n|\n", text):
+        paragraph = " ".join(paragraph.split())
+        if len(paragraph) <= max_chars:
+            if paragraph:
+                pieces.append(paragraph)
+            continue
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+            while len(sentence) > max_chars:
+                pieces.append(sentence[:max_chars])
+                sentence = sentence[max_chars:]
+            if sentence:
+                pieces.append(sentence)
+
+    passages: List[str] = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            passages.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        passages.append(current)
+    return passages
+
+
+def bm25_scores(query: str, passages: List[str]) -> List[float]:
+    terms = set(tokenize(query))
+    documents = [Counter(tokenize(p)) for p in passages]
+    if not terms or not documents:
+        return [0.0] * len(passages)
+    average_length = sum(sum(d.values()) for d in documents) / len(documents) or 1
+    idf: Dict[str, float] = {}
+    for term in terms:
+        containing = sum(1 for d in documents if term in d)
+        idf[term] = math.log(
+            1 + (len(documents) - containing + 0.5) / (containing + 0.5)
+        )
+    scores = []
+    for document in documents:
+        length = sum(document.values())
+        score = 0.0
+        for term in terms:
+            frequency = document.get(term, 0)
+            if frequency:
+                score += idf[term] * (
+                    frequency
+                    * (_BM25_K1 + 1)
+                    / (
+                        frequency
+                        + _BM25_K1 * (1 - _BM25_B + _BM25_B * length / average_length)
+                    )
+                )
+        scores.append(score)
+    return scores
+
+
+def compact_search_results(
+    query: str,
+    documents: List[dict],
+    token_budget: int = SEARCH_TOKEN_BUDGET,
+    passage_chars: int = SEARCH_PASSAGE_CHARS,
+) -> str:
+    """The passages of `documents` most relevant to `query`, grouped by source, within token_budget."""
+    passages = [
+        Passage(source, position, text)
+        for source, document in enumerate(documents)
+        for position, text in enumerate(
+            split_passages(document.get("text") or "", passage_chars)
+        )
+    ]
+    scores = bm25_scores(query, [p.text for p in passages])
+    ranked = sorted(range(len(passages)), key=lambda i: scores[i], reverse=True)
+
+    budget = token_budget * CHARS_PER_TOKEN
+    selected: List[Passage] = []
+    used = 0
+    for i in ranked:
+        if scores[i] <= 0 and selected:
+            break
+        if used + len(passages[i].text) > budget:
+            continue
+        selected.append(passages[i])
+        used += len(passages[i].text)
+
+    by_source: Dict[int, List[Passage]] = {}
+    for passage in sorted(selected, key=lambda p: (p.source, p.position)):
+        by_source.setdefault(passage.source, []).append(passage)
+
+    sections = []
+    for source, document in enumerate(documents):
+        header = f"Title: {document.get('title') or ''}\nURL: {document['url']}"
+        if document.get("published_date"):
+            header += f"\nPublished Date: {document['published_date']}"
+        kept = by_source.get(source)
+        if kept:
+            body = "\n[...]\n".join(p.text for p in kept)
+        else:
+            body = "(no passage relevant to the query)"
+        sections.append(f"{header}\nPassages:\n{body}")
+
+    total = sum(len(d.get("text") or "") for d in documents)
+    compaction_stats["searches"] += 1
+    compaction_stats["chars_in"] += total
+    compaction_stats["chars_out"] += used
+    return (
+        "\n\n".join(sections)
+        + f"\n\n(Showing {len(selected)} of {len(passages)} passages, about "
+        f"{used // CHARS_PER_TOKEN} of {total // CHARS_PER_TOKEN} tokens. Call "
+        "expand_source(url) for the full text of a source.)"
+    )
+
+
+class SourceStore:
+    """Byte-bounded LRU of the full text of fetched pages, keyed by url."""
+
+    def __init__(self, max_bytes: int = SOURCE_STORE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[Optional[str], str]]" = OrderedDict()
+
+    def put(self, url: str, title: Optional[str], text: str) -> None:
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(url)
+            self._entries[url] = (title, text)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def get(self, url: str) -> Optional[Tuple[Optional[str], str]]:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def _remove(self, url: str) -> None:
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            self.size -= len(entry[1].encode("utf-8"))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def expand_text(
+    url: str,
+    title: Optional[str],
+    text: str,
+    offset: int = 0,
+    max_chars: int = EXPAND_SOURCE_MAX_CHARS,
+) -> str:
+    """A window of the full text of a source, with the offset to continue from when cut."""
+    chunk = text[offset : offset + max_chars]
+    output = f"Title: {title or ''}\nURL: {url}\nText:\n{chunk}"
+    if offset + max_chars < len(text):
+        output += (
+            f"\n\n(Characters {offset}-{offset + len(chunk)} of {len(text)}. Call "
+            f"expand_source again with offset={offset + max_chars} for the rest.)"
+        )
+    return output
+
+
+source_store = SourceStore()
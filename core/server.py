@@ -0,0 +1,190 @@
+"""
+ASGI entry point. One event loop per process serves many agent runs concurrently.
+
+Run locally with:
+    uvicorn core.server:app --host 0.0.0.0 --port 8080
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
+from starlette.routing import Route
+
+from core.agent_utils import history_cache, history_compactor
+from core.transcripts import tool_call_stats
+from core.events import encode_ndjson, encode_sse
+from core.runner import (
+    RUN_MODE,
+    enqueue_agent_run,
+    parse_new_message_request,
+    run_agent_once,
+    stream_agent_run,
+    use_running_loop,
+)
+from core.idempotency import run_deduplicator
+from core.sqlite_registry import databases
+from core.services.steps import step_recorder
+from core.search_cache import search_cache
+from core.search_passages import compaction_stats, source_store
+from core.web_corpus import web_corpus
+from core.worker import get_worker_pool
+
+logger = logging.getLogger(__name__)
+
+
+async def _read_json(request: Request):
+    try:
+        return await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+
+
+async def new_message(request: Request) -> Response:
+    """Async counterpart of main.new_message_request."""
+    logger.info("Received new_message request")
+    request_json = await _read_json(request)
+
+    try:
+        user_input, conversation_id, source_message_id = parse_new_message_request(
+            request_json, request.query_params
+        )
+    except ValueError as e:
+        return PlainTextResponse(str(e), status_code=400)
+
+    if RUN_MODE == "enqueue":
+        try:
+            job = await asyncio.to_thread(
+                enqueue_agent_run, conversation_id, user_input, source_message_id
+            )
+        except Exception as e:
+            logger.error(f"Error enqueuing new_message: {e}", exc_info=True)
+            return PlainTextResponse(f"Internal server error: {e}", status_code=500)
+        return JSONResponse(
+            {"job_id": job.id, "message_id": job.message_id}, status_code=202
+        )
+
+    try:
+        await run_agent_once(conversation_id, user_input, source_message_id)
+        logger.info("Agent run completed successfully.")
+        return PlainTextResponse("OK", status_code=200)
+    except Exception as e:
+        logger.error(f"Error in new_message: {e}", exc_info=True)
+        return PlainTextResponse(f"Internal server error: {e}", status_code=500)
+
+
+async def stream_message(request: Request) -> Response:
+    """
+    Runs a turn and streams its events while they are produced, as Server-Sent
+    Events when the client accepts text/event-stream, NDJSON otherwise.
+    Messages and steps are still persisted, even if the client disconnects.
+    """
+    request_json = await _read_json(request)
+
+    try:
+        user_input, conversation_id, source_message_id = parse_new_message_request(
+            request_json, request.query_params
+        )
+    except ValueError as e:
+        return PlainTextResponse(str(e), status_code=400)
+
+    if "text/event-stream" in request.headers.get("accept", ""):
+        encode, media_type = encode_sse, "text/event-stream"
+    else:
+        encode, media_type = encode_ndjson, "application/x-ndjson"
+
+    async def body():
+        async for event in stream_agent_run(
+            conversation_id, user_input, source_message_id
+        ):
+            yield encode(event)
+
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def healthz(request: Request) -> PlainTextResponse:
+    return PlainTextResponse("OK")
+
+
+async def metrics(request: Request) -> JSONResponse:
+    return JSONResponse(
+        {
+            "runs": dict(run_deduplicator.stats),
+            "history_cache": {
+                **history_cache.stats,
+                "conversations": len(history_cache),
+                "bytes": history_cache.size,
+            },
+            "history_compactor": dict(history_compactor.stats),
+            "tool_calls": dict(tool_call_stats),
+            "steps": dict(step_recorder.stats),
+            "sql_cache": {
+                database.id: {
+                    **database.cache.stats,
+                    "hit_rate": round(database.cache.hit_rate, 3),
+                }
+                for database in databases.all()
+            },
+            "search_cache": {
+                **search_cache.stats,
+                "hit_rate": round(search_cache.hit_rate, 3),
+            },
+            "search_compaction": {
+                **compaction_stats,
+                "sources": len(source_store),
+                "source_bytes": source_store.size,
+            },
+            "web_corpus": {
+                **web_corpus.stats,
+                **(await asyncio.to_thread(web_corpus.size)),
+                "hit_rate": round(web_corpus.hit_rate, 3),
+            },
+        }
+    )
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette):
+    use_running_loop()
+    # Built now rather than by the first database question.
+    for database in await asyncio.to_thread(databases.all):
+        try:
+            await asyncio.to_thread(database.catalog)
+        except Exception as e:
+            logger.warning(f"Schema catalog of {database.id} not built at startup: {e}")
+    if RUN_MODE == "enqueue":
+        pool = get_worker_pool()
+        yield
+        await pool.stop(drain=True)
+    else:
+        yield
+    # Steps of runs cut short by the shutdown.
+    await asyncio.to_thread(step_recorder.drain)
+
+
+app = Starlette(
+    lifespan=lifespan,
+    routes=[
+        Route("/", new_message, methods=["GET", "POST"]),
+        Route("/stream", stream_message, methods=["GET", "POST"]),
+        Route("/healthz", healthz, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+    ],
+)
@@ -1,20 +1,128 @@
-from core.database import supabase_client
-from core.models.chat_models import Message
+import os
+from typing import List, Optional
+
+from core.blocking import run_coroutine
+from core.database import execute, get_async_supabase_client
+from core.models.chat_models import ConversationSummary, Message
+from core.transcripts import TRANSCRIPT_REPLAY
+
+# Columns of the Message model. The transcript, most of an assistant row, is
+# only read when it is replayed to the agent.
+MESSAGE_COLUMNS = "id, conversation_id, role, content, is_loading, created_at" + (
+    ", transcript" if TRANSCRIPT_REPLAY else ""
+)
+# Rows per request when reading a conversation (Supabase caps responses at 1000).
+MESSAGE_PAGE_SIZE = int(os.environ.get("ATLAS_MESSAGE_PAGE_SIZE", "500"))
+
+## The a-prefixed functions are awaited on the shared event loop; the sync ones
+## run them there from worker threads, for the code that is not async.
+
+
+async def _afetch_messages(
+    conversation_id: str,
+    since: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> List[Message]:
+    """
+    Reads the messages of a conversation (created at or after `since`) page by
+    page, in (created_at, id) order. Each page resumes after the last row of
+    the previous one (keyset), so it is one range of messages_conversation_idx
+    however deep the conversation, and no page exceeds the PostgREST max-rows.
+    """
+    rows: List[dict] = []
+    last: Optional[dict] = None
+    while True:
+        query = (
+            get_async_supabase_client()
+            .table("messages")
+            .select(MESSAGE_COLUMNS)
+            .eq("conversation_id", conversation_id)
+        )
+        if last is not None:
+            # (created_at, id) > last, with a created_at bound the index scan starts from.
+            created_at = last["created_at"]
+            query = query.gte("created_at", created_at).or_(
+                f'created_at.gt."{created_at}",id.gt.{last["id"]}'
+            )
+        elif since is not None:
+            query = query.gte("created_at", since)
+        response = await execute(
+            query.order("created_at").order("id").limit(MESSAGE_PAGE_SIZE), timeout
+        )
+        page = getattr(response, "data", None) or []
+        rows.extend(page)
+        if len(page) < MESSAGE_PAGE_SIZE:
+            return [Message(**row) for row in rows]
+        last = page[-1]
+
+
+async def aget_all_messages_by_conversation_id(
+    conversation_id: str, timeout: Optional[float] = None
+):
+    messages = await _afetch_messages(conversation_id, timeout=timeout)
+    if not messages:
+        raise ValueError("No data returned from Supabase when getting messages.")
+    return messages
 
 
 def get_all_messages_by_conversation_id(conversation_id: str):
-    response = (
-        supabase_client.table("messages")
-        .select("*")
-        .eq("conversation_id", conversation_id)
-        .order("created_at", desc=False)
-        .execute()
+    return run_coroutine(aget_all_messages_by_conversation_id(conversation_id))
+
+
+async def aget_messages_by_conversation_id_since(
+    conversation_id: str, created_at: str, timeout: Optional[float] = None
+):
+    """
+    Returns the messages of a conversation created at or after `created_at`, oldest first.
+    Unlike get_all_messages_by_conversation_id, an empty result is not an error.
+    """
+    return await _afetch_messages(conversation_id, since=created_at, timeout=timeout)
+
+
+def get_messages_by_conversation_id_since(conversation_id: str, created_at: str):
+    return run_coroutine(
+        aget_messages_by_conversation_id_since(conversation_id, created_at)
+    )
+
+
+async def aget_conversation_summary(
+    conversation_id: str, timeout: Optional[float] = None
+) -> ConversationSummary:
+    response = await execute(
+        get_async_supabase_client()
+        .table("conversations")
+        .select("summary, summarized_until")
+        .eq("id", conversation_id),
+        timeout,
     )
 
     data = getattr(response, "data", None)
-    if not data or not isinstance(data, list) or len(data) == 0:
-        raise ValueError("No data returned from Supabase when getting messages.")
+    if not data:
+        return ConversationSummary()
+    return ConversationSummary(**data[0])
 
-    messages = [Message(**message) for message in data]
 
-    return messages
+def get_conversation_summary(conversation_id: str) -> ConversationSummary:
+    return run_coroutine(aget_conversation_summary(conversation_id))
+
+
+async def aupdate_conversation_summary(
+    conversation_id: str,
+    summary: ConversationSummary,
+    timeout: Optional[float] = None,
+):
+    response = await execute(
+        get_async_supabase_client()
+        .table("conversations")
+        .update(summary.model_dump(mode="json"))
+        .eq("id", conversation_id),
+        timeout,
+    )
+
+    data = getattr(response, "data", None)
+    if not data:
+        raise ValueError("No data returned from Supabase when updating the summary.")
+
+
+def update_conversation_summary(conversation_id: str, summary: ConversationSummary):
+    return run_coroutine(aupdate_conversation_summary(conversation_id, summary))
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from core.database import get_supabase_client
+from core.models.job_models import Job
+
+
+def _to_job(data) -> Job:
+    return Job(**{key: data[key] for key in Job.model_fields if key in data})
+
+
+def insert_job(
+    conversation_id: str, user_input: str, message_id: str, max_attempts: int = 3
+) -> Job:
+    """
+    Insert a queued job. Returns a Job instance.
+    """
+    response = (
+        get_supabase_client()
+        .table("jobs")
+        .insert(
+            {
+                "conversation_id": conversation_id,
+                "user_input": user_input,
+                "message_id": message_id,
+                "max_attempts": max_attempts,
+            }
+        )
+        .execute()
+    )
+
+    data = getattr(response, "data", None)
+    if not data or not isinstance(data, list) or len(data) == 0:
+        raise ValueError("No data returned from Supabase when inserting job.")
+
+    return _to_job(data[0])
+
+
+def claim_job(visibility_timeout: float) -> Optional[Job]:
+    """
+    Claim the oldest visible job through the claim_job function.
+    Returns None if no job is available.
+    """
+    response = (
+        get_supabase_client()
+        .rpc("claim_job", {"visibility_timeout": int(visibility_timeout)})
+        .execute()
+    )
+
+    data = getattr(response, "data", None)
+    if not data:
+        return None
+
+    return _to_job(data[0])
+
+
+def update_job(job_id: str, **fields) -> None:
+    get_supabase_client().table("jobs").update(fields).eq("id", str(job_id)).execute()
+
+
+def fail_job(job_id: str, error: str, retry_delay: float = 0) -> Job:
+    """
+    Record a failed attempt. The job is queued again unless it is out of attempts.
+    Returns the updated Job instance.
+    """
+    job = get_job(job_id)
+    if job is None:
+        raise ValueError(f"Job {job_id} not found.")
+
+    visible_at = datetime.now(tz=timezone.utc) + timedelta(seconds=retry_delay)
+    status = "failed" if job.attempts >= job.max_attempts else "queued"
+    update_job(
+        job_id, status=status, last_error=error, visible_at=visible_at.isoformat()
+    )
+    return job.model_copy(update={"status": status, "last_error": error})
+
+
+def get_job(job_id: str) -> Optional[Job]:
+    response = (
+        get_supabase_client().table("jobs").select("*").eq("id", str(job_id)).execute()
+    )
+
+    data = getattr(response, "data", None)
+    if not data:
+        return None
+
+    return _to_job(data[0])
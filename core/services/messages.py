@@ -1,50 +1,306 @@
-from core.database import supabase_client
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+from core.blocking import get_executor, run_coroutine
+from core.database import RETURN_MINIMAL, execute, get_async_supabase_client
 from core.models.chat_models import Message
 
+# Partial content of a streamed message is written behind by a flusher thread,
+# at most every MESSAGE_FLUSH_INTERVAL seconds per message, once it grew by
+# MESSAGE_FLUSH_GROWTH (a fraction) since the previous write, and at most
+# MESSAGE_MAX_PARTIAL_WRITES times per message.
+MESSAGE_FLUSH_INTERVAL = float(os.environ.get("ATLAS_MESSAGE_FLUSH_INTERVAL", "0.5"))
+MESSAGE_FLUSH_GROWTH = float(os.environ.get("ATLAS_MESSAGE_FLUSH_GROWTH", "0.25"))
+MESSAGE_MAX_PARTIAL_WRITES = int(
+    os.environ.get("ATLAS_MESSAGE_MAX_PARTIAL_WRITES", "40")
+)
 
-def save_message(
+logger = logging.getLogger(__name__)
+
+
+async def acreate_message(
+    conversation_id: str,
+    content: str,
+    role_name: str = "assistant",
+    is_loading: bool = True,
+    id: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> Message:
+    """
+    Insert a message with a client-generated id (or `id`), so callers can use
+    the id before the insert returns. Returns a Message instance built locally.
+    """
+    row = {
+        "id": id or str(uuid.uuid4()),
+        "conversation_id": conversation_id,
+        "content": content,
+        "role": role_name,
+        "is_loading": is_loading,
+    }
+    await execute(
+        get_async_supabase_client()
+        .table("messages")
+        .insert(row, returning=RETURN_MINIMAL),
+        timeout,
+    )
+    return Message(**row)
+
+
+def create_message(
+    conversation_id: str,
+    content: str,
+    role_name: str = "assistant",
+    is_loading: bool = True,
+    id: Optional[str] = None,
+) -> Message:
+    return run_coroutine(
+        acreate_message(conversation_id, content, role_name, is_loading, id)
+    )
+
+
+async def asave_message(
     conversation_id: str,
     content: str,
     role_name: str = "assistant",
     is_loading: bool = True,
     id: str = None,
+    timeout: Optional[float] = None,
 ):
     """
     Save a message to the database. If id is provided, update the existing message.
-    Returns a Message instance.
+    Returns a Message instance, built locally: no row is sent back by Supabase.
     """
     if id is None:
-        response = (
-            supabase_client.table("messages")
-            .insert(
-                {
-                    "conversation_id": conversation_id,
-                    "content": content,
-                    "role": role_name,
-                    "is_loading": is_loading,
-                }
-            )
-            .execute()
+        return await acreate_message(
+            conversation_id, content, role_name, is_loading, timeout=timeout
         )
-    else:
-        response = (
-            supabase_client.table("messages")
-            .update(
-                {
-                    "conversation_id": conversation_id,
-                    "content": content,
-                    "role": role_name,
-                    "is_loading": is_loading,
-                }
-            )
-            .eq("id", str(id))
-            .execute()
+    row = {
+        "conversation_id": conversation_id,
+        "content": content,
+        "role": role_name,
+        "is_loading": is_loading,
+    }
+    await execute(
+        get_async_supabase_client()
+        .table("messages")
+        .update(row, returning=RETURN_MINIMAL)
+        .eq("id", str(id)),
+        timeout,
+    )
+    return Message(id=str(id), **row)
+
+
+def save_message(
+    conversation_id: str,
+    content: str,
+    role_name: str = "assistant",
+    is_loading: bool = True,
+    id: str = None,
+):
+    return run_coroutine(
+        asave_message(conversation_id, content, role_name, is_loading, id)
+    )
+
+
+async def asave_message_transcript(
+    id: str, transcript: list, timeout: Optional[float] = None
+):
+    """Stores the serialized agent transcript of an assistant message."""
+    await execute(
+        get_async_supabase_client()
+        .table("messages")
+        .update({"transcript": transcript}, returning=RETURN_MINIMAL)
+        .eq("id", str(id)),
+        timeout,
+    )
+
+
+def save_message_transcript(id: str, transcript: list):
+    run_coroutine(asave_message_transcript(id, transcript))
+
+
+@dataclass
+class _PendingMessage:
+    conversation_id: str
+    content: str
+    flushed_length: int = 0
+    last_flush: float = 0.0
+    partial_writes: int = 0
+    dirty: bool = False
+    finished: bool = False
+    # Held while a partial write of the message is in flight.
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class MessageWriteBuffer:
+    """
+    Coalesces content updates of messages being streamed, and writes them behind.
+
+    update() only records the latest content of a message; a flusher thread
+    writes it once the content grew by `flush_growth` times its length at the
+    previous write, and at least `flush_interval` seconds have passed since
+    then. The first chunk is written right away. The intervals thus back off
+    as the answer grows: a message of L characters takes about
+    log(L) / log(1 + flush_growth) partial writes and (1 + 1 / flush_growth) * L
+    bytes, and never more than `max_partial_writes` partial writes, however
+    many tokens. finish() writes the final state after any partial write in
+    flight, and ends the buffering.
+
+    With background=False no thread is started and flush_due() must be called.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = MESSAGE_FLUSH_INTERVAL,
+        flush_growth: float = MESSAGE_FLUSH_GROWTH,
+        max_partial_writes: int = MESSAGE_MAX_PARTIAL_WRITES,
+        writer: Callable[..., Optional[Message]] = save_message,
+        clock: Callable[[], float] = time.monotonic,
+        background: bool = True,
+    ):
+        self.flush_interval = flush_interval
+        self.flush_growth = flush_growth
+        self.max_partial_writes = max_partial_writes
+        self.writer = writer
+        self.clock = clock
+        self.background = background
+        self.writes = 0
+        self.updates = 0
+        self._cond = threading.Condition()
+        self._pending: Dict[str, _PendingMessage] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def update(self, conversation_id: str, content: str, id: str) -> None:
+        """Records the partial content of a loading message, written behind by the flusher."""
+        with self._cond:
+            self.updates += 1
+            pending = self._pending.get(id)
+            if pending is None:
+                # The first chunk is due right away: it is what the user waits for.
+                pending = _PendingMessage(
+                    conversation_id, content, last_flush=float("-inf")
+                )
+                self._pending[id] = pending
+            waiting = not self._is_eligible(pending)
+            pending.content = content
+            pending.dirty = True
+            if self.background and self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="atlas-message-flusher", daemon=True
+                )
+                self._thread.start()
+            if waiting and self._is_eligible(pending):
+                # The flusher only waits for the interval of eligible messages.
+                self._cond.notify()
+
+    def flush_due(self) -> int:
+        """Writes the messages whose partial content is due, in parallel. Returns the number written."""
+        now = self.clock()
+        with self._cond:
+            due = [
+                (id, pending)
+                for id, pending in self._pending.items()
+                if self._is_due(pending, now)
+            ]
+        if len(due) == 1:
+            return int(self._flush_pending(*due[0]))
+        futures = [get_executor().submit(self._flush_pending, *item) for item in due]
+        return sum(future.result() for future in futures)
+
+    def flush(self, id: str) -> bool:
+        """Writes the pending partial content of a message now, if any. Returns True if it was written."""
+        with self._cond:
+            pending = self._pending.get(id)
+        return pending is not None and self._flush_pending(id, pending)
+
+    def finish(
+        self,
+        conversation_id: str,
+        content: Optional[str],
+        id: str,
+        is_loading: bool = False,
+    ) -> Optional[Message]:
+        """
+        Writes the final state of a message and stops buffering it. With content=None,
+        the last buffered content is written (e.g. when the run failed).
+        """
+        with self._cond:
+            pending = self._pending.pop(id, None)
+        if pending is not None:
+            # Waits for a partial write in flight, so it cannot land after the final one.
+            with pending.lock:
+                pending.finished = True
+        if content is None:
+            content = pending.content if pending else ""
+        return self._write(conversation_id, content, id, is_loading=is_loading)
+
+    def _is_eligible(self, pending: _PendingMessage) -> bool:
+        """Whether the message has enough new content for a partial write."""
+        if not pending.dirty or pending.partial_writes >= self.max_partial_writes:
+            return False
+        length = len(pending.content)
+        # Shorter content (text dropped before a tool call) is written as soon as allowed.
+        return (
+            length < pending.flushed_length
+            or length - pending.flushed_length
+            >= self.flush_growth * pending.flushed_length
+        )
+
+    def _is_due(self, pending: _PendingMessage, now: float) -> bool:
+        return (
+            self._is_eligible(pending)
+            and now - pending.last_flush >= self.flush_interval
+        )
+
+    def _next_due_in(self, now: float) -> Optional[float]:
+        """Seconds until the next eligible message is due, None if there is none."""
+        waits = [
+            pending.last_flush + self.flush_interval - now
+            for pending in self._pending.values()
+            if self._is_eligible(pending)
+        ]
+        return max(0.0, min(waits)) if waits else None
+
+    def _flush_pending(self, id: str, pending: _PendingMessage) -> bool:
+        with pending.lock:
+            with self._cond:
+                if pending.finished or not pending.dirty:
+                    return False
+                content = pending.content
+                pending.flushed_length = len(content)
+                pending.last_flush = self.clock()
+                pending.partial_writes += 1
+                pending.dirty = False
+            try:
+                self._write(pending.conversation_id, content, id, is_loading=True)
+            except Exception as e:
+                # The next update or finish() writes a newer state anyway.
+                logger.warning(
+                    f"Could not write the partial content of message {id}: {e}"
+                )
+                return False
+        return True
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                wait = self._next_due_in(self.clock())
+                while wait != 0:
+                    self._cond.wait(wait)
+                    wait = self._next_due_in(self.clock())
+            self.flush_due()
+
+    def _write(self, conversation_id: str, content: str, id: str, is_loading: bool):
+        with self._cond:
+            self.writes += 1
+        return self.writer(
+            conversation_id, content=content, is_loading=is_loading, id=id
         )
 
-    # Supabase returns a dict with a 'data' key containing a list of rows
-    data = getattr(response, "data", None)
-    if not data or not isinstance(data, list) or len(data) == 0:
-        raise ValueError("No data returned from Supabase when saving message.")
 
-    message = Message(**data[0])
-    return message
+message_write_buffer = MessageWriteBuffer()
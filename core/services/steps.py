@@ -1,9 +1,210 @@
-from typing import List
-from core.database import supabase_client
+import logging
+import os
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from core.blocking import run_coroutine
+from core.database import RETURN_MINIMAL, execute, get_async_supabase_client
 from core.models.chat_models import StepSearch, StepDatabase
-from rich.console import Console
 
-console = Console()
+logger = logging.getLogger(__name__)
+
+# Step writes are queued and sent in batches by step_recorder instead of
+# blocking the tool calls (see StepRecorder).
+STEP_WRITE_BEHIND = os.environ.get("ATLAS_STEP_WRITE_BEHIND", "true").lower() == "true"
+STEP_FLUSH_INTERVAL = float(os.environ.get("ATLAS_STEP_FLUSH_INTERVAL", "0.25"))
+STEP_BATCH_SIZE = int(os.environ.get("ATLAS_STEP_BATCH_SIZE", "50"))
+STEP_MAX_ATTEMPTS = int(os.environ.get("ATLAS_STEP_MAX_ATTEMPTS", "3"))
+
+
+async def aupsert_steps(rows: List[dict], timeout: Optional[float] = None) -> None:
+    await execute(
+        get_async_supabase_client()
+        .table("steps")
+        .upsert(rows, returning=RETURN_MINIMAL),
+        timeout,
+    )
+
+
+def upsert_steps(rows: List[dict]) -> None:
+    run_coroutine(aupsert_steps(rows))
+
+
+async def asave_step(
+    step_data: dict, id: Optional[str] = None, timeout: Optional[float] = None
+) -> dict:
+    """Inserts a step (id None) or updates it, and returns its row with a client-generated id."""
+    if id is None:
+        row = {**step_data, "id": str(uuid.uuid4())}
+        await execute(
+            get_async_supabase_client()
+            .table("steps")
+            .insert(row, returning=RETURN_MINIMAL),
+            timeout,
+        )
+        return row
+    await execute(
+        get_async_supabase_client()
+        .table("steps")
+        .update(step_data, returning=RETURN_MINIMAL)
+        .eq("id", str(id)),
+        timeout,
+    )
+    return {**step_data, "id": str(id)}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class StepRecorder:
+    """
+    Write-behind recorder of agent steps.
+
+    start() gives a step a client-generated id and queues its insert; finish()
+    queues its final state. Neither waits for Supabase: a background thread
+    upserts the queued rows in batches every `flush_interval` seconds, or as
+    soon as `batch_size` rows are queued. A step finished before its insert was
+    sent is written once, in its final state. Failed batches are retried up to
+    `max_attempts` times.
+
+    drain() sends everything queued and returns once it is written; runs call
+    it before their message stops loading.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = STEP_FLUSH_INTERVAL,
+        batch_size: int = STEP_BATCH_SIZE,
+        max_attempts: int = STEP_MAX_ATTEMPTS,
+        writer: Callable[[List[dict]], None] = upsert_steps,
+    ):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.writer = writer
+        self.stats: Counter = Counter()
+        self._cond = threading.Condition()
+        # Only one batch is sent at a time, so a step's writes land in order.
+        self._send_lock = threading.Lock()
+        self._pending: Dict[str, dict] = {}
+        self._attempts: Counter = Counter()
+        # Rows of the steps started and not finished yet, for their final upsert.
+        self._started: Dict[str, dict] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, step_data: dict) -> dict:
+        """Queues the insert of a new step and returns its row, id included."""
+        row = {
+            **step_data,
+            "id": str(uuid.uuid4()),
+            # Set here rather than by the database, so batching keeps the step order.
+            "created_at": _now(),
+        }
+        with self._cond:
+            self.stats["started"] += 1
+            self._started[row["id"]] = row
+            self._queue(row)
+        return row
+
+    def finish(self, id: str, step_data: dict) -> dict:
+        """Queues the final state of a step, merged with its insert when that is still queued."""
+        id = str(id)
+        with self._cond:
+            self.stats["finished"] += 1
+            started = self._started.pop(id, None)
+            if id in self._pending:
+                self.stats["merged"] += 1
+            # Every row of a batch must have created_at: the bulk upsert sends
+            # the union of the rows' columns, and a missing one is written NULL.
+            # A step forgotten by drain() has no started row left to take it from.
+            row = {"created_at": _now(), **(started or {}), **step_data, "id": id}
+            self._queue(row)
+        return row
+
+    def flush(self, limit: Optional[int] = None) -> int:
+        """Sends up to `limit` queued rows (all by default). Returns the number sent."""
+        with self._send_lock:
+            with self._cond:
+                ids = list(self._pending)[:limit]
+                rows = [self._pending.pop(id) for id in ids]
+            if rows:
+                self._send(rows)
+        return len(rows)
+
+    def drain(self, message_id: Optional[str] = None) -> None:
+        """Sends every queued row and waits for the writes. With message_id, forgets its unfinished steps."""
+        while self.flush(self.batch_size):
+            pass
+        if message_id is not None:
+            with self._cond:
+                for id, row in list(self._started.items()):
+                    if row.get("message_id") == message_id:
+                        del self._started[id]
+
+    def _queue(self, row: dict) -> None:
+        # A newer state of a queued step replaces it (dicts keep the first position).
+        self._pending[row["id"]] = row
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="atlas-step-recorder", daemon=True
+            )
+            self._thread.start()
+        if len(self._pending) >= self.batch_size:
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                if len(self._pending) < self.batch_size:
+                    # Let the other steps of the tool calls under way join the batch.
+                    self._cond.wait(self.flush_interval)
+            self.flush(self.batch_size)
+
+    def _send(self, rows: List[dict]) -> None:
+        try:
+            self.writer(rows)
+        except Exception as e:
+            self.stats["failed_batches"] += 1
+            with self._cond:
+                retried = {}
+                for row in rows:
+                    id = row["id"]
+                    self._attempts[id] += 1
+                    if id in self._pending:
+                        continue  # Superseded by a newer state, queued already.
+                    if self._attempts[id] < self.max_attempts:
+                        retried[id] = row
+                    else:
+                        del self._attempts[id]
+                        self.stats["dropped"] += 1
+                # Retried rows go first, before newer steps.
+                self._pending = {**retried, **self._pending}
+            logger.warning(f"Could not write {len(rows)} step(s), will retry: {e}")
+            return
+        self.stats["batches"] += 1
+        self.stats["rows_written"] += len(rows)
+        with self._cond:
+            for row in rows:
+                self._attempts.pop(row["id"], None)
+
+
+step_recorder = StepRecorder()
+
+
+def _save_step(step_data: dict, id: Optional[str]) -> dict:
+    """Writes a step and returns its row, built locally with a client-generated id."""
+    if STEP_WRITE_BEHIND:
+        if id is None:
+            return step_recorder.start(step_data)
+        return step_recorder.finish(id, step_data)
+
+    return run_coroutine(asave_step(step_data, id))
 
 
 def save_search_step(
@@ -16,6 +217,7 @@ def save_search_step(
 ):
     """
     Save a SearchStep to the database. If id is provided, update the existing step.
+    With ATLAS_STEP_WRITE_BEHIND, the write is queued in step_recorder.
     Returns a StepSearch instance.
     """
     details = {
@@ -29,18 +231,7 @@ def save_search_step(
         "details": details,
         "is_loading": is_loading,
     }
-    if id is None:
-        response = supabase_client.table("steps").insert(step_data).execute()
-    else:
-        response = (
-            supabase_client.table("steps").update(step_data).eq("id", str(id)).execute()
-        )
-
-    data = getattr(response, "data", None)
-    if not data or not isinstance(data, list) or len(data) == 0:
-        raise ValueError("No data returned from Supabase when saving search step.")
-
-    step_data = data[0]
+    step_data = _save_step(step_data, id)
     step_details = step_data.get("details", {})
     step = StepSearch(
         id=step_data.get("id"),
@@ -63,9 +254,12 @@ def save_database_step(
     results: str | None = None,
     is_loading: bool = True,
     result_type: str = "text",
+    cache: dict | None = None,
 ):
     """
     Save a DatabaseStep to the database. If id is provided, update the existing step.
+    With ATLAS_STEP_WRITE_BEHIND, the write is queued in step_recorder.
+    cache, if given, is the result cache outcome stored with the step details.
     Returns a StepDatabase instance.
     """
     details = {
@@ -75,6 +269,8 @@ def save_database_step(
         "result_type": result_type,
         "results": results,
     }
+    if cache is not None:
+        details["cache"] = cache
     step_data = {
         "message_id": message_id,
         "description": description,
@@ -82,18 +278,7 @@ def save_database_step(
         "details": details,
         "is_loading": is_loading,
     }
-    if id is None:
-        response = supabase_client.table("steps").insert(step_data).execute()
-    else:
-        response = (
-            supabase_client.table("steps").update(step_data).eq("id", str(id)).execute()
-        )
-
-    data = getattr(response, "data", None)
-    if not data or not isinstance(data, list) or len(data) == 0:
-        raise ValueError("No data returned from Supabase when saving database step.")
-
-    step_data = data[0]
+    step_data = _save_step(step_data, id)
     step_details = step_data.get("details", {})
     step = StepDatabase(
         id=step_data.get("id"),
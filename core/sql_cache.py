@@ -0,0 +1,152 @@
+"""
+Cache of formatted run_sql_query results.
+
+Entries are keyed on the normalized query (comments and whitespace removed,
+keywords and identifiers lowercased, string literals kept exactly since SQLite
+compares them case-sensitively), the databases queried with their fingerprint
+(mtime and size), and the requested offset. A modified database file never
+serves stale results, and the TTL bounds the life of an entry otherwise.
+
+Each registered database has its own cache (see core.sqlite_registry).
+
+The in-memory LRU is bounded in bytes. With ATLAS_SQL_CACHE_PATH set, entries
+are also stored in a SQLite file (core.disk_cache), so the workers of one host
+share them.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Optional, Tuple
+
+from core.disk_cache import DiskCache
+
+SQL_CACHE = os.environ.get("ATLAS_SQL_CACHE", "true").lower() == "true"
+SQL_CACHE_TTL = float(os.environ.get("ATLAS_SQL_CACHE_TTL", "3600"))
+SQL_CACHE_MAX_BYTES = int(
+    os.environ.get("ATLAS_SQL_CACHE_MAX_BYTES", str(32 * 1024 * 1024))
+)
+SQL_CACHE_PATH = os.environ.get("ATLAS_SQL_CACHE_PATH")
+SQL_CACHE_DISK_MAX_BYTES = int(
+    os.environ.get("ATLAS_SQL_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024))
+)
+
+# String literals, quoted identifiers, comments, then runs of whitespace.
+_TOKENS = re.compile(
+    r"('(?:[^']|'')*')|(\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\])"
+    r"|(--[^\n]*|/\*.*?\*/)|(\s+)",
+    re.DOTALL,
+)
+
+
+def _normalize_code(code: str) -> str:
+    code = re.sub(r"\s+", " ", code.lower())
+    return re.sub(r" ?([(),=<>]) ?", r"\1", code)
+
+
+def normalize_sql(query: str) -> str:
+    """Canonical text of a query: equivalent spellings of the same query normalize the same."""
+    parts = []
+    code = []
+    position = 0
+    for match in _TOKENS.finditer(query):
+        code.append(query[position : match.start()])
+        literal, identifier, _, _ = match.groups()
+        if literal is None and identifier is None:
+            code.append(" ")  # Comment or whitespace
+        else:
+            parts.append(_normalize_code("".join(code)))
+            code = []
+            parts.append(literal if literal is not None else identifier.lower())
+        position = match.end()
+    code.append(query[position:])
+    parts.append(_normalize_code("".join(code)))
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+class SQLResultCache:
+    """LRU + TTL cache of query results, optionally persisted to a SQLite file."""
+
+    def __init__(
+        self,
+        max_bytes: int = SQL_CACHE_MAX_BYTES,
+        ttl: float = SQL_CACHE_TTL,
+        path: Optional[str] = SQL_CACHE_PATH,
+        disk_max_bytes: int = SQL_CACHE_DISK_MAX_BYTES,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.disk = DiskCache(path, disk_max_bytes, "SQL result cache", clock)
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._size = 0
+
+    @staticmethod
+    def key(query: str, database_id: str, fingerprint: Tuple, offset: int = 0) -> str:
+        raw = f"{database_id}\0{fingerprint}\0{offset}\0{normalize_sql(query)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def summary(self, hit: bool) -> dict:
+        """Cache outcome of a lookup and the running hit rate, as stored in step details."""
+        return {
+            "hit": hit,
+            "hits": self.stats["hits"],
+            "lookups": self.stats["hits"] + self.stats["misses"],
+            "hit_rate": round(self.hit_rate, 3),
+        }
+
+    def get(self, key: str) -> Optional[str]:
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["memory_hits"] += 1
+                    return value
+                self._remove(key)
+        value = self.disk.get(key)
+        with self._lock:
+            if value is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self.stats["disk_hits"] += 1
+            self._store(key, value, now + self.ttl)
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        expires_at = self.clock() + self.ttl
+        with self._lock:
+            self._store(key, value, expires_at)
+        self.stats["disk_evictions"] += self.disk.put(key, value, expires_at)
+
+    def _store(self, key: str, value: str, expires_at: float) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (expires_at, value)
+        self._size += size
+        while self._size > self.max_bytes:
+            evicted, _ = next(iter(self._entries.items()))
+            self._remove(evicted)
+            self.stats["evictions"] += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1].encode("utf-8"))
@@ -0,0 +1,129 @@
+"""
+Limits on the cost of agent-issued SQL.
+
+- A wall-clock deadline per query (ATLAS_SQL_QUERY_TIMEOUT seconds), enforced
+  with SQLite's progress handler: the statement is interrupted, whether it is
+  still planning its first row or streaming results.
+- An EXPLAIN QUERY PLAN check before running the query (ATLAS_SQL_PLAN_GUARD):
+  nested full scans whose row counts multiply past ATLAS_SQL_PLAN_MAX_ROWS,
+  typically a join without a usable condition, are rejected.
+
+Both raise errors whose message is meant for the model, so it can rewrite the
+query.
+"""
+
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+SQL_QUERY_TIMEOUT = float(os.environ.get("ATLAS_SQL_QUERY_TIMEOUT", "10"))
+SQL_PLAN_GUARD = os.environ.get("ATLAS_SQL_PLAN_GUARD", "true").lower() == "true"
+SQL_PLAN_MAX_ROWS = int(os.environ.get("ATLAS_SQL_PLAN_MAX_ROWS", "10000000"))
+# The deadline is checked every this many SQLite virtual machine instructions.
+_PROGRESS_INSTRUCTIONS = 10000
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+class QueryRejected(Exception):
+    pass
+
+
+@contextmanager
+def query_deadline(
+    conn: sqlite3.Connection, timeout: float = SQL_QUERY_TIMEOUT
+) -> Iterator[None]:
+    """Interrupts the statements run on conn inside the block after `timeout` seconds (0 disables)."""
+    if timeout <= 0:
+        yield
+        return
+    deadline = time.monotonic() + timeout
+    conn.set_progress_handler(
+        lambda: 1 if time.monotonic() > deadline else 0, _PROGRESS_INSTRUCTIONS
+    )
+    try:
+        yield
+    except sqlite3.OperationalError as e:
+        if str(e) == "interrupted" and time.monotonic() > deadline:
+            raise QueryTimeout(
+                f"The query was stopped after {timeout:g}s. Make it cheaper: filter "
+                "before joining, join on indexed columns, aggregate, add a LIMIT, "
+                "and bound recursive CTEs."
+            ) from e
+        raise
+    finally:
+        conn.set_progress_handler(None, _PROGRESS_INSTRUCTIONS)
+
+
+# The table may be qualified by the schema of an attached database ("SCAN main.pokemon").
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(?:\"?\w+\"?\.)?\"?(\w+)\"?(?: AS (\w+))?")
+_NOT_ALIASES = set(
+    "as on using where join inner left right full outer cross natural group order "
+    "limit having union except intersect window indexed not".split()
+)
+
+
+def _aliases(query: str, tables: List[str]) -> Dict[str, str]:
+    """Maps the names a query uses for each known table (the table name and its aliases) to the table."""
+    aliases = {table.lower(): table for table in tables}
+    for table in tables:
+        pattern = rf"\b{re.escape(table)}\b\"?\s+(?:AS\s+)?\"?(\w+)"
+        for alias in re.findall(pattern, query, flags=re.IGNORECASE):
+            if alias.lower() not in _NOT_ALIASES:
+                aliases.setdefault(alias.lower(), table)
+    return aliases
+
+
+def estimate_scan_cost(
+    plan: List[Tuple[int, int, int, str]], query: str, row_counts: Dict[str, int]
+) -> Tuple[int, List[Tuple[str, int]]]:
+    """
+    Returns (rows, scans) for the most expensive group of nested full scans in
+    `plan`: the product of their row counts and the (table, rows) scanned.
+    Entries with the same parent are nested loops; indexed SEARCH steps are not counted.
+    """
+    aliases = _aliases(query, list(row_counts))
+    groups: Dict[int, List[Tuple[str, int]]] = {}
+    for _, parent, _, detail in plan:
+        match = _SCAN.match(detail)
+        if not match:
+            continue
+        name = (match.group(2) or match.group(1)).lower()
+        table = aliases.get(name)
+        if table is not None and row_counts.get(table) is not None:
+            groups.setdefault(parent, []).append((table, row_counts[table]))
+
+    worst: Tuple[int, List[Tuple[str, int]]] = (0, [])
+    for scans in groups.values():
+        if len(scans) < 2:
+            continue
+        rows = 1
+        for _, count in scans:
+            rows *= max(count, 1)
+        if rows > worst[0]:
+            worst = (rows, scans)
+    return worst
+
+
+def check_query_plan(
+    conn: sqlite3.Connection,
+    query: str,
+    row_counts: Dict[str, Optional[int]],
+    max_rows: int = SQL_PLAN_MAX_ROWS,
+) -> None:
+    """Raises QueryRejected when the plan of `query` nests full scans past max_rows."""
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+    rows, scans = estimate_scan_cost(plan, query, row_counts)
+    if rows > max_rows:
+        scanned = " x ".join(f"{table} ({count} rows)" for table, count in scans)
+        raise QueryRejected(
+            f"The query plan nests full scans of {scanned}, about {rows:.2g} row "
+            f"combinations (limit {max_rows:.2g}). Add a join condition between "
+            "these tables, preferably on indexed or primary key columns, or filter "
+            "them first."
+        )
@@ -0,0 +1,118 @@
+"""
+Bounded formatting of SQL results for the agent.
+
+Rows are read with `fetchmany` and written to the output until SQL_MAX_ROWS
+rows or SQL_MAX_BYTES bytes, whichever comes first. The remaining rows are
+only counted, up to SQL_COUNT_MAX_ROWS, so memory does not depend on the size
+of the result. A truncated result ends with a note giving the total row count
+and the offset to pass to get the next page.
+"""
+
+import io
+import os
+import sqlite3
+from dataclasses import dataclass
+from typing import Optional
+
+SQL_MAX_ROWS = int(os.environ.get("ATLAS_SQL_MAX_ROWS", "200"))
+SQL_MAX_BYTES = int(os.environ.get("ATLAS_SQL_MAX_BYTES", "32000"))
+SQL_MAX_CELL_CHARS = int(os.environ.get("ATLAS_SQL_MAX_CELL_CHARS", "1000"))
+SQL_FETCH_SIZE = int(os.environ.get("ATLAS_SQL_FETCH_SIZE", "500"))
+# Counting the rows past the page stops here; the total is then reported as a lower bound.
+SQL_COUNT_MAX_ROWS = int(os.environ.get("ATLAS_SQL_COUNT_MAX_ROWS", "100000"))
+
+
+@dataclass
+class FormattedResult:
+    text: str
+    # Rows written to text, and rows in the result (counted up to SQL_COUNT_MAX_ROWS).
+    rows: int
+    total_rows: int
+    total_is_exact: bool = True
+    offset: int = 0
+
+    @property
+    def truncated(self) -> bool:
+        return self.offset > 0 or self.offset + self.rows < self.total_rows
+
+
+def _cell(value) -> str:
+    if isinstance(value, bytes):
+        return f"<{len(value)} bytes>"
+    text = str(value)
+    if len(text) > SQL_MAX_CELL_CHARS:
+        return text[:SQL_MAX_CELL_CHARS] + "…"
+    return text
+
+
+def format_query_results(
+    cursor: sqlite3.Cursor,
+    offset: int = 0,
+    max_rows: int = SQL_MAX_ROWS,
+    max_bytes: int = SQL_MAX_BYTES,
+    fetch_size: int = SQL_FETCH_SIZE,
+    count_max_rows: int = SQL_COUNT_MAX_ROWS,
+) -> Optional[FormattedResult]:
+    """
+    Formats the rows of an executed cursor, starting at row `offset`.
+    Returns None when the query returns no rows.
+    """
+    if cursor.description is None:
+        return None
+    offset = max(0, offset)
+    header = ", ".join(column[0] for column in cursor.description) + "\n"
+    body = io.StringIO()
+    size = len(header.encode("utf-8"))
+    seen = written = 0
+    full = False
+
+    while seen < count_max_rows:
+        batch = cursor.fetchmany(fetch_size)
+        if not batch:
+            break
+        for row in batch:
+            seen += 1
+            if seen <= offset or full:
+                continue
+            line = ", ".join(map(_cell, row)) + "\n"
+            line_size = len(line.encode("utf-8"))
+            if written >= max_rows or (written and size + line_size > max_bytes):
+                full = True
+                continue
+            body.write(line)
+            size += line_size
+            written += 1
+    total_is_exact = seen < count_max_rows or not cursor.fetchmany(1)
+
+    if seen == 0:
+        return None
+    if written == 0:
+        return FormattedResult(
+            text=f"No rows at offset {offset}: the query returned {seen}{'' if total_is_exact else '+'} rows.",
+            rows=0,
+            total_rows=seen,
+            total_is_exact=total_is_exact,
+            offset=offset,
+        )
+
+    total = f"{seen}" if total_is_exact else f"more than {seen}"
+    result = FormattedResult(
+        text="",
+        rows=written,
+        total_rows=seen,
+        total_is_exact=total_is_exact,
+        offset=offset,
+    )
+    if result.truncated:
+        title = f"Query Results (rows {offset + 1}-{offset + written} of {total}):\n"
+    else:
+        title = f"Query Results ({written} rows):\n"
+    text = title + header + body.getvalue()
+    if offset + written < seen or not total_is_exact:
+        text += (
+            f"[Truncated: {total} rows in total. Call run_sql_query again with "
+            f"offset={offset + written} for the next rows, or refine the query "
+            f"(filters, aggregates, LIMIT).]\n"
+        )
+    result.text = text
+    return result
@@ -0,0 +1,141 @@
+"""
+Pool of read-only connections to the SQLite databases queried by the agents.
+
+Connections are opened with the URI `mode=ro` (and `immutable=1` unless
+ATLAS_SQLITE_IMMUTABLE is "false"), so a query can never write to the file
+and, with immutable, SQLite skips file locking entirely. Each connection keeps
+its page cache, memory map and prepared statements between tool calls.
+
+A connection is used by one thread at a time: tools check one out with
+`pool.connection()` and it goes back to the pool when the block exits. When the
+file changes on disk (mtime or size), idle connections are dropped and new ones
+see the new content.
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Tuple
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+SQLITE_POOL_SIZE = int(os.environ.get("ATLAS_SQLITE_POOL_SIZE", "4"))
+SQLITE_POOL_TIMEOUT = float(os.environ.get("ATLAS_SQLITE_POOL_TIMEOUT", "30"))
+SQLITE_IMMUTABLE = os.environ.get("ATLAS_SQLITE_IMMUTABLE", "true").lower() == "true"
+SQLITE_MMAP_SIZE = int(os.environ.get("ATLAS_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KIB = int(os.environ.get("ATLAS_SQLITE_CACHE_SIZE_KIB", "65536"))
+SQLITE_CACHED_STATEMENTS = int(os.environ.get("ATLAS_SQLITE_CACHED_STATEMENTS", "256"))
+
+
+class SQLiteConnectionPool:
+    """Bounded pool of read-only connections to one SQLite file, safe to share between threads."""
+
+    def __init__(
+        self,
+        path: str,
+        size: int = SQLITE_POOL_SIZE,
+        timeout: float = SQLITE_POOL_TIMEOUT,
+        immutable: bool = SQLITE_IMMUTABLE,
+        mmap_size: int = SQLITE_MMAP_SIZE,
+        cache_size_kib: int = SQLITE_CACHE_SIZE_KIB,
+        cached_statements: int = SQLITE_CACHED_STATEMENTS,
+    ):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.immutable = immutable
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+        self.cached_statements = cached_statements
+        # Most recently returned first, so the warmest connections are reused.
+        self._idle: "queue.LifoQueue[Tuple[sqlite3.Connection, Tuple[int, int]]]" = (
+            queue.LifoQueue()
+        )
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def fingerprint(self) -> Tuple[int, int]:
+        """(mtime_ns, size) of the database file; changes whenever the file is modified."""
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(
+                f"No SQLite connection available for {self.path} after {self.timeout}s"
+            )
+        conn = None
+        try:
+            conn, version = self._checkout()
+            yield conn
+        finally:
+            if conn is not None:
+                self._checkin(conn, version)
+            self._slots.release()
+
+    def close(self) -> None:
+        """Closes the idle connections; connections in use are closed when returned."""
+        with self._lock:
+            self._closed = True
+        self._drain_idle()
+
+    def _checkout(self) -> Tuple[sqlite3.Connection, Tuple[int, int]]:
+        current = self.fingerprint()
+        while True:
+            try:
+                conn, version = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect(), current
+            if version == current:
+                return conn, version
+            # The file changed since this connection was opened.
+            conn.close()
+
+    def _checkin(self, conn: sqlite3.Connection, version: Tuple[int, int]) -> None:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+        with self._lock:
+            if not self._closed:
+                self._idle.put((conn, version))
+                return
+        conn.close()
+
+    def _drain_idle(self) -> None:
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
+
+    def uri(self) -> str:
+        """Read-only URI of the database file, also used to ATTACH it to another connection."""
+        uri = f"file:{quote(str(Path(self.path).resolve()))}?mode=ro"
+        if self.immutable:
+            uri += "&immutable=1"
+        return uri
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.uri(),
+            uri=True,
+            check_same_thread=False,  # Checked out by one thread at a time.
+            cached_statements=self.cached_statements,
+        )
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kib)}")
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        logger.info(f"Opened read-only SQLite connection to {self.path}")
+        return conn
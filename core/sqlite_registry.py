@@ -0,0 +1,200 @@
+"""
+Registry of the internal SQLite databases the research agent can query.
+
+Databases are declared in a JSON file (ATLAS_DATABASES_FILE), read again
+whenever it changes, so a dataset is added or removed without redeploying:
+
+    {
+      "pokedex": {
+        "path": "data/pokedex.sqlite",
+        "description": "Pokémon species, types, stats and moves",
+        "pool_size": 4,
+        "pool_timeout": 30,
+        "cache_max_bytes": 33554432,
+        "cache_ttl": 3600
+      }
+    }
+
+Only `path` is required; the other settings default to the ATLAS_SQLITE_* and
+ATLAS_SQL_CACHE_* values. Without the file, the registry holds the pokedex
+database alone.
+
+Each database has its own read-only connection pool, schema catalog and SQL
+result cache. A query on one database reads the others by attaching them
+(read-only) under their id: `SELECT ... FROM pokemon JOIN other.t ...`.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field, fields
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core.schema_catalog import SchemaCatalog, get_schema_catalog
+from core.sql_cache import SQL_CACHE_MAX_BYTES, SQL_CACHE_TTL, SQLResultCache
+from core.sqlite_pool import SQLITE_POOL_SIZE, SQLITE_POOL_TIMEOUT, SQLiteConnectionPool
+
+logger = logging.getLogger(__name__)
+
+DATABASES_FILE = os.environ.get("ATLAS_DATABASES_FILE", "databases.json")
+DEFAULT_DATABASES = {
+    "pokedex": {
+        "path": "data/pokedex.sqlite",
+        "description": "Pokémon species, types, stats, abilities and moves.",
+    }
+}
+# SQLite's default SQLITE_MAX_ATTACHED.
+MAX_ATTACHED = 10
+
+_DATABASE_ID = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_RESERVED_IDS = {"main", "temp"}
+
+
+class UnknownDatabase(Exception):
+    pass
+
+
+@dataclass
+class Database:
+    id: str
+    path: str
+    description: str = ""
+    pool_size: int = SQLITE_POOL_SIZE
+    pool_timeout: float = SQLITE_POOL_TIMEOUT
+    cache_max_bytes: int = SQL_CACHE_MAX_BYTES
+    cache_ttl: float = SQL_CACHE_TTL
+    pool: SQLiteConnectionPool = field(init=False, repr=False, compare=False)
+    cache: SQLResultCache = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if not _DATABASE_ID.match(self.id) or self.id.lower() in _RESERVED_IDS:
+            raise ValueError(f"Invalid database id {self.id!r}")
+        self.pool = SQLiteConnectionPool(
+            self.path, size=self.pool_size, timeout=self.pool_timeout
+        )
+        self.cache = SQLResultCache(max_bytes=self.cache_max_bytes, ttl=self.cache_ttl)
+
+    def catalog(self) -> SchemaCatalog:
+        return get_schema_catalog(self.pool, self.id)
+
+
+def _settings(database_id: str, config: dict) -> Database:
+    known = {f.name for f in fields(Database) if f.init} - {"id"}
+    unknown = set(config) - known
+    if unknown:
+        logger.warning(
+            f"Ignoring unknown settings of database {database_id}: {unknown}"
+        )
+    return Database(id=database_id, **{k: v for k, v in config.items() if k in known})
+
+
+class DatabaseRegistry:
+    """Named databases, loaded from `config_path` (or `default` without it) and reloaded when it changes."""
+
+    def __init__(
+        self,
+        config_path: Optional[str] = DATABASES_FILE,
+        default: Dict[str, dict] = DEFAULT_DATABASES,
+    ):
+        self.config_path = config_path
+        self.default = default
+        self._lock = threading.Lock()
+        self._databases: Dict[str, Database] = {}
+        self._version: Optional[Tuple[int, int]] = None
+        self._loaded = False
+
+    def get(self, database_id: Optional[str] = None) -> Database:
+        """The database registered as `database_id`, or the first registered one when None."""
+        databases = self._current()
+        if database_id is None:
+            if not databases:
+                raise UnknownDatabase("No database is registered.")
+            return next(iter(databases.values()))
+        database = databases.get(database_id)
+        if database is None:
+            raise UnknownDatabase(
+                f"Unknown database {database_id!r}. Available databases: "
+                f"{', '.join(databases) or 'none'}."
+            )
+        return database
+
+    def all(self) -> List[Database]:
+        return list(self._current().values())
+
+    def _file_version(self) -> Optional[Tuple[int, int]]:
+        if not self.config_path:
+            return None
+        try:
+            stat = os.stat(self.config_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _current(self) -> Dict[str, Database]:
+        version = self._file_version()
+        if self._loaded and version == self._version:
+            return self._databases
+        with self._lock:
+            if not self._loaded or version != self._version:
+                self._reload(version)
+        return self._databases
+
+    def _reload(self, version: Optional[Tuple[int, int]]) -> None:
+        config = self.default
+        if version is not None:
+            try:
+                with open(self.config_path) as f:
+                    config = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(
+                    f"Could not read {self.config_path}, keeping the current databases: {e}"
+                )
+                if self._loaded:
+                    self._version = version
+                    return
+
+        databases: Dict[str, Database] = {}
+        for database_id, settings in config.items():
+            try:
+                database = _settings(database_id, settings)
+            except (TypeError, ValueError) as e:
+                logger.error(f"Skipping database {database_id}: {e}")
+                continue
+            previous = self._databases.get(database_id)
+            # Keep the warm pool, catalog and cache of an unchanged database.
+            databases[database_id] = previous if previous == database else database
+
+        for database_id, previous in self._databases.items():
+            if databases.get(database_id) is not previous:
+                previous.pool.close()
+        self._databases = databases
+        self._version = version
+        self._loaded = True
+        logger.info(f"Registered databases: {', '.join(databases) or 'none'}")
+
+
+@contextmanager
+def attached(conn: sqlite3.Connection, databases: List[Database]) -> Iterator[None]:
+    """Attaches `databases` read-only to `conn` under their id for the duration of the block."""
+    if len(databases) > MAX_ATTACHED:
+        raise ValueError(
+            f"At most {MAX_ATTACHED} databases can be attached to a query."
+        )
+    names = []
+    try:
+        for database in databases:
+            conn.execute(
+                f'ATTACH DATABASE ? AS "{database.id}"', (database.pool.uri(),)
+            )
+            names.append(database.id)
+        yield
+    finally:
+        for name in names:
+            conn.execute(f'DETACH DATABASE "{name}"')
+
+
+databases = DatabaseRegistry()
@@ -0,0 +1,51 @@
+from typing import List
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    UserPromptPart,
+)
+
+from core.llm import model
+
+SUMMARY_SYSTEM_PROMPT = """<role>
+You maintain the running summary of a research conversation between a user and a research assistant.
+</role>
+
+<instructions>
+- You receive the current summary (possibly empty) and the next turns of the conversation.
+- Return the updated summary: the previous summary with the new turns folded in.
+- Keep the facts, figures, sources, decisions and open questions the assistant may need later. Drop greetings and repetitions.
+- Write in the language of the conversation, in concise bullet points.
+- Return only the summary.
+</instructions>"""
+
+
+summary_agent = Agent(model, system_prompt=SUMMARY_SYSTEM_PROMPT)
+
+
+def _transcript(messages: List[ModelMessage]) -> str:
+    lines = []
+    for message in messages:
+        for part in message.parts:
+            if isinstance(message, ModelRequest) and isinstance(part, UserPromptPart):
+                lines.append(f"User: {part.content}")
+            elif isinstance(message, ModelResponse) and isinstance(part, TextPart):
+                lines.append(f"Assistant: {part.content}")
+    return "\n\n".join(lines)
+
+
+async def summarize_history(
+    previous_summary: str, messages: List[ModelMessage], token_budget: int
+) -> str:
+    """Returns previous_summary updated with messages, in about token_budget tokens at most."""
+    prompt = (
+        f"<current_summary>\n{previous_summary}\n</current_summary>\n\n"
+        f"<new_turns>\n{_transcript(messages)}\n</new_turns>\n\n"
+        f"Return the updated summary in at most {token_budget} tokens."
+    )
+    result = await summary_agent.run(prompt)
+    return result.output
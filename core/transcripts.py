@@ -0,0 +1,195 @@
+"""
+Agent transcripts stored with each assistant message.
+
+The messages of a run after the user prompt (tool calls, tool returns and
+responses) are saved in `messages.transcript`, without thinking parts and with
+large tool returns cut. With ATLAS_TRANSCRIPT_REPLAY=true they are replayed
+into the history of the next turns instead of the final text only, so the
+agent can reuse earlier tool results instead of calling the tools again.
+
+Every run also counts its tool calls that repeat a call of an earlier turn of
+the conversation (same tool, same normalized arguments): what replay saves.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import replace
+from typing import Any, List, Optional
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelMessagesTypeAdapter,
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ThinkingPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_REPLAY = os.environ.get("ATLAS_TRANSCRIPT_REPLAY", "false").lower() == "true"
+# Tool returns are cut to this size when stored...
+TRANSCRIPT_MAX_TOOL_RETURN_CHARS = int(
+    os.environ.get("ATLAS_TRANSCRIPT_MAX_TOOL_RETURN_CHARS", "20000")
+)
+# ...and to this size when replayed from an earlier turn.
+TRANSCRIPT_REPLAY_TOOL_RETURN_CHARS = int(
+    os.environ.get("ATLAS_TRANSCRIPT_REPLAY_TOOL_RETURN_CHARS", "2000")
+)
+
+# runs, tool_calls, redundant_tool_calls
+tool_call_stats: Counter = Counter()
+# Tool calls of the earlier runs of the most recent conversations.
+_RECENT_CALLS_MAX_CONVERSATIONS = 1000
+_recent_calls: "OrderedDict[str, set]" = OrderedDict()
+_recent_calls_lock = threading.Lock()
+
+
+def _prune_part(part: Any, max_chars: int) -> Any:
+    if not isinstance(part, ToolReturnPart):
+        return part
+    content = part.model_response_str()
+    if len(content) <= max_chars:
+        return part
+    return replace(
+        part,
+        content=f"{content[:max_chars]}\n[... truncated, {len(content)} characters in total]",
+    )
+
+
+def prune_tool_returns(
+    messages: List[ModelMessage], max_chars: int
+) -> List[ModelMessage]:
+    """Returns messages with the tool returns longer than max_chars cut."""
+    pruned = []
+    for message in messages:
+        if isinstance(message, ModelRequest) and any(
+            isinstance(part, ToolReturnPart) for part in message.parts
+        ):
+            message = replace(
+                message, parts=[_prune_part(part, max_chars) for part in message.parts]
+            )
+        pruned.append(message)
+    return pruned
+
+
+def strip_tool_messages(messages: List[ModelMessage]) -> List[ModelMessage]:
+    """Keeps only user prompts and final text responses, as in a history built without transcripts."""
+    stripped = []
+    for message in messages:
+        if isinstance(message, ModelRequest):
+            if any(isinstance(part, UserPromptPart) for part in message.parts):
+                stripped.append(message)
+        elif not any(isinstance(part, ToolCallPart) for part in message.parts):
+            if any(isinstance(part, TextPart) for part in message.parts):
+                stripped.append(message)
+    return stripped
+
+
+def dump_transcript(new_messages: List[ModelMessage]) -> list:
+    """Serializes the messages of a run, from its first model response, to JSON-compatible data."""
+    kept = []
+    for message in new_messages:
+        if isinstance(message, ModelRequest) and any(
+            isinstance(part, UserPromptPart) for part in message.parts
+        ):
+            continue  # The user prompt is its own message row.
+        if isinstance(message, ModelResponse):
+            parts = [p for p in message.parts if not isinstance(p, ThinkingPart)]
+            if not parts:
+                continue
+            message = replace(message, parts=parts)
+        elif message.instructions is not None:
+            # The same instructions (schema prompt included) are on every request
+            # of the run, and the agent sends the current ones on replay anyway.
+            message = replace(message, instructions=None)
+        kept.append(message)
+    kept = prune_tool_returns(kept, TRANSCRIPT_MAX_TOOL_RETURN_CHARS)
+    return ModelMessagesTypeAdapter.dump_python(kept, mode="json", exclude_none=True)
+
+
+def load_transcript(data: list) -> List[ModelMessage]:
+    return ModelMessagesTypeAdapter.validate_python(data)
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return _WHITESPACE.sub(" ", value).strip().lower()
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def tool_call_signature(part: ToolCallPart) -> str:
+    try:
+        args = part.args_as_dict()
+    except Exception:
+        args = part.args
+    return (
+        f"{part.tool_name}:{json.dumps(_normalize(args), sort_keys=True, default=str)}"
+    )
+
+
+def _tool_call_signatures(messages: List[ModelMessage]) -> List[str]:
+    return [
+        tool_call_signature(part)
+        for message in messages
+        if isinstance(message, ModelResponse)
+        for part in message.parts
+        if isinstance(part, ToolCallPart)
+    ]
+
+
+def record_tool_calls(
+    conversation_id: str,
+    history: List[ModelMessage],
+    new_messages: List[ModelMessage],
+) -> int:
+    """
+    Counts the tool calls of a run and returns how many repeat a call of an
+    earlier turn of the conversation: one replayed in `history`, or one made by
+    an earlier run of the conversation in this process (recorded even when the
+    transcripts are not replayed, so both modes are measured the same way).
+    """
+    signatures = _tool_call_signatures(new_messages)
+    with _recent_calls_lock:
+        seen = set(_recent_calls.get(conversation_id, ()))
+    seen.update(_tool_call_signatures(history))
+    redundant = sum(1 for signature in signatures if signature in seen)
+    with _recent_calls_lock:
+        recent = _recent_calls.setdefault(conversation_id, set())
+        recent.update(signatures)
+        _recent_calls.move_to_end(conversation_id)
+        while len(_recent_calls) > _RECENT_CALLS_MAX_CONVERSATIONS:
+            _recent_calls.popitem(last=False)
+    tool_call_stats["runs"] += 1
+    tool_call_stats["tool_calls"] += len(signatures)
+    tool_call_stats["redundant_tool_calls"] += redundant
+    return redundant
+
+
+def transcript_messages(data: Optional[list]) -> Optional[List[ModelMessage]]:
+    """Deserializes a stored transcript, or returns None if it is missing or unreadable."""
+    if not data:
+        return None
+    try:
+        messages = load_transcript(data)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable transcript: {e}")
+        return None
+    # An interrupted run would leave the model a request to answer on replay.
+    if not messages or not isinstance(messages[-1], ModelResponse):
+        return None
+    return messages
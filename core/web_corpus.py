@@ -0,0 +1,234 @@
+"""
+Local corpus of the web pages fetched by search_the_web.
+
+Every page returned by Exa is stored in a SQLite file (ATLAS_WEB_CORPUS_PATH)
+with an FTS5 index (porter stemming) over its title and text. Before calling Exa, search_the_web
+looks the query up in the corpus: when at least ATLAS_WEB_CORPUS_MIN_PAGES
+pages fetched in the last ATLAS_WEB_CORPUS_MAX_AGE seconds match every term
+of the query, they answer it and Exa is not called.
+
+Pages older than ATLAS_WEB_CORPUS_MAX_AGE are deleted as new ones are added,
+then the least recently fetched ones past ATLAS_WEB_CORPUS_MAX_BYTES of text.
+
+Lookups, hits, corpus size and index build time are kept in `stats`.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WEB_CORPUS = os.environ.get("ATLAS_WEB_CORPUS", "true").lower() == "true"
+WEB_CORPUS_PATH = os.environ.get(
+    "ATLAS_WEB_CORPUS_PATH",
+    os.path.join(tempfile.gettempdir(), "atlas_web_corpus.sqlite"),
+)
+WEB_CORPUS_MIN_PAGES = int(os.environ.get("ATLAS_WEB_CORPUS_MIN_PAGES", "3"))
+WEB_CORPUS_MAX_AGE = float(os.environ.get("ATLAS_WEB_CORPUS_MAX_AGE", str(7 * 86400)))
+WEB_CORPUS_MAX_BYTES = int(
+    os.environ.get("ATLAS_WEB_CORPUS_MAX_BYTES", str(256 * 1024 * 1024))
+)
+
+_TERM = re.compile(r"\w+")
+# Words left out of the match expression: they would only make it stricter.
+_STOPWORDS = set(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was were what when where which who why how with do does did can "
+    "could should would will about me tell".split()
+)
+
+
+def match_expression(query: str) -> Optional[str]:
+    """FTS5 expression matching the pages that contain every term of `query`."""
+    terms = [t for t in _TERM.findall(query.lower()) if t not in _STOPWORDS]
+    if not terms:
+        return None
+    return " AND ".join(f'"{term}"' for term in dict.fromkeys(terms))
+
+
+class WebCorpus:
+    """SQLite store of fetched pages with an FTS5 (BM25) index."""
+
+    def __init__(
+        self,
+        path: Optional[str] = WEB_CORPUS_PATH,
+        min_pages: int = WEB_CORPUS_MIN_PAGES,
+        max_age: float = WEB_CORPUS_MAX_AGE,
+        max_bytes: int = WEB_CORPUS_MAX_BYTES,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.min_pages = min_pages
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def add(self, documents: List[dict]) -> None:
+        """Stores (or refreshes) pages given as url, title, published_date and text, then prunes the corpus."""
+        documents = [d for d in documents if d.get("text")]
+        if not documents:
+            return
+        now = self.clock()
+        start = time.perf_counter()
+        try:
+            with self._lock:
+                conn = self._connection()
+                if conn is None:
+                    return
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO pages (url, title, published_date, size, text, fetched_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (url) DO UPDATE SET "
+                        "title = excluded.title, published_date = excluded.published_date, "
+                        "size = excluded.size, text = excluded.text, "
+                        "fetched_at = excluded.fetched_at",
+                        [
+                            (
+                                d["url"],
+                                d.get("title"),
+                                d.get("published_date"),
+                                len(d["text"].encode("utf-8")),
+                                d["text"],
+                                now,
+                            )
+                            for d in documents
+                        ],
+                    )
+                    pruned = conn.execute(
+                        "DELETE FROM pages WHERE fetched_at <= ?", (now - self.max_age,)
+                    ).rowcount
+                    # Keeps the most recently fetched pages that fit in max_bytes.
+                    pruned += conn.execute(
+                        "DELETE FROM pages WHERE id IN (SELECT id FROM (SELECT id, "
+                        "SUM(size) OVER (ORDER BY fetched_at DESC, id DESC) AS kept FROM pages) "
+                        "WHERE kept > ?)",
+                        (self.max_bytes,),
+                    ).rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"Web corpus unavailable: {e}")
+            return
+        self.stats["pages_indexed"] += len(documents)
+        self.stats["pages_pruned"] += pruned
+        self.stats["index_ms"] += round((time.perf_counter() - start) * 1000)
+
+    def search(self, query: str, limit: int = 5) -> Optional[List[dict]]:
+        """The `limit` best recent pages matching every term of `query`, or None when fewer than min_pages do."""
+        expression = match_expression(query)
+        rows = []
+        if expression is not None:
+            try:
+                with self._lock:
+                    conn = self._connection()
+                    if conn is not None:
+                        rows = conn.execute(
+                            "SELECT pages.url, pages.title, pages.published_date, pages.text "
+                            "FROM pages_fts JOIN pages ON pages.id = pages_fts.rowid "
+                            "WHERE pages_fts MATCH ? AND pages.fetched_at > ? "
+                            "ORDER BY bm25(pages_fts, 2.0, 1.0) LIMIT ?",
+                            (expression, self.clock() - self.max_age, limit),
+                        ).fetchall()
+            except sqlite3.Error as e:
+                logger.warning(f"Web corpus unavailable: {e}")
+        if len(rows) < min(self.min_pages, limit):
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return [
+            {"url": url, "title": title, "published_date": published_date, "text": text}
+            for url, title, published_date, text in rows
+        ]
+
+    def size(self) -> dict:
+        """Number of pages and bytes of page text in the corpus."""
+        try:
+            with self._lock:
+                conn = self._connection()
+                if conn is None:
+                    return {"pages": 0, "bytes": 0}
+                pages, size = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages"
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Web corpus unavailable: {e}")
+            return {"pages": 0, "bytes": 0}
+        return {"pages": pages, "bytes": size}
+
+    def rebuild(self) -> float:
+        """Rebuilds the full-text index from the stored pages and returns the time it took, in seconds."""
+        start = time.perf_counter()
+        with self._lock:
+            conn = self._connection()
+            if conn is not None:
+                with conn:
+                    conn.execute("INSERT INTO pages_fts (pages_fts) VALUES ('rebuild')")
+        elapsed = time.perf_counter() - start
+        self.stats["rebuild_ms"] = round(elapsed * 1000)
+        return elapsed
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if not self.path:
+            return None
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(pages)")]
+            if columns and "id" not in columns:
+                # Corpus of an earlier layout, indexed on the implicit rowid: start over.
+                logger.info("Recreating the web corpus with an explicit page id")
+                conn.executescript("""
+                    DROP TABLE IF EXISTS pages_fts;
+                    DROP TABLE pages;
+                    """)
+            # The index refers to pages by id: an INTEGER PRIMARY KEY, unlike the
+            # implicit rowid, is never renumbered (e.g. by VACUUM).
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    id INTEGER PRIMARY KEY,
+                    url TEXT NOT NULL UNIQUE,
+                    title TEXT,
+                    published_date TEXT,
+                    size INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS pages_fetched_at ON pages (fetched_at);
+                CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5 (
+                    title, text, content = 'pages', content_rowid = 'id',
+                    tokenize = 'porter unicode61'
+                );
+                CREATE TRIGGER IF NOT EXISTS pages_ai AFTER INSERT ON pages BEGIN
+                    INSERT INTO pages_fts (rowid, title, text)
+                    VALUES (new.id, new.title, new.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS pages_ad AFTER DELETE ON pages BEGIN
+                    INSERT INTO pages_fts (pages_fts, rowid, title, text)
+                    VALUES ('delete', old.id, old.title, old.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS pages_au AFTER UPDATE ON pages BEGIN
+                    INSERT INTO pages_fts (pages_fts, rowid, title, text)
+                    VALUES ('delete', old.id, old.title, old.text);
+                    INSERT INTO pages_fts (rowid, title, text)
+                    VALUES (new.id, new.title, new.text);
+                END;
+                """)
+            self._conn = conn
+        return self._conn
+
+
+web_corpus = WebCorpus()
@@ -0,0 +1,140 @@
+"""
+Worker pool draining the job queue.
+
+Each worker claims a job, runs it with the job's visibility timeout as a hard
+deadline (so a run never outlives its lease) and records success or failure.
+Failed attempts are retried with exponential backoff until max_attempts.
+
+Run a standalone pool with:
+    python -m core.worker
+"""
+
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from core.job_queue import JobQueue
+from core.models.job_models import Job
+
+logger = logging.getLogger(__name__)
+
+WORKER_CONCURRENCY = int(os.environ.get("ATLAS_WORKER_CONCURRENCY", "4"))
+WORKER_VISIBILITY_TIMEOUT = float(os.environ.get("ATLAS_WORKER_VISIBILITY_TIMEOUT", "300"))
+WORKER_POLL_INTERVAL = float(os.environ.get("ATLAS_WORKER_POLL_INTERVAL", "0.5"))
+WORKER_RETRY_DELAY = float(os.environ.get("ATLAS_WORKER_RETRY_DELAY", "2"))
+
+
+class WorkerPool:
+    """Runs up to `concurrency` jobs at once on the current event loop."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handler: Callable[[Job], Awaitable[None]],
+        concurrency: int = WORKER_CONCURRENCY,
+        visibility_timeout: float = WORKER_VISIBILITY_TIMEOUT,
+        poll_interval: float = WORKER_POLL_INTERVAL,
+        retry_delay: float = WORKER_RETRY_DELAY,
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks) and not self._stopping
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._stopping = False
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"atlas-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        logger.info(f"Started worker pool with concurrency={self.concurrency}")
+
+    def notify(self) -> None:
+        """Wakes idle workers, e.g. right after a job was enqueued in this process."""
+        self._wakeup.set()
+
+    async def stop(self, drain: bool = True) -> None:
+        """Stops the workers. With drain=True, jobs already claimed are finished first."""
+        self._stopping = True
+        self._wakeup.set()
+        if not drain:
+            for task in self._tasks:
+                task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self) -> None:
+        while not self._stopping:
+            job = await asyncio.to_thread(self.queue.claim, self.visibility_timeout)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Job) -> None:
+        logger.info(f"Running job {job.id} (attempt {job.attempts}/{job.max_attempts})")
+        try:
+            await asyncio.wait_for(self.handler(job), self.visibility_timeout)
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                e = TimeoutError(f"Job exceeded visibility timeout of {self.visibility_timeout}s")
+            delay = self.retry_delay * (2 ** max(job.attempts - 1, 0))
+            failed = await asyncio.to_thread(self.queue.fail, job.id, str(e), delay)
+            if failed.status == "failed":
+                logger.error(f"Job {job.id} failed permanently: {e}", exc_info=True)
+            else:
+                logger.warning(
+                    f"Job {job.id} failed (attempt {job.attempts}/{job.max_attempts}), "
+                    f"retrying in {delay:.1f}s: {e}"
+                )
+            return
+        await asyncio.to_thread(self.queue.complete, job.id)
+        logger.info(f"Job {job.id} completed")
+
+
+_pool: Optional[WorkerPool] = None
+
+
+def get_worker_pool() -> WorkerPool:
+    """Returns the process-wide pool running agent jobs. Must be called on the shared event loop."""
+    global _pool
+    if _pool is None:
+        from core.job_queue import get_job_queue
+        from core.runner import run_job
+
+        _pool = WorkerPool(get_job_queue(), run_job)
+    if not _pool.running:
+        _pool.start()
+    return _pool
+
+
+async def main():
+    get_worker_pool()
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s"
+    )
+    asyncio.run(main())
@@ -21,6 +21,8 @@ MESSAGE_TYPE_STYLES = {
     "agent_tool_call": "bold yellow",
     "agent_tool_result": "green",
     "agent_thinking": "italic magenta",
+    "agent_thinking_delta": "italic magenta",
+    "text_delta": "white",
     "agent_system_prompt": "bold blue",
     "user_prompt": "cyan",
     "retry_prompt": "bold red",
@@ -36,6 +38,8 @@ ICON_MAP = {
     "agent_tool_call": "🔧",
     "agent_tool_result": "📊",
     "agent_thinking": "💭",
+    "agent_thinking_delta": "💭",
+    "text_delta": "✏️",
     "agent_system_prompt": "🛠️",
     "user_prompt": "👤",
     "retry_prompt": "🔄",
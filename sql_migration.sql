@@ -0,0 +1,65 @@
+-- Migration d'une base créée avec une version antérieure de sql_model.sql
+-- (sql_model.sql ne contient que le schéma d'une nouvelle base).
+-- Le script peut être relancé. Il est à lancer hors transaction, instruction par instruction
+-- (psql -f sql_migration.sql), à cause des index CONCURRENTLY.
+
+-- 1. Colonnes du résumé glissant de l'historique
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS summary TEXT;
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS summarized_until TIMESTAMPTZ;
+-- L'ancienne ancre (une position dans l'historique) ne correspond à aucun message : le résumé repart de zéro.
+ALTER TABLE conversations DROP COLUMN IF EXISTS summarized_messages;
+
+-- 2. Transcript des runs de l'agent
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS transcript JSONB;
+
+-- 3. Index de l'historique et des steps
+-- (CONCURRENTLY : les tables restent accessibles en écriture, à lancer hors transaction)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS messages_conversation_idx ON messages (conversation_id, created_at, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS steps_message_idx ON steps (message_id);
+
+-- 4. Propriétaire dénormalisé sur les messages et les steps
+-- Ajouter les colonnes, créer les triggers avant de remplir les lignes existantes (les lignes
+-- insérées pendant le remplissage sont ainsi couvertes), puis les index (hors transaction,
+-- pour les index CONCURRENTLY)
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS user_id UUID;
+ALTER TABLE steps ADD COLUMN IF NOT EXISTS user_id UUID;
+CREATE OR REPLACE FUNCTION messages_set_user_id()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    SELECT user_id INTO NEW.user_id FROM conversations WHERE id = NEW.conversation_id;
+    RETURN NEW;
+END;
+$$;
+CREATE OR REPLACE TRIGGER messages_set_user_id BEFORE INSERT OR UPDATE OF conversation_id, user_id ON messages
+    FOR EACH ROW EXECUTE FUNCTION messages_set_user_id();
+CREATE OR REPLACE FUNCTION steps_set_user_id()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    SELECT user_id INTO NEW.user_id FROM messages WHERE id = NEW.message_id;
+    RETURN NEW;
+END;
+$$;
+CREATE OR REPLACE TRIGGER steps_set_user_id BEFORE INSERT OR UPDATE OF message_id, user_id ON steps
+    FOR EACH ROW EXECUTE FUNCTION steps_set_user_id();
+-- Le remplissage passe aussi par les triggers (UPDATE OF user_id), qui recopient la même valeur.
+UPDATE messages SET user_id = conversations.user_id
+  FROM conversations
+ WHERE conversations.id = messages.conversation_id AND messages.user_id IS DISTINCT FROM conversations.user_id;
+UPDATE steps SET user_id = messages.user_id
+  FROM messages
+ WHERE messages.id = steps.message_id AND steps.user_id IS DISTINCT FROM messages.user_id;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS messages_user_idx ON messages (user_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS steps_user_idx ON steps (user_id);
+DROP POLICY IF EXISTS "User can view messages in their own conversations" ON messages;
+DROP POLICY IF EXISTS "User can create messages in their own conversations" ON messages;
+DROP POLICY IF EXISTS "User can view steps for their own messages" ON steps;
+CREATE POLICY "User can view messages in their own conversations" ON messages
+    FOR SELECT USING ((SELECT auth.uid()) = user_id);
+CREATE POLICY "User can create messages in their own conversations" ON messages
+    FOR INSERT WITH CHECK ((SELECT auth.uid()) = user_id);
+CREATE POLICY "User can view steps for their own messages" ON steps
+    FOR SELECT USING ((SELECT auth.uid()) = user_id);
@@ -4,7 +4,10 @@ CREATE TABLE conversations (
     user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE, -- Lien vers la table des utilisateurs de Supabase Auth
     created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
     -- Optionnel : ajouter un titre pour l'afficher dans une sidebar
-    title TEXT
+    title TEXT,
+    -- Résumé glissant des anciens messages, envoyé à l'agent à leur place
+    summary TEXT,
+    summarized_until TIMESTAMPTZ -- created_at du message utilisateur ouvrant le dernier tour couvert par le résumé
 );
 
 -- Rendre la table accessible via l'API Supabase
@@ -26,28 +29,42 @@ CREATE TABLE messages (
     role message_role NOT NULL,
     content TEXT NOT NULL,
     is_loading boolean default false, -- Indique si le message est en cours de chargement
+    transcript JSONB, -- Messages de l'agent (appels d'outils et résultats) ayant produit la réponse
+    user_id UUID, -- Copie de conversations.user_id, remplie par le trigger messages_set_user_id (pour les politiques RLS)
     created_at TIMESTAMPTZ NOT NULL DEFAULT now()
 );
 
+-- Historique d'une conversation, lu par pages dans l'ordre (created_at, id) (pagination keyset)
+CREATE INDEX messages_conversation_idx ON messages (conversation_id, created_at, id);
+CREATE INDEX messages_user_idx ON messages (user_id);
+
+-- Le propriétaire est recopié depuis la conversation à l'insertion, et recalculé si
+-- conversation_id ou user_id sont modifiés : les politiques comparent alors une
+-- colonne de la ligne, sans sous-requête par ligne lue. Une valeur envoyée par le
+-- client est ignorée. Un changement de conversations.user_id n'est pas propagé aux
+-- messages existants (une conversation ne change pas de propriétaire).
+CREATE OR REPLACE FUNCTION messages_set_user_id()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    SELECT user_id INTO NEW.user_id FROM conversations WHERE id = NEW.conversation_id;
+    RETURN NEW;
+END;
+$$;
+
+CREATE OR REPLACE TRIGGER messages_set_user_id BEFORE INSERT OR UPDATE OF conversation_id, user_id ON messages
+    FOR EACH ROW EXECUTE FUNCTION messages_set_user_id();
+
 -- Rendre la table accessible via l'API Supabase
 ALTER TABLE messages ENABLE ROW LEVEL SECURITY;
 -- Définir les politiques d'accès
+-- (SELECT auth.uid()) est évalué une fois par requête plutôt qu'une fois par ligne.
+-- WITH CHECK s'applique après le trigger : user_id est celui de la conversation.
 CREATE POLICY "User can view messages in their own conversations" ON messages
-    FOR SELECT USING (
-        EXISTS (
-            SELECT 1 FROM conversations
-            WHERE conversations.id = messages.conversation_id
-              AND conversations.user_id = auth.uid()
-        )
-    );
+    FOR SELECT USING ((SELECT auth.uid()) = user_id);
 CREATE POLICY "User can create messages in their own conversations" ON messages
-    FOR INSERT WITH CHECK (
-        EXISTS (
-            SELECT 1 FROM conversations
-            WHERE conversations.id = messages.conversation_id
-              AND conversations.user_id = auth.uid()
-        )
-    );
+    FOR INSERT WITH CHECK ((SELECT auth.uid()) = user_id);
 
 
 -- 4. Table pour stocker les étapes (steps)
@@ -60,20 +77,84 @@ CREATE TABLE steps (
     is_loading boolean default true, -- Indique si le step est en cours de chargement
     -- Colonne magique pour stocker les données spécifiques à chaque type de step
     details JSONB,
-    
+    user_id UUID, -- Copie de messages.user_id, remplie par le trigger steps_set_user_id (pour les politiques RLS)
+
     created_at TIMESTAMPTZ NOT NULL DEFAULT now()
 );
 
+-- Steps d'un message (lecture par le frontend, suppression en cascade d'un message)
+CREATE INDEX steps_message_idx ON steps (message_id);
+CREATE INDEX steps_user_idx ON steps (user_id);
+
+-- Même principe que pour les messages (les upserts du backend passent aussi par ce trigger).
+-- Un changement de messages.user_id n'est pas propagé aux steps existants.
+CREATE OR REPLACE FUNCTION steps_set_user_id()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    SELECT user_id INTO NEW.user_id FROM messages WHERE id = NEW.message_id;
+    RETURN NEW;
+END;
+$$;
+
+CREATE OR REPLACE TRIGGER steps_set_user_id BEFORE INSERT OR UPDATE OF message_id, user_id ON steps
+    FOR EACH ROW EXECUTE FUNCTION steps_set_user_id();
+
 -- Rendre la table accessible via l'API Supabase
 ALTER TABLE steps ENABLE ROW LEVEL SECURITY;
 -- Définir les politiques d'accès
 CREATE POLICY "User can view steps for their own messages" ON steps
-    FOR SELECT USING (
-        EXISTS (
-            SELECT 1 FROM messages
-            JOIN conversations ON messages.conversation_id = conversations.id
-            WHERE messages.id = steps.message_id
-              AND conversations.user_id = auth.uid()
-        )
-    );
--- En général, les steps sont créés par le backend, donc pas besoin de politique d'INSERT pour l'utilisateur.
\ No newline at end of file
+    FOR SELECT USING ((SELECT auth.uid()) = user_id);
+-- En général, les steps sont créés par le backend, donc pas besoin de politique d'INSERT pour l'utilisateur.
+
+-- 5. Table pour la file de jobs (runs de l'agent en mode "enqueue")
+-- Un job est réclamé avec un délai de visibilité : s'il n'est pas terminé à temps, il redevient disponible.
+CREATE TABLE jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    conversation_id UUID NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+    user_input TEXT NOT NULL,
+    message_id UUID NOT NULL REFERENCES messages(id) ON DELETE CASCADE, -- Message placeholder à remplir
+    status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    last_error TEXT,
+    visible_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX jobs_claim_idx ON jobs (status, visible_at) WHERE status IN ('queued', 'running');
+
+-- Les jobs ne sont manipulés que par le backend (service role), aucune politique utilisateur.
+ALTER TABLE jobs ENABLE ROW LEVEL SECURITY;
+
+-- Réclame le job visible le plus ancien (SKIP LOCKED : plusieurs workers peuvent réclamer en parallèle)
+CREATE OR REPLACE FUNCTION claim_job(visibility_timeout INTEGER)
+RETURNS SETOF jobs
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- Un bail expiré lors de la dernière tentative ne réussira jamais
+    UPDATE jobs
+       SET status = 'failed',
+           last_error = COALESCE(last_error, 'Visibility timeout expired')
+     WHERE status = 'running'
+       AND visible_at <= now()
+       AND attempts >= max_attempts;
+
+    RETURN QUERY
+    UPDATE jobs
+       SET status = 'running',
+           attempts = jobs.attempts + 1,
+           visible_at = now() + make_interval(secs => visibility_timeout)
+     WHERE jobs.id = (
+        SELECT j.id FROM jobs j
+         WHERE j.status IN ('queued', 'running')
+           AND j.visible_at <= now()
+         ORDER BY j.created_at
+         LIMIT 1
+         FOR UPDATE SKIP LOCKED
+     )
+    RETURNING jobs.*;
+END;
+$$;
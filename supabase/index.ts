@@ -52,6 +52,8 @@ Deno.serve(async (req: Request) => {
       body: JSON.stringify({
         user_input: newMessage.content,
         conversation_id: newMessage.conversation_id,
+        // Lets the backend drop duplicate deliveries of the same message
+        message_id: newMessage.id,
       }),
     });
 